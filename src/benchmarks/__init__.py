@@ -0,0 +1,8 @@
+"""Synthetic QADL workloads and per-stage pipeline benchmarks.
+
+Run ``python -m benchmarks --help`` from ``src``.
+"""
+
+from benchmarks.generator import DEFAULT_GATE_MIX, WorkloadSpec, generate_script, iter_script, parse_gate_mix
+from benchmarks.runner import (STAGES, StageResult, compare_results, load_results, run_suite, run_workload,
+                               save_results)
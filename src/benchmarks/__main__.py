@@ -0,0 +1,47 @@
+import argparse
+import sys
+
+from benchmarks.generator import WorkloadSpec, parse_gate_mix
+from benchmarks.runner import STAGES, compare_results, load_results, run_suite, save_results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Time the QADL pipeline stages on synthetic scripts.")
+    parser.add_argument('--gates', type=int, nargs='+', default=[10 ** 4, 10 ** 5, 10 ** 6],
+                        help="top-level gates per circuit, one workload each")
+    parser.add_argument('--qubits', type=int, default=16)
+    parser.add_argument('--mix', type=parse_gate_mix, help="gate weights such as H=4,CNOT=2,RZ=1")
+    parser.add_argument('--depth', type=int, default=0, help="module nesting depth")
+    parser.add_argument('--circuits', type=int, default=1, help="circuits per script")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=1, help="runs per stage; the best time is kept")
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced peak-memory runs")
+    parser.add_argument('-o', '--output', help="write the results JSON here")
+    parser.add_argument('--baseline', help="results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed slowdown or memory growth as a fraction (default: 0.2)")
+    options = parser.parse_args(argv)
+
+    specs = [WorkloadSpec(options.qubits, gates, options.mix, options.depth, options.circuits, seed=options.seed)
+             for gates in options.gates]
+    document = run_suite(specs, options.stages, options.repeat, not options.no_memory)
+    for record in document['results']:
+        if record['skipped']:
+            print(f"{record['workload']:<28} {record['stage']:<10} skipped ({record['skipped']})")
+        else:
+            peak = f"{record['peak_bytes'] / 2 ** 20:10.1f} MiB" if record['peak_bytes'] is not None else ''
+            print(f"{record['workload']:<28} {record['stage']:<10} {record['seconds']:10.4f} s {peak}")
+    if options.output:
+        save_results(document, options.output)
+
+    if options.baseline:
+        regressions = compare_results(document, load_results(options.baseline), options.tolerance)
+        for workload, stage, metric, old, new in regressions:
+            print(f"REGRESSION {workload} {stage} {metric}: {old:.4g} -> {new:.4g}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import random
+
+from gate_registry import lookup_gate
+
+DEFAULT_GATE_MIX = {'H': 4, 'X': 2, 'T': 2, 'RZ': 2, 'CNOT': 4, 'CZ': 1, 'CCNOT': 1}
+
+class WorkloadSpec:
+    """Shape of a synthetic QADL script.
+
+    Every circuit has ``num_qubits`` qubits and ``num_gates`` top-level
+    statements drawn from ``gate_mix`` (gate name to relative weight). With
+    ``module_depth > 0`` the script defines that many nested modules, each
+    calling the one below it, and ``call_fraction`` of the statements are
+    calls of the outermost module instead of gates.
+    """
+
+    __slots__ = ('num_qubits', 'num_gates', 'gate_mix', 'module_depth', 'circuits', 'call_fraction', 'seed')
+
+    def __init__(self, num_qubits=16, num_gates=10000, gate_mix=None, module_depth=0, circuits=1,
+                 call_fraction=0.1, seed=0):
+        self.num_qubits = num_qubits
+        self.num_gates = num_gates
+        self.gate_mix = dict(gate_mix or DEFAULT_GATE_MIX)
+        self.module_depth = module_depth
+        self.circuits = circuits
+        self.call_fraction = call_fraction
+        self.seed = seed
+
+    def asdict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @property
+    def label(self):
+        return f"q{self.num_qubits}-g{self.num_gates}-d{self.module_depth}-c{self.circuits}"
+
+def parse_gate_mix(text):
+    """Parse ``'H=4,CNOT=2,RZ=1'`` into a gate mix dict."""
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        try:
+            mix[name.strip()] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid gate mix entry: {item}") from None
+    return mix
+
+def _gate_table(gate_mix, num_qubits):
+    names = []
+    weights = []
+    for name, weight in gate_mix.items():
+        spec = lookup_gate(name)
+        if spec.num_qubits is None:
+            raise ValueError(f"Gate {name} has no fixed arity and cannot be generated")
+        if spec.num_qubits > num_qubits:
+            raise ValueError(f"Gate {name} needs {spec.num_qubits} qubits, the workload has {num_qubits}")
+        names.append((name, spec.num_qubits, spec.num_params))
+        weights.append(weight)
+    if not names:
+        raise ValueError("The gate mix is empty")
+    return names, weights
+
+def _gate_lines(rng, table, weights, qubits, count, indent):
+    gates = rng.choices(table, weights, k=count)
+    for name, arity, num_params in gates:
+        targets = ' '.join(rng.sample(qubits, arity))
+        if num_params:
+            angles = ', '.join(f"{rng.uniform(0, 6.283):.4f}" for _ in range(num_params))
+            yield f"{indent}gate {name}({angles}) {targets}"
+        else:
+            yield f"{indent}gate {name} {targets}"
+
+def iter_script(spec):
+    """Yield the lines of the script described by ``spec``."""
+    rng = random.Random(spec.seed)
+    table, weights = _gate_table(spec.gate_mix, spec.num_qubits)
+    qubits = [f"q{i}" for i in range(spec.num_qubits)]
+    width = min(3, spec.num_qubits)
+    local = [f"m{i}" for i in range(width)]
+    local_table = [entry for entry in table if entry[1] <= width]
+    local_weights = [weight for entry, weight in zip(table, weights) if entry[1] <= width]
+
+    for c in range(spec.circuits):
+        yield f"Circuit Bench{c} {{"
+        for qubit in qubits:
+            yield f"    qubit {qubit}"
+        for depth in range(1, spec.module_depth + 1):
+            yield f"    module Block{depth} {{"
+            for qubit in local:
+                yield f"        qubit {qubit}"
+            if local_table:
+                yield from _gate_lines(rng, local_table, local_weights, local, 4, '        ')
+            if depth > 1:
+                yield f"        call Block{depth - 1} {' '.join(local)}"
+            yield "    }"
+        calls = spec.call_fraction if spec.module_depth else 0
+        for _ in range(spec.num_gates):
+            if calls and rng.random() < calls:
+                yield f"    call Block{spec.module_depth} {' '.join(rng.sample(qubits, width))}"
+            else:
+                yield from _gate_lines(rng, table, weights, qubits, 1, '    ')
+        for i, qubit in enumerate(qubits):
+            yield f"    measure {qubit} -> c{i}"
+        yield "}"
+
+def generate_script(spec):
+    """Return the script described by ``spec`` as one string."""
+    return '\n'.join(iter_script(spec)) + '\n'
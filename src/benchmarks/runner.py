@@ -0,0 +1,163 @@
+import json
+import platform
+import time
+import tracemalloc
+
+from benchmarks.generator import generate_script
+
+RESULTS_FORMAT_VERSION = 1
+STAGES = ('parse', 'translate', 'draw', 'simulate')
+
+# Sizes above which a stage is skipped: matplotlib drawing and dense
+# statevector simulation stop being meaningful well before the parser does.
+MAX_DRAW_GATES = 5000
+MAX_SIMULATE_QUBITS = 20
+
+class StageResult:
+    """Best wall time over the repeats and peak traced memory of one stage."""
+
+    __slots__ = ('workload', 'stage', 'seconds', 'peak_bytes', 'skipped')
+
+    def __init__(self, workload, stage, seconds=None, peak_bytes=None, skipped=None):
+        self.workload = workload
+        self.stage = stage
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+        self.skipped = skipped
+
+    def asdict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+def _stage_functions(script):
+    from qiskit_executor import build_circuit, draw_circuit
+    from qiskit_parser import parse_qadl_all
+    from statevector_simulator import simulate_circuit
+    state = {}
+
+    def parse():
+        state['circuits'] = parse_qadl_all(script)
+
+    def translate():
+        state['qiskit'] = [build_circuit(circuit_def) for circuit_def in state['circuits']]
+
+    def draw():
+        import os
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            for index, qc in enumerate(state['qiskit']):
+                draw_circuit(qc, os.path.join(directory, f"{index}.png"))
+
+    def simulate():
+        for circuit_def in state['circuits']:
+            simulate_circuit(circuit_def, shots=1024, seed=0)
+
+    return {'parse': parse, 'translate': translate, 'draw': draw, 'simulate': simulate}
+
+def _measure(function, repeat, memory):
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    peak = None
+    if memory:
+        # A separate traced run, so tracing overhead never inflates the timings.
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+def run_workload(spec, stages=STAGES, repeat=1, memory=True):
+    """Time each pipeline stage on the script generated from ``spec``.
+
+    Stages run in pipeline order and each works on the output of the
+    previous one, so asking for ``draw`` or ``simulate`` also runs
+    ``parse`` (and ``translate`` for ``draw``) untimed when they were not
+    requested. ``draw`` is skipped above ``MAX_DRAW_GATES`` gates and
+    ``simulate`` above ``MAX_SIMULATE_QUBITS`` qubits; a stage that runs
+    out of memory is recorded as skipped.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    functions = _stage_functions(generate_script(spec))
+    total_gates = spec.num_gates * spec.circuits
+    needed = set(stages)
+    if 'draw' in needed:
+        needed.update(('parse', 'translate'))
+    if 'translate' in needed or 'simulate' in needed:
+        needed.add('parse')
+    results = []
+    for stage in STAGES:
+        if stage not in needed:
+            continue
+        skipped = None
+        if stage == 'draw' and total_gates > MAX_DRAW_GATES:
+            skipped = f"more than {MAX_DRAW_GATES} gates"
+        elif stage == 'simulate' and spec.num_qubits > MAX_SIMULATE_QUBITS:
+            skipped = f"more than {MAX_SIMULATE_QUBITS} qubits"
+        if skipped is not None:
+            if stage in stages:
+                results.append(StageResult(spec.label, stage, skipped=skipped))
+            continue
+        if stage not in stages:
+            functions[stage]()
+            continue
+        try:
+            seconds, peak = _measure(functions[stage], repeat, memory)
+        except MemoryError:
+            # matplotlib fails to allocate the canvas of very wide circuits.
+            results.append(StageResult(spec.label, stage, skipped="out of memory"))
+            continue
+        results.append(StageResult(spec.label, stage, seconds, peak))
+    return results
+
+def run_suite(specs, stages=STAGES, repeat=1, memory=True):
+    """Run every workload and return the results document."""
+    results = []
+    for spec in specs:
+        for result in run_workload(spec, stages, repeat, memory):
+            record = result.asdict()
+            record['spec'] = spec.asdict()
+            results.append(record)
+    return {
+        'version': RESULTS_FORMAT_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+def save_results(document, path):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(document, handle, indent=2)
+        handle.write('\n')
+
+def load_results(path):
+    with open(path, encoding='utf-8') as handle:
+        document = json.load(handle)
+    if document.get('version') != RESULTS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported benchmark results version: {document.get('version')}")
+    return document
+
+def compare_results(document, baseline, tolerance=0.2):
+    """Return ``(workload, stage, metric, baseline, current)`` for every regression.
+
+    A stage regresses when its time or peak memory exceeds the baseline by
+    more than ``tolerance`` (a fraction). Stages missing from either side or
+    skipped are not compared.
+    """
+    previous = {(record['workload'], record['stage']): record for record in baseline['results']}
+    regressions = []
+    for record in document['results']:
+        old = previous.get((record['workload'], record['stage']))
+        if old is None:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            if record[metric] is None or old[metric] is None:
+                continue
+            if record[metric] > old[metric] * (1 + tolerance):
+                regressions.append((record['workload'], record['stage'], metric, old[metric], record[metric]))
+    return regressions
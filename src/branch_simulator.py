@@ -0,0 +1,287 @@
+import heapq
+
+import numpy as np
+
+from gate_registry import resolve_gate
+from statevector_simulator import GateMatrices, SimulationResult, Statevector, apply_gate
+
+# Iterations after which a ``while`` loop without ``max <n>`` is treated as
+# non-terminating.
+DEFAULT_MAX_ITERATIONS = 1000
+
+_GATE, _MEASURE, _BRANCH, _JUMP, _ENTER, _LOOP = range(6)
+
+class _Branches:
+    """Branches that share a program counter, one amplitude row per branch.
+
+    Every branch stands for ``shots[row]`` shots that produced the classical
+    register value ``clbits[row]``; ``counters[row, loop]`` counts the
+    iterations of each ``while`` loop.
+    """
+
+    __slots__ = ('amplitudes', 'shots', 'clbits', 'counters')
+
+    def __init__(self, amplitudes, shots, clbits, counters):
+        self.amplitudes = amplitudes
+        self.shots = shots
+        self.clbits = clbits
+        self.counters = counters
+
+    def take(self, rows):
+        return _Branches(self.amplitudes[rows], self.shots[rows], self.clbits[rows], self.counters[rows])
+
+    def split(self, mask):
+        """Return the branches where ``mask`` holds and the rest, ``None`` for an empty side."""
+        if mask.all():
+            return self, None
+        if not mask.any():
+            return None, self
+        return self.take(mask), self.take(~mask)
+
+    @classmethod
+    def concat(cls, groups):
+        return cls(np.concatenate([group.amplitudes for group in groups]),
+                   np.concatenate([group.shots for group in groups]),
+                   np.concatenate([group.clbits for group in groups]),
+                   np.concatenate([group.counters for group in groups]))
+
+def _touch(circuit_def, nodes, qubits, clbits):
+    for node in nodes:
+        kind = node[0]
+        if kind == 'gate':
+            qubits.update(circuit_def.gate_qubits(node[1]))
+        elif kind == 'measure':
+            qubits.add(circuit_def.measure_qubits[node[1]])
+            clbits.add(circuit_def.measure_clbits[node[1]])
+        else:
+            clbits.add(node[1].clbit)
+            _touch(circuit_def, node[2], qubits, clbits)
+            if kind == 'if':
+                _touch(circuit_def, node[3], qubits, clbits)
+
+def deferred_measurements(circuit_def, program=None):
+    """Return the indices of measurements that can be sampled from the final state.
+
+    A top-level measurement is deferred when nothing after it acts on its
+    qubit, reads its classical bit in a condition or writes that bit with a
+    collapsing measurement. Only the other measurements split branches.
+    """
+    if program is None:
+        program = circuit_def.program()
+    deferred = set()
+    qubits = set()
+    clbits = set()
+    for node in reversed(program):
+        if node[0] == 'measure':
+            j = node[1]
+            if circuit_def.measure_qubits[j] not in qubits and circuit_def.measure_clbits[j] not in clbits:
+                deferred.add(j)
+                continue
+        _touch(circuit_def, (node,), qubits, clbits)
+    return deferred
+
+def _compile(program, deferred):
+    """Flatten a program tree into ops with jump targets; return the ops and loop count."""
+    ops = []
+    loops = 0
+
+    def emit(nodes):
+        nonlocal loops
+        for node in nodes:
+            kind = node[0]
+            if kind == 'gate':
+                ops.append((_GATE, node[1]))
+            elif kind == 'measure':
+                if node[1] not in deferred:
+                    ops.append((_MEASURE, node[1]))
+            elif kind == 'if':
+                block = node[1]
+                branch = len(ops)
+                ops.append(None)
+                emit(node[2])
+                if node[3]:
+                    jump = len(ops)
+                    ops.append(None)
+                    ops[branch] = (_BRANCH, block.clbit, block.value, len(ops))
+                    emit(node[3])
+                    ops[jump] = (_JUMP, len(ops))
+                else:
+                    ops[branch] = (_BRANCH, block.clbit, block.value, len(ops))
+            else:
+                block = node[1]
+                loop = loops
+                loops += 1
+                bounded = block.max_iterations is not None
+                limit = block.max_iterations if bounded else DEFAULT_MAX_ITERATIONS
+                ops.append((_ENTER, loop))
+                top = len(ops)
+                ops.append(None)
+                emit(node[2])
+                ops.append((_JUMP, top))
+                ops[top] = (_LOOP, block.clbit, block.value, len(ops), loop, limit, bounded, block.line)
+
+    emit(program)
+    return ops, loops
+
+def _measure(group, qubit, clbit, rng):
+    """Split every branch on the outcome of measuring ``qubit`` into ``clbit``."""
+    view = group.amplitudes.reshape(len(group.shots), -1, 2, 1 << qubit)
+    one = view[:, :, 1, :]
+    p1 = np.clip(np.einsum('tij,tij->t', one, one.conj()).real, 0, 1)
+    ones = rng.binomial(group.shots, p1)
+    zeros = group.shots - ones
+    low = np.flatnonzero(zeros)
+    high = np.flatnonzero(ones)
+    amplitudes = np.concatenate((group.amplitudes[low], group.amplitudes[high]))
+    view = amplitudes.reshape(len(amplitudes), -1, 2, 1 << qubit)
+    split = len(low)
+    view[:split, :, 1, :] = 0
+    view[:split] *= (1 / np.sqrt(np.maximum(1 - p1[low], 1e-300)))[:, None, None, None]
+    view[split:, :, 0, :] = 0
+    view[split:] *= (1 / np.sqrt(np.maximum(p1[high], 1e-300)))[:, None, None, None]
+    bit = 1 << clbit
+    return _Branches(amplitudes,
+                     np.concatenate((zeros[low], ones[high])),
+                     np.concatenate((group.clbits[low] & ~bit, group.clbits[high] | bit)),
+                     np.concatenate((group.counters[low], group.counters[high])))
+
+def _condition(group, clbit, value):
+    return ((group.clbits >> clbit) & 1) == value
+
+def _fold(finished, circuit_def, deferred, rng):
+    num_clbits = len(circuit_def.classical_bits)
+    pairs = [(circuit_def.measure_qubits[j], circuit_def.measure_clbits[j]) for j in sorted(deferred)]
+    counts = {}
+    for group in finished:
+        if pairs:
+            probabilities = np.abs(group.amplitudes).astype(np.float64) ** 2
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            hits = rng.multinomial(group.shots, probabilities)
+            rows, states = np.nonzero(hits)
+            weights = hits[rows, states]
+            values = group.clbits[rows]
+            states = states.astype(values.dtype)
+            for qubit, clbit in pairs:
+                values &= ~(1 << clbit)
+                values |= ((states >> qubit) & 1) << clbit
+        else:
+            values, weights = group.clbits, group.shots
+        for value, hit in zip(values.tolist(), weights.tolist()):
+            key = format(value, f'0{num_clbits}b')
+            counts[key] = counts.get(key, 0) + hit
+    return counts
+
+def simulate_branches(circuit_def, shots=1024, seed=None, dtype=np.complex128, parameters=None):
+    """Simulate a circuit with mid-circuit measurements and classical control flow.
+
+    Shots are not run one at a time. All branches at the same point of the
+    program share one batched statevector, and each carries the number of
+    shots that followed it. A collapsing measurement splits every branch in
+    two, drawing that split binomially. An ``if`` or ``while`` moves
+    branches by their classical register value. Branches that reach the
+    same join point again are merged back into one batch. So every distinct
+    branch path is simulated once, however many shots it stands for.
+    Measurements that nothing later depends on are sampled from the final
+    branch states. A ``while`` loop with ``max <n>`` exits after ``n``
+    iterations; one without raises ``ValueError`` after
+    ``DEFAULT_MAX_ITERATIONS``. ``parameters`` binds symbolic gate
+    parameters by name.
+    """
+    undeclared = circuit_def.undeclared_qubits()
+    if undeclared:
+        raise ValueError(f"Undeclared qubit: {undeclared[0]}")
+    num_clbits = len(circuit_def.classical_bits)
+    if not shots or not num_clbits:
+        return SimulationResult(circuit_def.name, None, {}, shots, 'branches')
+
+    program = circuit_def.program()
+    deferred = deferred_measurements(circuit_def, program)
+    ops, loops = _compile(program, deferred)
+    joins = set()
+    for op in ops:
+        if op[0] in (_BRANCH, _LOOP):
+            joins.add(op[3])
+        elif op[0] == _JUMP:
+            joins.add(op[1])
+
+    rng = np.random.default_rng(seed)
+    matrices = GateMatrices(dtype, parameters)
+    specs = [resolve_gate(name, circuit_def) for name in circuit_def.opcode_names]
+    gate_ops = circuit_def.gate_ops
+    offsets = circuit_def.gate_offsets
+    operands = circuit_def.gate_operands
+
+    amplitudes = np.zeros((1, 1 << circuit_def.num_qubits), dtype=dtype)
+    amplitudes[0, 0] = 1
+    # Registers wider than an int64 fall back to Python integers.
+    clbit_dtype = np.int64 if num_clbits < 63 else object
+    start = _Branches(amplitudes, np.array([shots], dtype=np.int64),
+                      np.zeros(1, dtype=clbit_dtype), np.zeros((1, loops), dtype=np.int64))
+    heap = [(0, 0, start)]
+    pushed = 1
+    finished = []
+
+    def push(pc, group):
+        nonlocal pushed
+        heapq.heappush(heap, (pc, pushed, group))
+        pushed += 1
+
+    while heap:
+        # Lowest program counter first, so every branch that can still reach a
+        # join point arrives there before it is processed.
+        pc, _, group = heapq.heappop(heap)
+        waiting = [group]
+        while heap and heap[0][0] == pc:
+            waiting.append(heapq.heappop(heap)[2])
+        if len(waiting) > 1:
+            group = _Branches.concat(waiting)
+
+        while group is not None:
+            if pc == len(ops):
+                finished.append(group)
+                break
+            op = ops[pc]
+            code = op[0]
+            if code == _GATE:
+                i = op[1]
+                qubits = operands[offsets[i]:offsets[i + 1]].tolist()
+                spec = specs[gate_ops[i]]
+                spec.check_arity(len(qubits))
+                params = circuit_def.gate_values(i, parameters)
+                spec.check_params(len(params))
+                apply_gate(Statevector.from_batched(group.amplitudes), spec, qubits, matrices, params)
+                pc += 1
+            elif code == _MEASURE:
+                j = op[1]
+                group = _measure(group, circuit_def.measure_qubits[j], circuit_def.measure_clbits[j], rng)
+                pc += 1
+            elif code == _BRANCH:
+                group, skipped = group.split(_condition(group, op[1], op[2]))
+                if skipped is not None:
+                    push(op[3], skipped)
+                pc += 1
+            elif code == _JUMP:
+                pc = op[1]
+            elif code == _ENTER:
+                group.counters[:, op[1]] = 0
+                pc += 1
+            else:
+                _, clbit, value, exit_pc, loop, limit, bounded, line = op
+                running = _condition(group, clbit, value)
+                if bounded:
+                    running &= group.counters[:, loop] < limit
+                elif (group.counters[running, loop] >= limit).any():
+                    raise ValueError(f"while loop on line {line} did not finish within {limit} iterations")
+                group, done = group.split(running)
+                if done is not None:
+                    push(exit_pc, done)
+                if group is not None:
+                    group.counters[:, loop] += 1
+                pc += 1
+            if group is not None and pc in joins:
+                push(pc, group)
+                group = None
+
+    counts = _fold(finished, circuit_def, deferred, rng)
+    statevector = finished[0].amplitudes[0] if len(finished) == 1 and len(finished[0].shots) == 1 else None
+    return SimulationResult(circuit_def.name, statevector, counts, shots, 'branches')
@@ -0,0 +1,234 @@
+"""Depth, schedule and resource estimates of a parsed circuit, without Qiskit.
+
+``analyze_circuit`` walks the packed arrays of a ``QuantumCircuitDef`` once,
+keeping for every qubit the next free layer and the last operation on it,
+and returns a ``CircuitAnalysis``. Every gate, including a ``call`` of a
+module, a ``QFT``, a ``Diffuser`` or an ``oracle``, and every measurement
+takes one layer on each of its qubits. ``depth`` is therefore the depth
+with those gates kept opaque; it matches Qiskit's ``depth()`` of the
+translated circuit only when none of them is used, since translation
+expands ``QFT``, ``Diffuser`` and oracles into their decompositions. The
+body of a ``while`` loop counts once.
+"""
+
+from array import array
+from collections import Counter
+
+from instrumentation import span
+from stabilizer_simulator import clifford_obstacle
+from statevector_simulator import MAX_BATCH_AMPLITUDES
+
+# Bytes per amplitude of the native simulators (complex128).
+AMPLITUDE_SIZE = 16
+
+class CircuitAnalysis:
+    """Structure and resource figures of one circuit.
+
+    Operation ``k`` is gate ``k`` when ``k >= 0`` and measurement ``~k``
+    otherwise. ``gate_layers[i]`` and ``measure_layers[j]`` are the ASAP
+    layers of gate ``i`` and measurement ``j``, the earliest ones in which
+    all their qubits are free. ``critical_path`` lists the ``depth``
+    operations of one longest chain of dependent operations, first to last.
+    ``busy[q]`` counts the layers in which qubit ``q`` is used and
+    ``idle[q]`` the other layers up to ``depth``. ``gate_counts`` maps gate
+    and module names to their number of occurrences.
+    """
+
+    __slots__ = ('circuit', 'num_qubits', 'num_clbits', 'num_gates', 'num_measurements', 'depth',
+                 'gate_layers', 'measure_layers', 'critical_path', 'gate_counts', 'arity_counts',
+                 'busy', 'idle', 'control_flow', 'measures_midway', 'clifford')
+
+    def __init__(self, circuit_def):
+        self.circuit = circuit_def
+        self.num_qubits = circuit_def.num_qubits
+        self.num_clbits = len(circuit_def.classical_bits)
+        self.num_gates = circuit_def.num_gates
+        self.num_measurements = len(circuit_def.measure_qubits)
+        self.control_flow = bool(circuit_def.control_blocks)
+
+    @property
+    def name(self):
+        return self.circuit.name
+
+    @property
+    def two_qubit_gates(self):
+        return self.arity_counts.get(2, 0)
+
+    @property
+    def multi_qubit_gates(self):
+        """Gates on three or more qubits, module calls and ``QFT`` blocks included."""
+        return sum(count for arity, count in self.arity_counts.items() if arity > 2)
+
+    @property
+    def utilization(self):
+        """Fraction of qubit layers in which a qubit is busy."""
+        total = self.num_qubits * self.depth
+        return sum(self.busy) / total if total else 0.0
+
+    @property
+    def backend(self):
+        """The method ``simulate_circuit`` picks when the state is not kept, with symbolic angles left unbound."""
+        if self.control_flow or self.measures_midway:
+            return 'branches'
+        return 'stabilizer' if self.clifford else 'statevector'
+
+    def layer_widths(self):
+        """Return the number of operations in each layer of the ASAP schedule."""
+        widths = [0] * self.depth
+        for layer, count in Counter(self.gate_layers).items():
+            widths[layer] += count
+        for layer, count in Counter(self.measure_layers).items():
+            widths[layer] += count
+        return widths
+
+    def describe(self, op):
+        """Return ``'<gate> <qubits> (line <n>)'`` for operation ``op``."""
+        circuit_def = self.circuit
+        names = circuit_def.qubit_names
+        if op < 0:
+            j = ~op
+            return (f"measure {names[circuit_def.measure_qubits[j]]} "
+                    f"(line {circuit_def.measure_lines[j]})")
+        qubits = ' '.join(names[q] for q in circuit_def.gate_qubits(op))
+        return f"{circuit_def.opcode_names[circuit_def.gate_ops[op]]} {qubits} (line {circuit_def.gate_lines[op]})"
+
+    def memory(self, shots=1024, trajectories=None):
+        """Return an upper bound on the bytes of amplitudes each native backend allocates.
+
+        ``statevector`` holds one state. ``branches`` holds one state per
+        distinct measurement history, at most ``shots`` and two per
+        measurement. ``noisy`` holds the batch of trajectories
+        ``simulate_noisy`` would use, and is ``None`` for circuits with
+        control flow, which it rejects. ``stabilizer`` counts the tableau,
+        its transposed copy and the sampled outcomes, and is ``None`` unless
+        the circuit is Clifford.
+        """
+        state = AMPLITUDE_SIZE << self.num_qubits
+        rows = min(shots, 1 << min(self.num_measurements, 62)) if self.num_measurements else 1
+        estimates = {'statevector': state, 'branches': max(1, rows) * state, 'noisy': None, 'stabilizer': None}
+        if self.backend == 'stabilizer':
+            words = (self.num_qubits + 63) >> 6
+            estimates['stabilizer'] = 4 * 8 * words * self.num_qubits + shots * self.num_qubits
+        if not self.control_flow:
+            if trajectories is None:
+                trajectories = max(1, min(shots, 1024))
+            batch = max(1, min(trajectories, MAX_BATCH_AMPLITUDES >> self.num_qubits))
+            estimates['noisy'] = batch * state
+        return estimates
+
+    def asdict(self, critical_path=False, shots=1024):
+        """Return the figures as JSON-ready values; ``critical_path`` adds the described operations."""
+        record = {'circuit': self.name, 'qubits': self.num_qubits, 'clbits': self.num_clbits,
+                  'gates': self.num_gates, 'measurements': self.num_measurements, 'depth': self.depth,
+                  'two_qubit_gates': self.two_qubit_gates, 'multi_qubit_gates': self.multi_qubit_gates,
+                  'gate_counts': dict(self.gate_counts),
+                  'idle': dict(zip(self.circuit.qubit_names, self.idle)),
+                  'utilization': round(self.utilization, 4), 'backend': self.backend,
+                  'memory': self.memory(shots)}
+        if critical_path:
+            record['critical_path'] = [self.describe(op) for op in self.critical_path]
+        return record
+
+def analyze_circuit(circuit_def):
+    """Return the ``CircuitAnalysis`` of ``circuit_def`` in one pass over its operations."""
+    with span('analyze', circuit=circuit_def.name, gates=circuit_def.num_gates, qubits=circuit_def.num_qubits):
+        analysis = CircuitAnalysis(circuit_def)
+        num_gates = analysis.num_gates
+        num_measurements = analysis.num_measurements
+        operands = circuit_def.gate_operands
+        offsets = circuit_def.gate_offsets
+        positions = circuit_def.measure_positions
+        measure_qubits = circuit_def.measure_qubits
+
+        # frontier[q] is the first layer in which qubit q is free and last[q] the operation that filled the one before.
+        frontier = [0] * analysis.num_qubits
+        last = [None] * analysis.num_qubits
+        gate_layers = array('I', bytes(4 * num_gates))
+        measure_layers = array('I', bytes(4 * num_measurements))
+        # The operation each one waited for, the end of its longest chain of predecessors.
+        gate_previous = [None] * num_gates
+        measure_previous = [None] * num_measurements
+        arity_counts = Counter()
+        measured = set()
+        midway = False
+
+        j = 0
+        next_measure = positions[0] if num_measurements else -1
+        start = 0
+        for i in range(num_gates):
+            while next_measure == i:
+                q = measure_qubits[j]
+                measure_layers[j] = frontier[q]
+                measure_previous[j] = last[q]
+                frontier[q] += 1
+                last[q] = ~j
+                measured.add(q)
+                j += 1
+                next_measure = positions[j] if j < num_measurements else -1
+            end = offsets[i + 1]
+            arity = end - start
+            if arity == 1:
+                q = operands[start]
+                layer = frontier[q]
+                gate_previous[i] = last[q]
+                frontier[q] = layer + 1
+                last[q] = i
+            elif arity == 2:
+                a = operands[start]
+                b = operands[start + 1]
+                layer = frontier[a]
+                if frontier[b] > layer:
+                    layer = frontier[b]
+                    gate_previous[i] = last[b]
+                else:
+                    gate_previous[i] = last[a]
+                frontier[a] = frontier[b] = layer + 1
+                last[a] = last[b] = i
+            else:
+                arity_counts[arity] += 1
+                qubits = operands[start:end]
+                layer = max([frontier[q] for q in qubits], default=0)
+                for q in qubits:
+                    if frontier[q] == layer and gate_previous[i] is None:
+                        gate_previous[i] = last[q]
+                    frontier[q] = layer + 1
+                    last[q] = i
+            gate_layers[i] = layer
+            if measured and not midway:
+                midway = not measured.isdisjoint(operands[start:end])
+            start = end
+        for j in range(j, num_measurements):
+            q = measure_qubits[j]
+            measure_layers[j] = frontier[q]
+            measure_previous[j] = last[q]
+            frontier[q] += 1
+            last[q] = ~j
+
+        analysis.depth = max(frontier, default=0)
+        path = []
+        if analysis.depth:
+            op = last[frontier.index(analysis.depth)]
+            while op is not None:
+                path.append(op)
+                op = gate_previous[op] if op >= 0 else measure_previous[~op]
+        path.reverse()
+
+        if arity_counts:
+            arities = Counter(b - a for a, b in zip(offsets, offsets[1:]))
+        else:
+            # Only one- and two-qubit gates were seen, so the operand count gives the split.
+            two = len(operands) - num_gates
+            arities = Counter({1: num_gates - two, 2: two})
+        analysis.arity_counts = +arities
+        names = circuit_def.opcode_names
+        analysis.gate_counts = {names[opcode]: count for opcode, count in Counter(circuit_def.gate_ops).most_common()}
+        busy = Counter(operands)
+        busy.update(measure_qubits)
+        analysis.busy = [busy[q] for q in range(analysis.num_qubits)]
+        analysis.idle = [analysis.depth - count for count in analysis.busy]
+        analysis.gate_layers = gate_layers
+        analysis.measure_layers = measure_layers
+        analysis.critical_path = path
+        analysis.measures_midway = midway
+        analysis.clifford = clifford_obstacle(circuit_def) is None
+        return analysis
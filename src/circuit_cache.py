@@ -0,0 +1,222 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from instrumentation import count
+
+CACHE_FORMAT_VERSION = 3
+# Suffixes of the files the cache owns; nothing else in its directory is touched.
+CACHE_SUFFIXES = ('.qpy', '.png')
+# Eviction frees space down to this fraction of the limit, so a full cache rescans once per many writes.
+EVICT_LOW_WATER = 0.9
+DEFAULT_CACHE_DIR = os.environ.get('QADL_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'qadl'))
+
+def circuit_key(circuit_def):
+    """Return a content hash of everything that affects translation and drawing.
+
+    The key covers the packed gate and measurement arrays, the symbol
+    tables they index into and the keys of its modules, but not source line
+    numbers, so reformatting or commenting a script keeps its cache entries
+    valid.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+
+    def update(data):
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+
+    update(repr((
+        CACHE_FORMAT_VERSION,
+        circuit_def.name,
+        circuit_def.qubit_names,
+        circuit_def.opcode_names,
+        circuit_def.parameter_names,
+        list(circuit_def.classical_bits),
+        [block.astuple() for block in circuit_def.control_blocks],
+        [oracle.text for oracle in circuit_def.oracles.values()],
+    )).encode())
+    update(bytes(circuit_def.qubit_declared))
+    for buffer in (circuit_def.gate_ops, circuit_def.gate_offsets, circuit_def.gate_operands,
+                   circuit_def.gate_param_offsets, circuit_def.gate_params,
+                   circuit_def.gate_param_symbols, circuit_def.gate_param_scales,
+                   circuit_def.measure_qubits, circuit_def.measure_clbits,
+                   circuit_def.measure_positions):
+        update(buffer.tobytes())
+    for name in sorted(circuit_def.modules):
+        update(f"{name}:{circuit_key(circuit_def.modules[name])}".encode())
+    return digest.hexdigest()
+
+class CircuitCache:
+    """Two-tier cache of translated circuits and rendered diagrams.
+
+    Entries are keyed by ``circuit_key``. The memory tier is an LRU of at most
+    ``memory_entries`` circuits; the disk tier stores QPY-serialized circuits
+    and PNG diagrams under ``directory`` and evicts the least recently used
+    files once they exceed ``max_disk_bytes``. The disk size is kept as a
+    running total, scanned once and then updated per write, so the
+    directory is only rescanned when the total passes the limit. Files are written to a
+    temporary name and renamed into place, so concurrent runs never observe
+    a partially written entry. Cached circuits are shared and must not be
+    modified by callers.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, memory_entries=32, max_disk_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, circuit_def):
+        return circuit_key(circuit_def)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _remember(self, key, field, value):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                entry = self._memory[key] = {}
+            entry[field] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _recall(self, key, field):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and field in entry:
+                self._memory.move_to_end(key)
+                return entry[field]
+        return None
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _write(self, path, write):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix=os.path.splitext(path)[1])
+        os.close(fd)
+        try:
+            write(temp_path)
+            added = os.path.getsize(temp_path)
+            try:
+                added -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += added
+            over = self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+        if over:
+            self.evict()
+
+    def get_circuit(self, key):
+        qc = self._recall(key, 'circuit')
+        if qc is None:
+            path = self._path(key, '.qpy')
+            if self._touch(path):
+                from qiskit import qpy
+                with open(path, 'rb') as file:
+                    qc = qpy.load(file)[0]
+                self._remember(key, 'circuit', qc)
+        self._count(qc is not None, 'circuit')
+        return qc
+
+    def put_circuit(self, key, qc):
+        def write(path):
+            from qiskit import qpy
+            with open(path, 'wb') as file:
+                qpy.dump(qc, file)
+
+        self._remember(key, 'circuit', qc)
+        self._write(self._path(key, '.qpy'), write)
+
+    def get_image(self, key):
+        path = self._path(key, '.png')
+        found = self._touch(path)
+        self._count(found, 'image')
+        return path if found else None
+
+    def put_image(self, key, write):
+        """Store a diagram produced by ``write(filename)`` and return its path."""
+        path = self._path(key, '.png')
+        self._write(path, write)
+        return path
+
+    def _count(self, hit, kind):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        count('cache.hit' if hit else 'cache.miss', kind=kind)
+
+    def evict(self):
+        """Delete least recently used disk entries until the size limit holds.
+
+        Once over the limit, entries are removed down to ``EVICT_LOW_WATER``
+        of it. Only the cache's own ``.qpy`` and ``.png`` files are counted
+        or removed. The scan also resets the running total, which other
+        processes sharing the directory can make drift.
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if (entry.name.startswith('.tmp-') or not entry.name.endswith(CACHE_SUFFIXES)
+                        or not entry.is_file()):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total > self.max_disk_bytes:
+            target = self.max_disk_bytes * EVICT_LOW_WATER
+            entries.sort()
+            for _, size, path in entries:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= target:
+                    break
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = None
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_SUFFIXES) and not name.startswith('.tmp-'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+_caches = {}
+
+def get_cache(directory=DEFAULT_CACHE_DIR):
+    """Return the process-wide cache for ``directory``."""
+    cache = _caches.get(directory)
+    if cache is None:
+        cache = _caches[directory] = CircuitCache(directory)
+    return cache
@@ -0,0 +1,318 @@
+"""Diagram geometry of a parsed circuit and on-demand rendering of tiles of it.
+
+``CircuitLayout`` places every gate and measurement in a column once, in
+linear time, and indexes operations by column. ``render_tile`` draws one
+square tile of the diagram at a zoom level with PIL, touching only the
+operations in the tile's columns, so the cost of showing a diagram depends
+on the size of the viewport and not of the circuit.
+"""
+
+from array import array
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from gate_registry import ModuleSpec, resolve_gate
+from instrumentation import span
+
+COLUMN_WIDTH = 56
+ROW_HEIGHT = 44
+LABEL_WIDTH = 72
+TOP_MARGIN = 24
+BOX_SIZE = 32
+TILE_SIZE = 256
+
+# Below these zoom levels labels and then gate shapes stop being legible and are simplified.
+TEXT_ZOOM = 0.45
+DETAIL_ZOOM = 0.2
+
+BACKGROUND = '#ffffff'
+WIRE = '#555555'
+GATE_FILL = '#d9e8fb'
+GATE_OUTLINE = '#2a5b9c'
+MODULE_FILL = '#e6dcf5'
+PLACEHOLDER_FILL = '#fde2c8'
+MEASURE_FILL = '#eeeeee'
+BLOCK_FILL = '#f4f4e8'
+TEXT = '#111111'
+
+_TARGETS = ('CNOT', 'CX', 'CCNOT', 'Toffoli')
+_SWAPS = ('Swap', 'SWAP')
+
+class CircuitLayout:
+    """Column placement of the operations of ``circuit_def``.
+
+    Operation ``k`` is gate ``ops[k]`` or, when ``ops[k]`` is negative,
+    measurement ``~ops[k]``. It sits in column ``columns[k]`` and spans the
+    qubit rows ``low[k]`` to ``high[k]``. Operations are packed to the left
+    as soon as every wire they cross is free; ``if``/``while`` blocks start
+    and end on a column of their own and are listed in ``blocks`` as
+    ``(first_column, last_column, label)``. The operations of column ``c``
+    are ``column_ops[column_offsets[c]:column_offsets[c + 1]]``.
+    """
+
+    __slots__ = ('circuit', 'clbit_names', 'num_columns', 'ops', 'columns', 'low', 'high',
+                 'column_offsets', 'column_ops', 'blocks')
+
+    def __init__(self, circuit_def):
+        self.circuit = circuit_def
+        self.clbit_names = list(circuit_def.classical_bits)
+        self.ops = array('i')
+        self.columns = array('I')
+        self.low = array('I')
+        self.high = array('I')
+        self.blocks = []
+        with span('layout', circuit=circuit_def.name, gates=circuit_def.num_gates,
+                  qubits=circuit_def.num_qubits):
+            self._place()
+            self._index()
+
+    def _place(self):
+        circuit_def = self.circuit
+        free = [0] * max(1, circuit_def.num_qubits)
+        offsets = circuit_def.gate_offsets
+        operands = circuit_def.gate_operands
+        measure_qubits = circuit_def.measure_qubits
+        ops, columns, low, high = self.ops, self.columns, self.low, self.high
+        clbit_names = self.clbit_names
+
+        def place(op, lo, hi):
+            column = max(free[lo:hi + 1])
+            free[lo:hi + 1] = [column + 1] * (hi + 1 - lo)
+            ops.append(op)
+            columns.append(column)
+            low.append(lo)
+            high.append(hi)
+
+        def place_gate(i):
+            qubits = operands[offsets[i]:offsets[i + 1]]
+            if len(qubits):
+                place(i, min(qubits), max(qubits))
+
+        def barrier():
+            column = max(free)
+            free[:] = [column] * len(free)
+            return column
+
+        def walk(nodes):
+            for node in nodes:
+                kind = node[0]
+                if kind == 'gate':
+                    place_gate(node[1])
+                elif kind == 'measure':
+                    qubit = measure_qubits[node[1]]
+                    place(~node[1], qubit, qubit)
+                else:
+                    block = node[1]
+                    first = barrier()
+                    walk(node[2])
+                    if kind == 'if' and node[3]:
+                        walk(node[3])
+                    last = max(barrier(), first + 1)
+                    free[:] = [last] * len(free)
+                    operator = '==' if block.value else '!='
+                    label = f"{kind} ({clbit_names[block.clbit]} {operator} 1)"
+                    self.blocks.append((first, last - 1, label))
+
+        if circuit_def.control_blocks:
+            walk(circuit_def.program())
+        else:
+            # Without blocks the program is a merge of gates and measurements by position.
+            positions = circuit_def.measure_positions
+            num_measures = len(positions)
+            j = 0
+            for i in range(circuit_def.num_gates):
+                while j < num_measures and positions[j] <= i:
+                    place(~j, measure_qubits[j], measure_qubits[j])
+                    j += 1
+                start, end = offsets[i], offsets[i + 1]
+                if end - start == 1:
+                    lo = hi = operands[start]
+                    column = free[lo]
+                    free[lo] = column + 1
+                elif end > start:
+                    qubits = operands[start:end]
+                    lo, hi = min(qubits), max(qubits)
+                    column = max(free[lo:hi + 1])
+                    free[lo:hi + 1] = [column + 1] * (hi + 1 - lo)
+                else:
+                    continue
+                ops.append(i)
+                columns.append(column)
+                low.append(lo)
+                high.append(hi)
+            for j in range(j, num_measures):
+                place(~j, measure_qubits[j], measure_qubits[j])
+        self.num_columns = max(free) if len(ops) else 0
+
+    def _index(self):
+        # Counting sort of operations by column.
+        counts = array('I', bytes(4 * (self.num_columns + 1)))
+        for column in self.columns:
+            counts[column + 1] += 1
+        for c in range(self.num_columns):
+            counts[c + 1] += counts[c]
+        self.column_offsets = array('I', counts)
+        order = array('I', bytes(4 * len(self.ops)))
+        for k, column in enumerate(self.columns):
+            order[counts[column]] = k
+            counts[column] += 1
+        self.column_ops = order
+
+    @property
+    def num_rows(self):
+        return self.circuit.num_qubits
+
+    def size(self, zoom=1.0):
+        """Return the diagram size in pixels at ``zoom``."""
+        return (int((LABEL_WIDTH + COLUMN_WIDTH * (self.num_columns + 1)) * zoom) + 1,
+                int((TOP_MARGIN + ROW_HEIGHT * max(1, self.num_rows)) * zoom) + 1)
+
+    def operations_in(self, first_column, last_column):
+        """Return the indices of the operations in columns ``first_column`` to ``last_column``."""
+        first_column = max(0, first_column)
+        last_column = min(self.num_columns - 1, last_column)
+        if first_column > last_column:
+            return ()
+        return self.column_ops[self.column_offsets[first_column]:self.column_offsets[last_column + 1]]
+
+    def label(self, k):
+        """Return the text drawn for operation ``k``."""
+        op = self.ops[k]
+        circuit_def = self.circuit
+        if op < 0:
+            return f"M {self.clbit_names[circuit_def.measure_clbits[~op]]}"
+        name = circuit_def.opcode_names[circuit_def.gate_ops[op]]
+        params = circuit_def.gate_parameters(op)
+        if params:
+            name += '(' + ', '.join(f"{param:.3g}" if isinstance(param, float) else str(param)
+                                    for param in params) + ')'
+        return name
+
+def column_x(column):
+    return LABEL_WIDTH + COLUMN_WIDTH * (column + 0.5)
+
+def row_y(row):
+    return TOP_MARGIN + ROW_HEIGHT * (row + 0.5)
+
+@lru_cache(maxsize=16)
+def _font(size):
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow < 10.1 has only the fixed bitmap font
+        return ImageFont.load_default()
+
+def _fill(circuit_def, name):
+    try:
+        spec = resolve_gate(name, circuit_def)
+    except ValueError:
+        return PLACEHOLDER_FILL
+    if isinstance(spec, ModuleSpec):
+        return MODULE_FILL
+    if spec.factory is None and spec.expand is None and spec.matrix is None:
+        return PLACEHOLDER_FILL
+    return GATE_FILL
+
+def render_tile(layout, zoom, tile_x, tile_y, tile_size=TILE_SIZE):
+    """Draw tile ``(tile_x, tile_y)`` of the diagram at ``zoom`` and return it as an RGB ``Image``.
+
+    Tile ``(0, 0)`` has its top left corner at the top left of the diagram.
+    Qubit names are left to the viewer, which keeps them in view while
+    panning.
+    """
+    image = Image.new('RGB', (tile_size, tile_size), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    left = tile_x * tile_size / zoom
+    top = tile_y * tile_size / zoom
+    right = left + tile_size / zoom
+    bottom = top + tile_size / zoom
+    circuit_def = layout.circuit
+
+    def x(value):
+        return (value - left) * zoom
+
+    def y(value):
+        return (value - top) * zoom
+
+    first_column = int((left - LABEL_WIDTH) // COLUMN_WIDTH) - 1
+    last_column = int((right - LABEL_WIDTH) // COLUMN_WIDTH) + 1
+    first_row = max(0, int((top - TOP_MARGIN) // ROW_HEIGHT) - 1)
+    last_row = min(layout.num_rows - 1, int((bottom - TOP_MARGIN) // ROW_HEIGHT) + 1)
+    wire_end = LABEL_WIDTH + COLUMN_WIDTH * (layout.num_columns + 0.5)
+
+    for first, last, label in layout.blocks:
+        if last < first_column or first > last_column:
+            continue
+        box = (x(column_x(first) - COLUMN_WIDTH / 2), y(TOP_MARGIN / 4),
+               x(column_x(last) + COLUMN_WIDTH / 2), y(TOP_MARGIN + ROW_HEIGHT * layout.num_rows))
+        draw.rectangle(box, fill=BLOCK_FILL, outline=WIRE)
+        if zoom >= TEXT_ZOOM:
+            draw.text((box[0] + 3 * zoom, box[1] + 2 * zoom), label, fill=TEXT, font=_font(max(8, int(10 * zoom))))
+
+    wire_start = LABEL_WIDTH - 8
+    if wire_start < right and wire_end > left:
+        for row in range(first_row, last_row + 1):
+            draw.line((x(max(wire_start, left)), y(row_y(row)), x(min(wire_end, right)), y(row_y(row))),
+                      fill=WIRE, width=max(1, round(zoom)))
+
+    if first_column > layout.num_columns or last_column < 0:
+        return image
+    half = BOX_SIZE / 2
+    font = _font(max(8, int(12 * zoom)))
+    fills = {}
+    operands = circuit_def.gate_operands
+    offsets = circuit_def.gate_offsets
+    line_width = max(1, round(zoom))
+
+    for k in layout.operations_in(first_column, last_column):
+        lo, hi = layout.low[k], layout.high[k]
+        if hi < first_row or lo > last_row:
+            continue
+        center = column_x(layout.columns[k])
+        op = layout.ops[k]
+        if op < 0:
+            qubits = (lo,)
+            name = None
+            fill = MEASURE_FILL
+        else:
+            qubits = operands[offsets[op]:offsets[op + 1]]
+            name = circuit_def.opcode_names[circuit_def.gate_ops[op]]
+            fill = fills.get(name)
+            if fill is None:
+                fill = fills[name] = _fill(circuit_def, name)
+
+        if zoom < DETAIL_ZOOM:
+            # Far out every operation is a solid bar over the rows it spans.
+            draw.rectangle((x(center - half), y(row_y(lo) - half), x(center + half), y(row_y(hi) + half)),
+                           fill=GATE_OUTLINE)
+            continue
+
+        if name in _TARGETS or name in _SWAPS or name == 'CZ':
+            draw.line((x(center), y(row_y(lo)), x(center), y(row_y(hi))), fill=GATE_OUTLINE, width=line_width)
+            for position, qubit in enumerate(qubits):
+                cx, cy = x(center), y(row_y(qubit))
+                if name in _SWAPS:
+                    r = 6 * zoom
+                    draw.line((cx - r, cy - r, cx + r, cy + r), fill=GATE_OUTLINE, width=line_width)
+                    draw.line((cx - r, cy + r, cx + r, cy - r), fill=GATE_OUTLINE, width=line_width)
+                elif name in _TARGETS and position == len(qubits) - 1:
+                    r = 10 * zoom
+                    draw.ellipse((cx - r, cy - r, cx + r, cy + r), fill=BACKGROUND, outline=GATE_OUTLINE,
+                                 width=line_width)
+                    draw.line((cx - r, cy, cx + r, cy), fill=GATE_OUTLINE, width=line_width)
+                    draw.line((cx, cy - r, cx, cy + r), fill=GATE_OUTLINE, width=line_width)
+                else:
+                    r = 4 * zoom
+                    draw.ellipse((cx - r, cy - r, cx + r, cy + r), fill=GATE_OUTLINE)
+            continue
+
+        box = (x(center - half), y(row_y(lo) - half), x(center + half), y(row_y(hi) + half))
+        draw.rectangle(box, fill=fill, outline=GATE_OUTLINE, width=line_width)
+        if zoom >= TEXT_ZOOM:
+            text = layout.label(k)
+            while len(text) > 1 and draw.textlength(text, font=font) > box[2] - box[0] - 2:
+                text = text[:-1]
+            _, text_top, _, text_bottom = draw.textbbox((0, 0), text, font=font)
+            draw.text(((box[0] + box[2] - draw.textlength(text, font=font)) / 2,
+                       (box[1] + box[3] - text_top - text_bottom) / 2), text, fill=TEXT, font=font)
+    return image
@@ -0,0 +1,290 @@
+import copy
+import math
+
+from gate_registry import ModuleSpec, OracleSpec, lookup_gate, resolve_gate
+from instrumentation import span
+from qiskit_parser import GateParameter
+
+# Gates that are their own inverse.
+SELF_INVERSE = {'H', 'X', 'Y', 'Z', 'CNOT', 'CZ', 'Swap', 'CCNOT'}
+
+# Gates whose qubit order does not matter.
+SYMMETRIC = {'CZ', 'Swap'}
+
+# Basis in which each gate is diagonal on each of its qubits: 'Z' for the
+# computational basis, 'X' for the Hadamard basis. Two gates commute when
+# every qubit they share has the same role in both.
+COMMUTATION_ROLES = {
+    'X': ('X',), 'RX': ('X',),
+    'Z': ('Z',), 'S': ('Z',), 'Sdg': ('Z',), 'T': ('Z',), 'Tdg': ('Z',), 'Phase': ('Z',), 'P': ('Z',), 'RZ': ('Z',),
+    'CNOT': ('Z', 'X'),
+    'CZ': ('Z', 'Z'), 'CR': ('Z', 'Z'), 'CR2': ('Z', 'Z'), 'CRZ': ('Z', 'Z'), 'CP': ('Z', 'Z'), 'RZZ': ('Z', 'Z'),
+    'CCNOT': ('Z', 'Z', 'X'),
+}
+
+# Rotation families: gate -> (family, angle). Consecutive members of a family
+# on the same qubits add their angles and are re-emitted as the gate named in
+# ROTATION_GATES, or dropped when the total is a multiple of the period.
+ROTATIONS = {
+    'Phase': ('phase', math.pi / 2),
+    'S': ('phase', math.pi / 2),
+    'Sdg': ('phase', -math.pi / 2),
+    'T': ('phase', math.pi / 4),
+    'Tdg': ('phase', -math.pi / 4),
+    'Z': ('phase', math.pi),
+    'CR': ('crz', 0.5),
+    'CR2': ('crz', 1.0),
+}
+ROTATION_PERIODS = {'phase': 2 * math.pi, 'crz': 4 * math.pi}
+ROTATION_GATES = {
+    'phase': {math.pi / 4: 'T', math.pi / 2: 'S', math.pi: 'Z', 3 * math.pi / 2: 'Sdg', 7 * math.pi / 4: 'Tdg'},
+    'crz': {0.5: 'CR', 1.0: 'CR2'},
+}
+
+# Single-angle gates where two in a row on the same qubits add their angles,
+# with the period after which the angle is the identity.
+PARAMETER_PERIODS = {
+    'Phase': 2 * math.pi, 'P': 2 * math.pi, 'CP': 2 * math.pi,
+    'RX': 4 * math.pi, 'RY': 4 * math.pi, 'RZ': 4 * math.pi,
+    'CR': 4 * math.pi, 'CR2': 4 * math.pi, 'CRZ': 4 * math.pi, 'RZZ': 4 * math.pi,
+}
+
+class OptimizationReport:
+    """Counts of what ``optimize_circuit`` removed and how much depth it saved."""
+
+    def __init__(self, gates_before, gates_after, depth_before, depth_after, cancelled, merged, placeholders):
+        self.gates_before = gates_before
+        self.gates_after = gates_after
+        self.depth_before = depth_before
+        self.depth_after = depth_after
+        self.cancelled = cancelled
+        self.merged = merged
+        self.placeholders = placeholders
+
+    @property
+    def gates_removed(self):
+        return self.gates_before - self.gates_after
+
+    @property
+    def depth_saved(self):
+        return self.depth_before - self.depth_after
+
+    def __repr__(self):
+        return (f"OptimizationReport(gates {self.gates_before} -> {self.gates_after}, "
+                f"depth {self.depth_before} -> {self.depth_after}, cancelled={self.cancelled}, "
+                f"merged={self.merged}, placeholders={self.placeholders})")
+
+class _Gate:
+    __slots__ = ('name', 'kind', 'qubits', 'params', 'line', 'alive')
+
+    def __init__(self, name, kind, qubits, params, line):
+        self.name = name
+        self.kind = kind
+        self.qubits = qubits
+        self.params = params
+        self.line = line
+        self.alive = True
+
+def _same_operands(a, b):
+    if a.qubits == b.qubits:
+        return True
+    return a.kind in SYMMETRIC and sorted(a.qubits) == sorted(b.qubits)
+
+def _commutes(a, b):
+    roles_a = COMMUTATION_ROLES.get(a.kind)
+    roles_b = COMMUTATION_ROLES.get(b.kind)
+    if roles_a is None or roles_b is None:
+        return False
+    for qubit, role in zip(a.qubits, roles_a):
+        if qubit in b.qubits and roles_b[b.qubits.index(qubit)] != role:
+            return False
+    return True
+
+def _merged_rotation(a, b):
+    """Return the gate name replacing ``a`` followed by ``b``, '' to drop both, or None."""
+    rotation_a = ROTATIONS.get(a.kind)
+    rotation_b = ROTATIONS.get(b.kind)
+    if rotation_a is None or rotation_b is None or rotation_a[0] != rotation_b[0]:
+        return None
+    family = rotation_a[0]
+    period = ROTATION_PERIODS[family]
+    angle = (rotation_a[1] + rotation_b[1]) % period
+    if math.isclose(angle, 0, abs_tol=1e-12) or math.isclose(angle, period, abs_tol=1e-12):
+        return ''
+    for candidate, name in ROTATION_GATES[family].items():
+        if math.isclose(angle, candidate, abs_tol=1e-12):
+            return name
+    return None
+
+def _add_angles(a, b):
+    if isinstance(a, GateParameter) or isinstance(b, GateParameter):
+        if not isinstance(a, GateParameter):
+            a, b = b, a
+        if not isinstance(b, GateParameter):
+            return GateParameter(a.name, a.scale, a.offset + b)
+        if a.name != b.name:
+            return None
+        if a.scale + b.scale == 0:
+            return a.offset + b.offset
+        return GateParameter(a.name, a.scale + b.scale, a.offset + b.offset)
+    return a + b
+
+def _combine(a, b):
+    """Return what replaces ``a`` followed by ``b``.
+
+    '' drops both, a string renames ``a``, a tuple replaces the parameters of
+    ``a``, and None means the pair does not combine.
+    """
+    if a.params or b.params:
+        period = PARAMETER_PERIODS.get(a.kind)
+        if period is None or a.kind != b.kind:
+            return None
+        angle = _add_angles((a.params or lookup_gate(a.kind).defaults)[0],
+                            (b.params or lookup_gate(b.kind).defaults)[0])
+        if angle is None:
+            return None
+        if not isinstance(angle, GateParameter) and math.isclose(math.remainder(angle, period), 0, abs_tol=1e-12):
+            return ''
+        return (angle,)
+    if a.kind == b.kind and a.kind in SELF_INVERSE:
+        return ''
+    return _merged_rotation(a, b)
+
+def _depth(gate_qubits, measure_qubits):
+    frontier = {}
+    depth = 0
+    for qubits in gate_qubits:
+        level = 1 + max((frontier.get(q, 0) for q in qubits), default=0)
+        for q in qubits:
+            frontier[q] = level
+        depth = max(depth, level)
+    for q in measure_qubits:
+        frontier[q] = frontier.get(q, 0) + 1
+        depth = max(depth, frontier[q])
+    return depth
+
+def optimize_circuit(circuit_def, max_lookback=32):
+    """Return an optimized copy of ``circuit_def`` and an ``OptimizationReport``.
+
+    A single pass keeps, for each qubit, the list of surviving gates on it.
+    Each new gate walks back at most ``max_lookback`` gates on its qubits,
+    skipping gates it commutes with, looking for an identical self-inverse
+    gate to cancel or a rotation of the same family to merge into.
+    Placeholder gates with no translation (e.g. an unimplemented ``Oracle``)
+    are dropped and module calls are kept as opaque gates. Measurements are
+    barriers on their qubit and the edges of ``if``/``while`` blocks are
+    barriers on every qubit.
+    """
+    with span('optimize', circuit=circuit_def.name, gates=circuit_def.num_gates,
+              qubits=circuit_def.num_qubits) as stage:
+        optimized, report = _optimize(circuit_def, max_lookback)
+        stage.set(kept=report.gates_after, cancelled=report.cancelled, merged=report.merged)
+    return optimized, report
+
+def _optimize(circuit_def, max_lookback):
+    specs = [resolve_gate(name, circuit_def) for name in circuit_def.opcode_names]
+    placeholder = [not isinstance(spec, ModuleSpec) and spec.factory is None and spec.expand is None
+                   and spec.matrix is None for spec in specs]
+    offsets = circuit_def.gate_offsets
+    operands = circuit_def.gate_operands
+    lines = circuit_def.gate_lines
+    measure_positions = circuit_def.measure_positions
+    boundaries = {}
+    for block in circuit_def.control_blocks:
+        boundaries.update(dict.fromkeys((block.gate_start, block.gate_else, block.gate_end)))
+
+    gates = []
+    timeline = {}
+    measured_after = []
+    cancelled = merged = placeholders = 0
+    next_measure = 0
+
+    for i, opcode in enumerate(circuit_def.gate_ops):
+        while next_measure < len(measure_positions) and measure_positions[next_measure] <= i:
+            timeline[circuit_def.measure_qubits[next_measure]] = []
+            measured_after.append(len(gates))
+            next_measure += 1
+        if i in boundaries:
+            boundaries[i] = len(gates)
+            timeline.clear()
+        if placeholder[opcode]:
+            placeholders += 1
+            continue
+        spec = specs[opcode]
+        spec.check_arity(offsets[i + 1] - offsets[i])
+        # Module calls and oracles get no kind, so they never cancel, merge or commute.
+        gate = _Gate(circuit_def.opcode_names[opcode], None if isinstance(spec, (ModuleSpec, OracleSpec)) else spec.name,
+                     tuple(operands[offsets[i]:offsets[i + 1]]),
+                     tuple(circuit_def.gate_parameters(i)), lines[i])
+
+        partner = None
+        replacement = None
+        positions = {}
+        for qubit in gate.qubits:
+            history = timeline.get(qubit, ())
+            found = None
+            for position in range(len(history) - 1, max(len(history) - max_lookback, 0) - 1, -1):
+                previous = history[position]
+                if _same_operands(previous, gate):
+                    replacement = _combine(previous, gate)
+                    if replacement is not None:
+                        found = previous
+                        positions[qubit] = position
+                        break
+                if not _commutes(previous, gate):
+                    break
+            if found is None or (partner is not None and found is not partner):
+                partner = None
+                break
+            partner = found
+
+        if partner is not None:
+            if isinstance(replacement, tuple):
+                partner.params = replacement
+                merged += 1
+            elif replacement:
+                partner.name = partner.kind = replacement
+                merged += 1
+            else:
+                partner.alive = False
+                for qubit, position in positions.items():
+                    del timeline[qubit][position]
+                cancelled += 2
+            continue
+
+        gates.append(gate)
+        for qubit in gate.qubits:
+            timeline.setdefault(qubit, []).append(gate)
+
+    optimized = circuit_def.empty_copy()
+    live_index = []
+    for gate in gates:
+        live_index.append(len(optimized.gate_ops))
+        if gate.alive:
+            optimized.append_gate(gate.name, [circuit_def.qubit_names[q] for q in gate.qubits], gate.params, gate.line)
+    live_index.append(len(optimized.gate_ops))
+
+    for gate in boundaries:
+        if boundaries[gate] is None:
+            boundaries[gate] = len(gates)
+    for block in circuit_def.control_blocks:
+        moved = copy.copy(block)
+        moved.gate_start = live_index[boundaries[block.gate_start]]
+        moved.gate_else = live_index[boundaries[block.gate_else]]
+        moved.gate_end = live_index[boundaries[block.gate_end]]
+        optimized.control_blocks.append(moved)
+
+    names = circuit_def.qubit_names
+    clbit_names = list(circuit_def.classical_bits)
+    for j, (qubit, clbit) in enumerate(zip(circuit_def.measure_qubits, circuit_def.measure_clbits)):
+        position = live_index[measured_after[j]] if j < len(measured_after) else len(optimized.gate_ops)
+        optimized.append_measurement(names[qubit], clbit_names[clbit], circuit_def.measure_lines[j])
+        optimized.measure_positions[j] = position
+
+    report = OptimizationReport(
+        circuit_def.num_gates, optimized.num_gates,
+        _depth((circuit_def.gate_qubits(i) for i in range(circuit_def.num_gates)), circuit_def.measure_qubits),
+        _depth((optimized.gate_qubits(i) for i in range(optimized.num_gates)), optimized.measure_qubits),
+        cancelled, merged, placeholders,
+    )
+    return optimized, report
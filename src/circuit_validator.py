@@ -0,0 +1,216 @@
+"""Semantic checks of parsed circuits, run before any translation or simulation.
+
+``validate_circuit`` makes one pass over the packed arrays of a circuit and
+its modules and returns every problem it finds as a ``Diagnostic`` with its
+source line. Problems repeated on many gates are reported once, at their
+first line, with an occurrence count.
+"""
+
+from itertools import islice
+
+from gate_registry import ModuleSpec, resolve_gate
+from hardware_routing import CouplingGraph
+
+ERROR = 'error'
+WARNING = 'warning'
+
+_RATE_KEYS = ('decoherence_rate', 'amplitude_damping', 'phase_damping')
+
+class Diagnostic:
+    __slots__ = ('severity', 'line', 'message', 'circuit', 'count')
+
+    def __init__(self, severity, line, message, circuit, count=1):
+        self.severity = severity
+        self.line = line
+        self.message = message
+        self.circuit = circuit
+        self.count = count
+
+    def __str__(self):
+        text = f"Line {self.line}: {self.message}" if self.line else self.message
+        if self.count > 1:
+            text += f" ({self.count} occurrences)"
+        return text
+
+    def __repr__(self):
+        return f"Diagnostic({self.severity!r}, {self.line!r}, {self.message!r}, {self.circuit!r}, {self.count!r})"
+
+    def asdict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+class ValidationError(ValueError):
+    """Raised by ``check_circuit``; ``diagnostics`` holds every error found."""
+
+    def __init__(self, diagnostics):
+        self.diagnostics = diagnostics
+        super().__init__('; '.join(f"{diagnostic.circuit}: {diagnostic}" for diagnostic in diagnostics))
+
+class _Report:
+    """Diagnostics of one circuit, merging repeats of the same problem."""
+
+    def __init__(self, circuit):
+        self.circuit = circuit
+        self.diagnostics = []
+        self._seen = {}
+
+    def add(self, severity, line, message, key=None):
+        if key is not None:
+            diagnostic = self._seen.get(key)
+            if diagnostic is not None:
+                diagnostic.count += 1
+                return
+        diagnostic = Diagnostic(severity, line, message, self.circuit)
+        self.diagnostics.append(diagnostic)
+        if key is not None:
+            self._seen[key] = diagnostic
+
+def _coupling(circuit_def, report):
+    # The graph of the hardware block, when the circuit's qubits are its nodes and routing keeps them in place.
+    entries = [(args[0], line) for key, args, line in circuit_def.hardware_entries if key == 'qubit_connectivity']
+    if not entries:
+        return None
+    valid = []
+    for text, line in entries:
+        try:
+            CouplingGraph.from_connectivity([text])
+        except ValueError as error:
+            report.add(ERROR, line, str(error))
+            continue
+        valid.append(text)
+    graph = CouplingGraph.from_connectivity(valid)
+    if circuit_def.num_qubits > len(graph.nodes):
+        report.add(ERROR, entries[0][1], f"Circuit {circuit_def.name} needs {circuit_def.num_qubits} qubits "
+                                         f"but the hardware has {len(graph.nodes)}")
+        return None
+    if not all(name in graph.index for name in circuit_def.qubit_names):
+        return None
+    return [graph.index[name] for name in circuit_def.qubit_names], graph
+
+def _check_hardware(circuit_def, report):
+    for key, args, line in circuit_def.hardware_entries:
+        if key not in _RATE_KEYS:
+            continue
+        if len(args) != 2:
+            report.add(ERROR, line, f"Expected '{key} <qubit> <rate>'")
+            continue
+        qubit, rate = args
+        if qubit not in circuit_def.qubit_index:
+            report.add(ERROR, line, f"Unknown qubit '{qubit}' in {key}")
+        try:
+            valid = 0 <= float(rate) <= 1
+        except ValueError:
+            valid = False
+        if not valid:
+            report.add(ERROR, line, f"Invalid {key} value '{rate}', expected a probability between 0 and 1")
+
+def _check_gates(circuit_def, report, coupling):
+    specs = []
+    for name in circuit_def.opcode_names:
+        try:
+            specs.append(resolve_gate(name, circuit_def))
+        except ValueError:
+            specs.append(None)
+    declared = circuit_def.qubit_declared
+    names = circuit_def.qubit_names
+    lines = circuit_def.gate_lines
+    operands = circuit_def.gate_operands
+    offsets = circuit_def.gate_offsets
+    param_offsets = circuit_def.gate_param_offsets
+    undeclared = not all(declared)
+    placeholder = [spec is not None and not isinstance(spec, ModuleSpec) and spec.factory is None
+                   and spec.expand is None and spec.matrix is None for spec in specs]
+    physical, graph = coupling if coupling is not None else (None, None)
+
+    rows = zip(circuit_def.gate_ops, offsets, islice(offsets, 1, None), param_offsets, islice(param_offsets, 1, None))
+    for i, (opcode, start, end, param_start, param_end) in enumerate(rows):
+        spec = specs[opcode]
+        arity = end - start
+        if spec is None:
+            name = circuit_def.opcode_names[opcode]
+            report.add(ERROR, lines[i], f"Unsupported gate: {name}", ('gate', opcode))
+            continue
+        if spec.num_qubits is not None and arity != spec.num_qubits:
+            report.add(ERROR, lines[i], f"Gate {spec.name} expects {spec.num_qubits} qubit(s), got {arity}",
+                       ('arity', opcode, arity))
+        count = param_end - param_start
+        if count != spec.num_params and not (count == 0 and spec.defaults):
+            report.add(ERROR, lines[i], f"Gate {spec.name} expects {spec.num_params} parameter(s), got {count}",
+                       ('params', opcode, count))
+        if arity == 2:
+            a, b = operands[start], operands[start + 1]
+            if a == b:
+                report.add(ERROR, lines[i], f"Gate {spec.name} uses qubit {names[a]} twice")
+            elif graph is not None:
+                distance = graph.distance[physical[a]][physical[b]]
+                if distance is None:
+                    report.add(ERROR, lines[i], f"Qubits {names[a]} and {names[b]} are on disconnected parts "
+                                                f"of the hardware", ('disconnected', a, b))
+                elif distance > 1:
+                    report.add(WARNING, lines[i], f"Qubits {names[a]} and {names[b]} are not coupled; routing "
+                                                  f"will insert swaps", ('coupling', a, b))
+        elif arity > 2 and len(set(operands[start:end])) != arity:
+            report.add(ERROR, lines[i], f"Gate {spec.name} uses a qubit more than once")
+        if undeclared:
+            for qubit in operands[start:end]:
+                if not declared[qubit]:
+                    report.add(ERROR, lines[i], f"Undeclared qubit: {names[qubit]}", ('qubit', qubit))
+        if placeholder[opcode]:
+            report.add(WARNING, lines[i], f"Gate {spec.name} has no implementation and is skipped",
+                       ('placeholder', opcode))
+
+    if undeclared:
+        for j, qubit in enumerate(circuit_def.measure_qubits):
+            if not declared[qubit]:
+                report.add(ERROR, circuit_def.measure_lines[j], f"Undeclared qubit: {names[qubit]}", ('qubit', qubit))
+
+def _check_classical_bits(circuit_def, report):
+    first_write = {}
+    for j, clbit in enumerate(circuit_def.measure_clbits):
+        first_write.setdefault(clbit, j)
+    clbit_names = list(circuit_def.classical_bits)
+    for block in circuit_def.control_blocks:
+        name = clbit_names[block.clbit]
+        written = first_write.get(block.clbit)
+        if written is None:
+            report.add(ERROR, block.line, f"Unknown classical bit '{name}': no measurement writes it",
+                       ('clbit', block.clbit))
+        elif block.kind == 'if' and written >= block.measure_start:
+            report.add(WARNING, block.line, f"Classical bit '{name}' is read before it is measured and is still 0")
+
+def validate_circuit(circuit_def, hardware=True):
+    """Return the diagnostics of ``circuit_def`` and every module it calls, errors first.
+
+    Checks that every qubit is declared, every gate is known and gets the
+    right number of distinct qubits and parameters, every ``if``/``while``
+    condition reads a measured classical bit and the ``hardware`` block
+    names existing qubits. With ``hardware`` and a ``qubit_connectivity``
+    block naming the circuit's qubits, two-qubit gates are also checked
+    against the coupling map.
+    """
+    diagnostics = []
+    pending = [(circuit_def, hardware)]
+    seen = {id(circuit_def)}
+    while pending:
+        circuit, check_hardware = pending.pop()
+        report = _Report(circuit.name)
+        coupling = None
+        if check_hardware:
+            coupling = _coupling(circuit, report)
+            _check_hardware(circuit, report)
+        _check_gates(circuit, report, coupling)
+        _check_classical_bits(circuit, report)
+        diagnostics.extend(report.diagnostics)
+        for module in circuit.modules.values():
+            if id(module) not in seen:
+                seen.add(id(module))
+                pending.append((module, False))
+    diagnostics.sort(key=lambda diagnostic: (diagnostic.severity != ERROR, diagnostic.line or 0))
+    return diagnostics
+
+def check_circuit(circuit_def, hardware=True):
+    """Raise ``ValidationError`` listing every error of ``circuit_def``; return its warnings."""
+    diagnostics = validate_circuit(circuit_def, hardware)
+    errors = [diagnostic for diagnostic in diagnostics if diagnostic.severity == ERROR]
+    if errors:
+        raise ValidationError(errors)
+    return diagnostics
@@ -0,0 +1,250 @@
+"""Zoomable Tk view of a ``CircuitLayout`` that renders only the visible tiles."""
+
+import math
+import tkinter as tk
+from collections import OrderedDict
+
+from PIL import ImageTk
+
+from circuit_layout import LABEL_WIDTH, ROW_HEIGHT, TILE_SIZE, TOP_MARGIN, render_tile, row_y
+
+MIN_ZOOM = 1 / 64
+MAX_ZOOM = 4.0
+ZOOM_STEP = 1.25
+# Tiles kept per visible tile; older ones are dropped least recently used first.
+TILE_CACHE_FACTOR = 3
+TILES_PER_IDLE = 4
+
+def _zoom_level(zoom):
+    # Zoom levels are powers of ZOOM_STEP so tiles of a level are reused when coming back to it.
+    return ZOOM_STEP ** round(math.log(max(MIN_ZOOM, min(MAX_ZOOM, zoom)), ZOOM_STEP))
+
+class CircuitViewer(tk.Frame):
+    """Canvas with scrollbars showing a ``CircuitLayout`` with pan and zoom.
+
+    The canvas never holds the whole diagram: the view is an offset into it
+    and only the tiles intersecting the window are placed, rendered a few
+    per idle callback, nearest to the centre first. Rendered tiles are kept
+    in an LRU sized from the window, so memory follows the window size and
+    not the circuit size. Drag to pan, use the wheel to scroll (with Shift
+    to scroll sideways) and Ctrl+wheel or ``+``/``-`` to zoom; ``0`` fits
+    the diagram to the window.
+    """
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.canvas = tk.Canvas(self, background='white', highlightthickness=0)
+        self.hbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self._xview)
+        self.vbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self._yview)
+        self.hbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.vbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.layout = None
+        self.zoom = 1.0
+        self.left = 0
+        self.top = 0
+        self._tiles = OrderedDict()
+        self._items = {}
+        self._pending = []
+        self._limit = 0
+        self._render_after_id = None
+        self._drag = None
+
+        canvas = self.canvas
+        canvas.bind('<Configure>', lambda event: self.refresh())
+        canvas.bind('<ButtonPress-1>', self._start_drag)
+        canvas.bind('<B1-Motion>', self._drag_to)
+        canvas.bind('<MouseWheel>', self._wheel)
+        canvas.bind('<Shift-MouseWheel>', lambda event: self._wheel(event, horizontal=True))
+        canvas.bind('<Control-MouseWheel>', lambda event: self._wheel(event, zoom=True))
+        for button, direction in (('4', 1), ('5', -1)):  # X11 reports the wheel as buttons 4 and 5
+            canvas.bind(f'<Button-{button}>', lambda event, d=direction: self._wheel(event, delta=d))
+            canvas.bind(f'<Shift-Button-{button}>',
+                        lambda event, d=direction: self._wheel(event, delta=d, horizontal=True))
+            canvas.bind(f'<Control-Button-{button}>',
+                        lambda event, d=direction: self._wheel(event, delta=d, zoom=True))
+        canvas.bind('<Enter>', lambda event: canvas.focus_set())
+        canvas.bind('<plus>', lambda event: self.zoom_by(ZOOM_STEP))
+        canvas.bind('<equal>', lambda event: self.zoom_by(ZOOM_STEP))
+        canvas.bind('<minus>', lambda event: self.zoom_by(1 / ZOOM_STEP))
+        canvas.bind('<Key-0>', lambda event: self.fit())
+
+    def show(self, layout):
+        """Display ``layout`` from its top left corner, keeping the zoom level."""
+        self.layout = layout
+        self.left = self.top = 0
+        self._clear()
+        self.refresh()
+
+    def clear(self):
+        self.layout = None
+        self._clear()
+        self.refresh()
+
+    def _clear(self):
+        self.canvas.delete('all')
+        self._tiles.clear()
+        self._items.clear()
+        self._pending = []
+
+    def _viewport(self):
+        return max(1, self.canvas.winfo_width()), max(1, self.canvas.winfo_height())
+
+    def _clamp(self):
+        width, height = self._viewport()
+        diagram_width, diagram_height = self.layout.size(self.zoom)
+        self.left = int(max(0, min(self.left, diagram_width - width)))
+        self.top = int(max(0, min(self.top, diagram_height - height)))
+
+    def zoom_by(self, factor, anchor_x=None, anchor_y=None):
+        """Zoom by ``factor`` keeping the diagram point under ``(anchor_x, anchor_y)`` in place."""
+        self.set_zoom(self.zoom * factor, anchor_x, anchor_y)
+
+    def set_zoom(self, zoom, anchor_x=None, anchor_y=None):
+        zoom = _zoom_level(zoom)
+        if self.layout is None or zoom == self.zoom:
+            self.zoom = zoom
+            return
+        width, height = self._viewport()
+        anchor_x = width / 2 if anchor_x is None else anchor_x
+        anchor_y = height / 2 if anchor_y is None else anchor_y
+        scale = zoom / self.zoom
+        self.left = (self.left + anchor_x) * scale - anchor_x
+        self.top = (self.top + anchor_y) * scale - anchor_y
+        self.zoom = zoom
+        self.refresh()
+
+    def fit(self):
+        """Zoom so the whole diagram height, and width if it allows, fits the window."""
+        if self.layout is None:
+            return
+        width, height = self._viewport()
+        diagram_width, diagram_height = self.layout.size(1.0)
+        self.zoom = _zoom_level(min(width / diagram_width, height / diagram_height, 1.0))
+        self.left = self.top = 0
+        self.refresh()
+
+    def _xview(self, *args):
+        self._scroll(args, horizontal=True)
+
+    def _yview(self, *args):
+        self._scroll(args, horizontal=False)
+
+    def _scroll(self, args, horizontal):
+        if self.layout is None:
+            return
+        width, height = self._viewport()
+        extent = self.layout.size(self.zoom)[0 if horizontal else 1]
+        window = width if horizontal else height
+        if args[0] == 'moveto':
+            offset = float(args[1]) * extent
+        else:
+            step = window * 0.9 if args[2] == 'pages' else 40
+            offset = (self.left if horizontal else self.top) + int(args[1]) * step
+        if horizontal:
+            self.left = offset
+        else:
+            self.top = offset
+        self.refresh()
+
+    def _start_drag(self, event):
+        self._drag = (event.x, event.y, self.left, self.top)
+
+    def _drag_to(self, event):
+        if self._drag is None or self.layout is None:
+            return
+        x, y, left, top = self._drag
+        self.left = left - (event.x - x)
+        self.top = top - (event.y - y)
+        self.refresh()
+
+    def _wheel(self, event, horizontal=False, zoom=False, delta=None):
+        if delta is None:
+            delta = 1 if event.delta > 0 else -1
+        if zoom:
+            self.zoom_by(ZOOM_STEP if delta > 0 else 1 / ZOOM_STEP, event.x, event.y)
+        else:
+            self._scroll(('scroll', -delta * 3, 'units'), horizontal)
+
+    def refresh(self):
+        """Place the visible tiles for the current offset and zoom and queue missing ones."""
+        canvas = self.canvas
+        if self.layout is None:
+            canvas.delete('all')
+            self._items.clear()
+            self.hbar.set(0, 1)
+            self.vbar.set(0, 1)
+            return
+        self._clamp()
+        width, height = self._viewport()
+        diagram_width, diagram_height = self.layout.size(self.zoom)
+        first_x, last_x = int(self.left // TILE_SIZE), int((self.left + width) // TILE_SIZE)
+        first_y, last_y = int(self.top // TILE_SIZE), int((self.top + height) // TILE_SIZE)
+        last_x = min(last_x, (diagram_width - 1) // TILE_SIZE)
+        last_y = min(last_y, (diagram_height - 1) // TILE_SIZE)
+        visible = {(self.zoom, tx, ty) for tx in range(first_x, last_x + 1) for ty in range(first_y, last_y + 1)}
+
+        for key in [key for key in self._items if key not in visible]:
+            canvas.delete(self._items.pop(key))
+        self._pending = []
+        for key in visible:
+            position = (key[1] * TILE_SIZE - self.left, key[2] * TILE_SIZE - self.top)
+            item = self._items.get(key)
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+            if item is not None:
+                canvas.coords(item, *position)
+            elif key in self._tiles:
+                self._items[key] = canvas.create_image(*position, image=self._tiles[key], anchor=tk.NW,
+                                                       tags='tile')
+            else:
+                self._pending.append(key)
+        center_x, center_y = (self.left + width / 2) / TILE_SIZE, (self.top + height / 2) / TILE_SIZE
+        self._pending.sort(key=lambda key: -((key[1] + 0.5 - center_x) ** 2 + (key[2] + 0.5 - center_y) ** 2))
+        self._limit = TILE_CACHE_FACTOR * len(visible)
+        if self._pending and self._render_after_id is None:
+            self._render_after_id = self.after_idle(self._render_pending)
+
+        self._draw_labels(height)
+        self.hbar.set(self.left / diagram_width, min(1.0, (self.left + width) / diagram_width))
+        self.vbar.set(self.top / diagram_height, min(1.0, (self.top + height) / diagram_height))
+
+    def _render_pending(self):
+        self._render_after_id = None
+        for _ in range(min(TILES_PER_IDLE, len(self._pending))):
+            key = self._pending.pop()
+            image = ImageTk.PhotoImage(render_tile(self.layout, *key))
+            self._tiles[key] = image
+            position = (key[1] * TILE_SIZE - self.left, key[2] * TILE_SIZE - self.top)
+            self._items[key] = self.canvas.create_image(*position, image=image, anchor=tk.NW, tags='tile')
+            self._evict()
+        self.canvas.tag_raise('label')
+        if self._pending:
+            self._render_after_id = self.after_idle(self._render_pending)
+
+    def _evict(self):
+        # Displayed tiles stay; the least recently used of the others go first.
+        excess = len(self._tiles) - self._limit
+        if excess > 0:
+            for key in [key for key in self._tiles if key not in self._items][:excess]:
+                del self._tiles[key]
+
+    def _draw_labels(self, height):
+        # Qubit names stay pinned to the left edge while the diagram scrolls under them.
+        canvas = self.canvas
+        canvas.delete('label')
+        zoom = self.zoom
+        if zoom * LABEL_WIDTH < 24:
+            return
+        canvas.create_rectangle(0, 0, LABEL_WIDTH * zoom - 10 * zoom, height, fill='white', outline='',
+                                tags='label')
+        font = ('TkDefaultFont', max(7, int(11 * zoom)))
+        names = self.layout.circuit.qubit_names
+        first = max(0, int((self.top / zoom - TOP_MARGIN) // ROW_HEIGHT))
+        for row in range(first, len(names)):
+            y = row_y(row) * zoom - self.top
+            if y > height + 20:
+                break
+            canvas.create_text(LABEL_WIDTH * zoom - 14 * zoom, y, text=names[row], anchor=tk.E, font=font,
+                               tags='label')
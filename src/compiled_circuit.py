@@ -0,0 +1,334 @@
+"""Precompiled ``.qadlc`` circuits loaded by memory mapping.
+
+A ``.qadlc`` file holds the parsed ``QuantumCircuitDef``s of one QADL
+script together with a digest of the source they came from. The file is a
+fixed header, then a string table with every name, then per circuit its
+packed arrays (opcodes, operands, parameters, measurements, control
+blocks), each aligned to 8 bytes, and finally a record table with the
+offset and length of every array. ``load_compiled`` maps the file and the
+circuits it returns use read-only ``memoryview``s of the mapping in place of
+``array``s, so loading does no per-gate work and processes that load the
+same file share its pages. Those circuits pickle as a reference to the
+file, so worker processes map it too instead of receiving a copy.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from instrumentation import span
+from phase_oracle import parse_oracle
+from qiskit_parser import ControlBlock, QuantumCircuitDef, parse_qadl_all
+
+COMPILED_FORMAT_VERSION = 2
+COMPILED_SUFFIX = '.qadlc'
+MAGIC = b'\x89QADLC\r\n'
+
+# magic, version, big-endian flag, source digest, record count, top-level
+# circuit count, then (offset, length) of the string offsets, the string
+# data and the record table. The header is little-endian; everything after
+# it is in the byte order of the machine that wrote the file.
+_HEADER = struct.Struct('<8sHB5x32sII6Q')
+_ALIGNMENT = 8
+
+_SECTIONS = (
+    ('qubit_names', 'I'),
+    ('qubit_declared', 'B'),
+    ('opcode_names', 'I'),
+    ('parameter_names', 'I'),
+    ('clbit_names', 'I'),
+    ('modules', 'I'),
+    ('control_blocks', 'q'),
+    ('gate_ops', 'H'),
+    ('gate_offsets', 'I'),
+    ('gate_operands', 'i'),
+    ('gate_param_offsets', 'I'),
+    ('gate_params', 'd'),
+    ('gate_param_symbols', 'i'),
+    ('gate_param_scales', 'd'),
+    ('gate_lines', 'I'),
+    ('measure_qubits', 'i'),
+    ('measure_clbits', 'i'),
+    ('measure_positions', 'I'),
+    ('measure_lines', 'I'),
+    ('metadata', 'B'),
+)
+_PACKED_SLOTS = ('gate_ops', 'gate_offsets', 'gate_operands', 'gate_param_offsets', 'gate_params',
+                 'gate_param_symbols', 'gate_param_scales', 'gate_lines',
+                 'measure_qubits', 'measure_clbits', 'measure_positions', 'measure_lines')
+_BLOCK_KINDS = ('if', 'while')
+_BLOCK_FIELDS = len(ControlBlock.__slots__)
+_RECORD_WORDS = 1 + 2 * len(_SECTIONS)
+
+_mapped = {}
+
+def source_digest(source):
+    """Return the digest a ``.qadlc`` file stores for QADL ``source`` (text or bytes)."""
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    return hashlib.blake2b(source, digest_size=32).digest()
+
+def compiled_path(source_path):
+    """Return the artifact path next to ``source_path``: ``bell.qadl`` becomes ``bell.qadlc``."""
+    root, extension = os.path.splitext(source_path)
+    return root + COMPILED_SUFFIX if extension == '.qadl' else source_path + COMPILED_SUFFIX
+
+class CompiledCircuitDef(QuantumCircuitDef):
+    """A circuit whose packed arrays are views of a mapped ``.qadlc`` file.
+
+    It behaves like the parsed circuit but is read-only: the optimizer,
+    router and simulators build new circuits from it rather than modify it.
+    """
+
+    __slots__ = ('artifact', 'record', 'digest')
+
+    def __reduce__(self):
+        return _mapped_record, (self.artifact, self.record, self.digest)
+
+def _collect(circuits):
+    # Top-level circuits first, then every module once, however many scopes import it.
+    records = list(circuits)
+    index = {id(circuit): i for i, circuit in enumerate(records)}
+    i = 0
+    while i < len(records):
+        for module in records[i].modules.values():
+            if id(module) not in index:
+                index[id(module)] = len(records)
+                records.append(module)
+        i += 1
+    return records, index
+
+def _metadata(circuit_def):
+    fields = {}
+    for name in ('control_flow', 'error_correction', 'hardware_config', 'annotations'):
+        value = getattr(circuit_def, name)
+        if value:
+            fields[name] = value
+    if circuit_def.hardware_entries:
+        fields['hardware_entries'] = [list(entry) for entry in circuit_def.hardware_entries]
+    if circuit_def.oracles:
+        fields['oracles'] = [oracle.text for oracle in circuit_def.oracles.values()]
+    return json.dumps(fields).encode('utf-8') if fields else b''
+
+def _block_words(block):
+    words = []
+    for slot in ControlBlock.__slots__:
+        value = getattr(block, slot)
+        if slot == 'kind':
+            value = _BLOCK_KINDS.index(value)
+        elif value is None:
+            value = -1
+        words.append(int(value))
+    return words
+
+def write_compiled(circuits, path, digest):
+    """Write ``circuits`` and the source ``digest`` to the ``.qadlc`` file ``path``.
+
+    The file is written under a temporary name and renamed into place, so a
+    reader never maps a partially written artifact.
+    """
+    records, index = _collect(circuits)
+    strings = {}
+
+    def intern(name):
+        string = strings.get(name)
+        if string is None:
+            string = strings[name] = len(strings)
+        return string
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=COMPILED_SUFFIX)
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(bytes(_HEADER.size))
+
+            def write(buffer):
+                padding = -handle.tell() % _ALIGNMENT
+                if padding:
+                    handle.write(bytes(padding))
+                offset = handle.tell()
+                handle.write(buffer)
+                return offset
+
+            table = array('Q')
+            for circuit_def in records:
+                sections = {
+                    'qubit_names': array('I', map(intern, circuit_def.qubit_names)),
+                    'qubit_declared': bytes(circuit_def.qubit_declared),
+                    'opcode_names': array('I', map(intern, circuit_def.opcode_names)),
+                    'parameter_names': array('I', map(intern, circuit_def.parameter_names)),
+                    'clbit_names': array('I', map(intern, circuit_def.classical_bits)),
+                    'modules': array('I', [word for name, module in circuit_def.modules.items()
+                                           for word in (intern(name), index[id(module)])]),
+                    'control_blocks': array('q', [word for block in circuit_def.control_blocks
+                                                  for word in _block_words(block)]),
+                    'metadata': _metadata(circuit_def),
+                }
+                table.append(intern(circuit_def.name))
+                for name, typecode in _SECTIONS:
+                    buffer = sections[name] if name in sections else getattr(circuit_def, name)
+                    data = buffer.tobytes() if isinstance(buffer, array) else bytes(buffer)
+                    table.extend((write(data), len(data) // struct.calcsize(typecode)))
+
+            encoded = [name.encode('utf-8') for name in strings]
+            string_offsets = array('Q', [0])
+            for data in encoded:
+                string_offsets.append(string_offsets[-1] + len(data))
+            offsets_at = write(string_offsets.tobytes())
+            data_at = write(b''.join(encoded))
+            table_at = write(table.tobytes())
+            handle.seek(0)
+            handle.write(_HEADER.pack(MAGIC, COMPILED_FORMAT_VERSION, sys.byteorder == 'big', digest,
+                                      len(records), len(circuits), offsets_at, len(string_offsets),
+                                      data_at, string_offsets[-1], table_at, len(table)))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def _view(buffer, offset, length, typecode, swap):
+    size = struct.calcsize(typecode)
+    if offset % _ALIGNMENT or offset + length * size > len(buffer):
+        raise ValueError("Corrupt compiled circuit file: section out of bounds")
+    view = buffer[offset:offset + length * size]
+    if swap and size > 1:
+        # Written on a machine of the other byte order: copy instead of mapping.
+        view = array(typecode, view.tobytes())
+        view.byteswap()
+        return view
+    return view.cast(typecode)
+
+def _map(path):
+    """Map ``path`` and return ``(digest, num_top, circuits)`` for all its records, reusing an earlier mapping."""
+    with open(path, 'rb') as handle:
+        stat = os.fstat(handle.fileno())
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = _mapped.get(os.path.abspath(path))
+        if cached is not None and cached[0] == key:
+            return cached[1:]
+        if stat.st_size < _HEADER.size:
+            raise ValueError(f"Not a compiled circuit file: {path}")
+        mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapping)
+    (magic, version, big_endian, digest, num_records, num_top,
+     offsets_at, num_offsets, data_at, data_size, table_at, table_size) = _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(f"Not a compiled circuit file: {path}")
+    if version != COMPILED_FORMAT_VERSION:
+        raise ValueError(f"Unsupported compiled circuit version {version} in {path}")
+    if table_size != num_records * _RECORD_WORDS:
+        raise ValueError("Corrupt compiled circuit file: bad record table")
+    swap = bool(big_endian) != (sys.byteorder == 'big')
+    string_offsets = _view(buffer, offsets_at, num_offsets, 'Q', swap)
+    data = bytes(_view(buffer, data_at, data_size, 'B', swap))
+    names = [data[string_offsets[k]:string_offsets[k + 1]].decode('utf-8') for k in range(num_offsets - 1)]
+    table = _view(buffer, table_at, table_size, 'Q', swap)
+
+    circuits = []
+    links = []
+    for record in range(num_records):
+        words = table[record * _RECORD_WORDS:(record + 1) * _RECORD_WORDS]
+        sections = {name: _view(buffer, words[1 + 2 * k], words[2 + 2 * k], typecode, swap)
+                    for k, (name, typecode) in enumerate(_SECTIONS)}
+        circuit_def = CompiledCircuitDef(names[words[0]])
+        circuit_def.artifact = os.path.abspath(path)
+        circuit_def.record = record
+        circuit_def.digest = digest
+        _fill(circuit_def, sections, names)
+        links.append(sections['modules'])
+        circuits.append(circuit_def)
+    for circuit_def, modules in zip(circuits, links):
+        for k in range(0, len(modules), 2):
+            circuit_def.modules[names[modules[k]]] = circuits[modules[k + 1]]
+
+    _mapped[os.path.abspath(path)] = (key, digest, num_top, circuits)
+    return digest, num_top, circuits
+
+def _fill(circuit_def, sections, names):
+    circuit_def.qubit_names = [names[k] for k in sections['qubit_names']]
+    circuit_def.qubit_index = {name: i for i, name in enumerate(circuit_def.qubit_names)}
+    circuit_def.qubit_declared = sections['qubit_declared']
+    circuit_def.opcode_names = [names[k] for k in sections['opcode_names']]
+    circuit_def.opcodes = {name: i for i, name in enumerate(circuit_def.opcode_names)}
+    circuit_def.parameter_names = [names[k] for k in sections['parameter_names']]
+    circuit_def.parameter_index = {name: i for i, name in enumerate(circuit_def.parameter_names)}
+    circuit_def.classical_bits = {names[k]: i for i, k in enumerate(sections['clbit_names'])}
+    for slot in _PACKED_SLOTS:
+        setattr(circuit_def, slot, sections[slot])
+
+    words = sections['control_blocks'].tolist()
+    for start in range(0, len(words), _BLOCK_FIELDS):
+        block = ControlBlock(None, 0, 0)
+        for slot, value in zip(ControlBlock.__slots__, words[start:start + _BLOCK_FIELDS]):
+            setattr(block, slot, value)
+        block.kind = _BLOCK_KINDS[block.kind]
+        block.in_else = bool(block.in_else)
+        if block.max_iterations < 0:
+            block.max_iterations = None
+        circuit_def.control_blocks.append(block)
+
+    if len(sections['metadata']):
+        fields = json.loads(bytes(sections['metadata']).decode('utf-8'))
+        circuit_def.control_flow = fields.get('control_flow', [])
+        circuit_def.error_correction = fields.get('error_correction', [])
+        circuit_def.hardware_config = fields.get('hardware_config', {})
+        circuit_def.annotations = fields.get('annotations', [])
+        circuit_def.hardware_entries = [tuple(entry) for entry in fields.get('hardware_entries', ())]
+        for text in fields.get('oracles', ()):
+            circuit_def.add_oracle(parse_oracle(text))
+
+def load_compiled(path, digest=None):
+    """Map the ``.qadlc`` file ``path`` and return its top-level circuits.
+
+    Raises ``ValueError`` if the file is not a current ``.qadlc`` file or,
+    when ``digest`` is given, was compiled from a different source.
+    """
+    with span('load.compiled') as stage:
+        stored, num_top, circuits = _map(path)
+        if digest is not None and stored != digest:
+            raise ValueError(f"Compiled circuit file {path} is out of date")
+        circuits = circuits[:num_top]
+        stage.set(circuits=len(circuits), gates=sum(circuit.num_gates for circuit in circuits))
+    return circuits
+
+def _mapped_record(path, record, digest):
+    stored, _, circuits = _map(path)
+    if stored != digest:
+        raise ValueError(f"Compiled circuit file {path} changed since it was loaded")
+    return circuits[record]
+
+def compile_file(source_path, path=None):
+    """Parse the QADL file ``source_path`` and write its ``.qadlc`` artifact; return the artifact path."""
+    path = path or compiled_path(source_path)
+    with open(source_path, 'rb') as handle:
+        source = handle.read()
+    write_compiled(parse_qadl_all(source.decode('utf-8')), path, source_digest(source))
+    return path
+
+def load_qadl_file(source_path, path=None):
+    """Return the circuits of the QADL file ``source_path`` through its ``.qadlc`` artifact.
+
+    The artifact is used when its digest matches the current source and is
+    rebuilt otherwise. If it cannot be written (for example in a read-only
+    directory) the freshly parsed circuits are returned instead.
+    """
+    path = path or compiled_path(source_path)
+    with open(source_path, 'rb') as handle:
+        source = handle.read()
+    digest = source_digest(source)
+    try:
+        return load_compiled(path, digest)
+    except (OSError, ValueError):
+        pass
+    circuits = parse_qadl_all(source.decode('utf-8'))
+    try:
+        write_compiled(circuits, path, digest)
+    except OSError:
+        return circuits
+    return load_compiled(path, digest)
@@ -0,0 +1,297 @@
+"""Stabilizer codes behind the ``error_correction`` directive and their lowering to gates.
+
+``error_correction <code> <qubits...> [rounds <n>]`` encodes the current
+state of each listed qubit into a block of the named code and runs ``n``
+rounds (default 1) of syndrome extraction on it. The listed qubit becomes
+one data qubit of its block; the others are fresh qubits ``<qubit>_d<k>``,
+and the check ``i`` of round ``r`` is measured through a fresh ancilla
+``<qubit>_s<r>_<i>`` into the classical bit of the same name. A later
+``measure <qubit> -> <bit>`` reads out the whole block: the listed qubit
+into ``<bit>`` and data qubit ``k`` into ``<bit>_d<k>``, and
+``syndrome_decoder.decode_counts`` turns those bits into the corrected
+logical value of ``<bit>``. Gates on an encoded qubit are rejected.
+
+Every code is CSS: its X-type checks detect Z errors and its Z-type checks
+X errors. The encoder, built once per code, puts the X checks in reduced
+row echelon form and prepares each one from a Hadamard on its pivot
+qubit followed by CNOTs, after spreading the input state along the
+logical X; fresh qubits start in ``|0>``, which already satisfies the
+Z checks. This module only needs the standard library so the parser can
+lower directives without importing NumPy.
+"""
+
+import functools
+
+from instrumentation import span
+
+class StabilizerCode:
+    """A CSS code on ``num_qubits`` data qubits.
+
+    ``x_checks`` and ``z_checks`` list the supports of the X- and Z-type
+    stabilizer generators and ``logical_x`` and ``logical_z`` those of an X-
+    and a Z-type logical operator.
+    """
+
+    __slots__ = ('name', 'num_qubits', 'distance', 'x_checks', 'z_checks', 'logical_x', 'logical_z')
+
+    def __init__(self, name, num_qubits, distance, x_checks, z_checks, logical_x, logical_z):
+        self.name = name
+        self.num_qubits = num_qubits
+        self.distance = distance
+        self.x_checks = tuple(tuple(check) for check in x_checks)
+        self.z_checks = tuple(tuple(check) for check in z_checks)
+        self.logical_x = tuple(logical_x)
+        self.logical_z = tuple(logical_z)
+
+    @property
+    def num_checks(self):
+        return len(self.x_checks) + len(self.z_checks)
+
+    def __repr__(self):
+        return f"StabilizerCode({self.name!r}, n={self.num_qubits}, d={self.distance})"
+
+class CodeTemplate:
+    """The encode and syndrome-extraction circuits of one code, on local qubit indices.
+
+    Data qubits are ``0 .. n - 1`` and the ancilla of check ``i`` is
+    ``n + i``, the Z checks coming first. ``input`` is the data qubit that
+    holds the state to encode.
+    """
+
+    __slots__ = ('code', 'input', 'encode', 'syndrome')
+
+    def __init__(self, code, input_qubit, encode, syndrome):
+        self.code = code
+        self.input = input_qubit
+        self.encode = encode
+        self.syndrome = syndrome
+
+class EncodedBlock:
+    """One qubit encoded by an ``error_correction`` directive."""
+
+    __slots__ = ('template', 'qubit', 'data', 'ancillas', 'line')
+
+    def __init__(self, template, qubit, rounds, line=0):
+        self.template = template
+        self.qubit = qubit
+        self.data = tuple(qubit if k == template.input else f"{qubit}_d{k}"
+                          for k in range(template.code.num_qubits))
+        self.ancillas = tuple(tuple(f"{qubit}_s{r}_{i}" for i in range(template.code.num_checks))
+                              for r in range(rounds))
+        self.line = line
+
+    @property
+    def code(self):
+        return self.template.code
+
+    @property
+    def rounds(self):
+        return len(self.ancillas)
+
+    def readout_bits(self, classical_bit):
+        """Return the classical bits ``measure <qubit> -> classical_bit`` writes, in data qubit order."""
+        return tuple(classical_bit if k == self.template.input else f"{classical_bit}_d{k}"
+                     for k in range(len(self.data)))
+
+    def lower(self, circuit_def, line=0):
+        """Append the encoder and every syndrome round to ``circuit_def``."""
+        for name in self.data:
+            circuit_def.declare_qubit(name)
+        for gate, qubits in self.template.encode:
+            circuit_def.append_gate(gate, [self.data[q] for q in qubits], line=line)
+        for ancillas in self.ancillas:
+            names = self.data + ancillas
+            for name in ancillas:
+                circuit_def.declare_qubit(name)
+            for gate, qubits in self.template.syndrome:
+                circuit_def.append_gate(gate, [names[q] for q in qubits], line=line)
+            for name in ancillas:
+                circuit_def.append_measurement(name, name, line)
+
+    def measure(self, circuit_def, classical_bit, line=0):
+        for name, bit in zip(self.data, self.readout_bits(classical_bit)):
+            circuit_def.append_measurement(name, bit, line)
+
+_CODES = {}
+_ALIASES = {}
+
+def register_code(name, build, aliases=()):
+    """Register ``build()``, returning a ``StabilizerCode``, under ``name`` and ``aliases``."""
+    _CODES[name] = build
+    for alias in (name,) + tuple(aliases):
+        _ALIASES[alias.lower()] = name
+
+def code_names():
+    return sorted(_CODES)
+
+@functools.lru_cache(maxsize=None)
+def _build_code(name):
+    return _CODES[name]()
+
+def lookup_code(name):
+    """Return the ``StabilizerCode`` registered as ``name``, case-insensitively.
+
+    Raises ``ValueError`` for an unknown code.
+    """
+    canonical = _ALIASES.get(name.lower())
+    if canonical is None:
+        raise ValueError(f"Unknown error correction code '{name}'; expected one of {', '.join(code_names())}")
+    return _build_code(canonical)
+
+def _mask(qubits):
+    mask = 0
+    for q in qubits:
+        mask |= 1 << q
+    return mask
+
+def _bits(mask):
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
+
+def _encoder(code):
+    # Reduced row echelon form of the X checks, so each pivot appears in its own check only.
+    pivots = []
+    rows = []
+    for check in code.x_checks:
+        row = _mask(check)
+        for pivot, other in zip(pivots, rows):
+            if row >> pivot & 1:
+                row ^= other
+        if not row:
+            continue
+        pivot = _bits(row)[0]
+        for k, other in enumerate(rows):
+            if other >> pivot & 1:
+                rows[k] = other ^ row
+        pivots.append(pivot)
+        rows.append(row)
+    logical = _mask(code.logical_x)
+    for pivot, row in zip(pivots, rows):
+        if logical >> pivot & 1:
+            logical ^= row
+    support = _bits(logical)
+    input_qubit = support[0]
+    encode = [('CNOT', (input_qubit, target)) for target in support[1:]]
+    for pivot, row in zip(pivots, rows):
+        encode.append(('H', (pivot,)))
+        encode.extend(('CNOT', (pivot, target)) for target in _bits(row) if target != pivot)
+    return input_qubit, tuple(encode)
+
+def _syndrome_circuit(code):
+    n = code.num_qubits
+    gates = []
+    for i, check in enumerate(code.z_checks):
+        gates.extend(('CNOT', (q, n + i)) for q in check)
+    for i, check in enumerate(code.x_checks, len(code.z_checks)):
+        gates.append(('H', (n + i,)))
+        gates.extend(('CNOT', (n + i, q)) for q in check)
+        gates.append(('H', (n + i,)))
+    return tuple(gates)
+
+@functools.lru_cache(maxsize=None)
+def _build_template(name):
+    code = _build_code(name)
+    with span('qec.template', code=name, qubits=code.num_qubits):
+        input_qubit, encode = _encoder(code)
+        return CodeTemplate(code, input_qubit, encode, _syndrome_circuit(code))
+
+def code_template(name):
+    """Return the cached ``CodeTemplate`` of the code registered as ``name``."""
+    return _build_template(lookup_code(name).name)
+
+def parse_directive(text, line_number=0):
+    """Split an ``error_correction`` directive into ``(code, qubits, rounds)``.
+
+    Raises ``SyntaxError`` for a malformed directive or an unknown code.
+    """
+    parts = text.split()
+    rounds = 1
+    if len(parts) >= 2 and parts[-2] == 'rounds':
+        if not parts[-1].isdigit() or int(parts[-1]) < 1:
+            raise SyntaxError(f"Syntax error on line {line_number}: Invalid syndrome round count '{parts[-1]}'")
+        rounds = int(parts[-1])
+        parts = parts[:-2]
+    if len(parts) < 3:
+        raise SyntaxError(f"Syntax error on line {line_number}: Invalid error correction declaration. Expected 'error_correction <code> <qubits...> [rounds <n>]'")
+    try:
+        code = lookup_code(parts[1])
+    except ValueError as error:
+        raise SyntaxError(f"Syntax error on line {line_number}: {error}") from None
+    qubits = parts[2:]
+    if len(set(qubits)) != len(qubits):
+        raise SyntaxError(f"Syntax error on line {line_number}: error_correction lists the same qubit twice")
+    return code, qubits, rounds
+
+def encode_qubits(circuit_def, text, line=0, encoded=None):
+    """Lower the directive ``text`` into ``circuit_def`` and return its ``EncodedBlock``s.
+
+    ``encoded`` maps the qubits encoded by earlier directives to their
+    blocks; encoding one of them again, or a block whose qubit names are
+    already in use, raises ``SyntaxError``.
+    """
+    code, qubits, rounds = parse_directive(text, line)
+    template = _build_template(code.name)
+    blocks = []
+    for qubit in qubits:
+        if encoded and qubit in encoded:
+            raise SyntaxError(f"Syntax error on line {line}: Qubit {qubit} is already encoded by the error_correction on line {encoded[qubit].line}")
+        block = EncodedBlock(template, qubit, rounds, line)
+        for name in block.data + sum(block.ancillas, ()):
+            if name != qubit and (name in circuit_def.qubit_index or name in circuit_def.classical_bits):
+                raise SyntaxError(f"Syntax error on line {line}: error_correction needs the name {name}, which is already in use")
+        blocks.append(block)
+    for block in blocks:
+        block.lower(circuit_def, line)
+    return blocks
+
+def encoded_blocks(circuit_def):
+    """Return the ``EncodedBlock`` of every qubit encoded in ``circuit_def``, in directive order."""
+    blocks = []
+    for text in circuit_def.error_correction:
+        code, qubits, rounds = parse_directive(text)
+        template = _build_template(code.name)
+        blocks.extend(EncodedBlock(template, qubit, rounds) for qubit in qubits)
+    return blocks
+
+def _repetition(name, check_type):
+    def build():
+        pairs = ((0, 1), (1, 2))
+        if check_type == 'z':
+            return StabilizerCode(name, 3, 1, (), pairs, (0, 1, 2), (0,))
+        return StabilizerCode(name, 3, 1, pairs, (), (0,), (0, 1, 2))
+    return build
+
+def _shor():
+    z_checks = [(b + i, b + i + 1) for b in (0, 3, 6) for i in (0, 1)]
+    return StabilizerCode('Shor', 9, 3, (range(0, 6), range(3, 9)), z_checks, (0, 1, 2), (0, 3, 6))
+
+def _steane():
+    # The rows of the [7, 4] Hamming parity-check matrix, used for both check types.
+    checks = [tuple(q for q in range(7) if (q + 1) >> bit & 1) for bit in (2, 1, 0)]
+    return StabilizerCode('Steane', 7, 3, checks, checks, range(7), range(7))
+
+def _surface(distance):
+    def build():
+        # Rotated patch: data qubit (r, c) is r * d + c and face (r, c) touches (r - 1 .. r, c - 1 .. c).
+        d = distance
+        x_checks, z_checks = [], []
+        for r in range(d + 1):
+            for c in range(d + 1):
+                corners = [(i, j) for i in (r - 1, r) for j in (c - 1, c) if 0 <= i < d and 0 <= j < d]
+                kind = 'x' if (r + c) % 2 == 0 else 'z'
+                if len(corners) == 4 or (len(corners) == 2 and kind == ('x' if r in (0, d) else 'z')):
+                    (x_checks if kind == 'x' else z_checks).append([i * d + j for i, j in corners])
+        return StabilizerCode(f"Surface{d}", d * d, d, x_checks, z_checks,
+                              [r * d for r in range(d)], range(d))
+    return build
+
+register_code('BitFlip', _repetition('BitFlip', 'z'), aliases=('Repetition',))
+register_code('PhaseFlip', _repetition('PhaseFlip', 'x'))
+register_code('Shor', _shor)
+register_code('Steane', _steane)
+register_code('Surface3', _surface(3), aliases=('Surface',))
+register_code('Surface5', _surface(5))
@@ -0,0 +1,244 @@
+import cmath
+import math
+
+class GateSpec:
+    """Translation rule for one QADL gate.
+
+    ``num_qubits`` is the required arity, or ``None`` for gates that take any
+    number of qubits. A gate is translated either by appending the Qiskit
+    instruction returned by ``factory()`` (built once and reused for every
+    occurrence) or, for composite gates, by calling
+    ``expand(qc, qubits, *params)``.
+    A spec with neither is a placeholder that emits nothing. ``matrix`` is the
+    unitary used by the native simulator, written with the first listed qubit
+    as the most significant bit.
+
+    Gates with ``num_params > 0`` take their angles as arguments of
+    ``factory(*params)`` and ``matrix(*params)``. ``defaults`` are used when
+    a script gives no parameters, so ``gate Phase q0`` keeps meaning a
+    quarter turn while ``gate Phase(theta) q0`` is free.
+    """
+
+    __slots__ = ('name', 'num_qubits', 'factory', 'expand', 'matrix', 'num_params', 'defaults', '_instruction')
+
+    def __init__(self, name, num_qubits, factory=None, expand=None, matrix=None, num_params=0, defaults=()):
+        self.name = name
+        self.num_qubits = num_qubits
+        self.factory = factory
+        self.expand = expand
+        self.matrix = matrix
+        self.num_params = num_params
+        self.defaults = tuple(defaults)
+        self._instruction = None
+
+    def instruction(self, params=()):
+        """Return the Qiskit instruction; only the parameter-free one is cached."""
+        if params:
+            return self.factory(*params) if self.factory is not None else None
+        if self._instruction is None and self.factory is not None and (self.defaults or not self.num_params):
+            self._instruction = self.factory(*self.defaults)
+        return self._instruction
+
+    def unitary(self, params=()):
+        """Return the matrix for ``params`` (or the defaults) as nested tuples."""
+        if self.num_params:
+            return self.matrix(*(params or self.defaults))
+        return self.matrix
+
+    def check_arity(self, count):
+        if self.num_qubits is not None and count != self.num_qubits:
+            raise ValueError(f"Gate {self.name} expects {self.num_qubits} qubit(s), got {count}")
+
+    def check_params(self, count):
+        if count != self.num_params and not (count == 0 and self.defaults):
+            raise ValueError(f"Gate {self.name} expects {self.num_params} parameter(s), got {count}")
+
+_REGISTRY = {}
+
+def register_gate(name, num_qubits, factory=None, expand=None, aliases=(), matrix=None, num_params=0, defaults=()):
+    """Register a gate under ``name`` and any ``aliases``, replacing earlier entries."""
+    spec = GateSpec(name, num_qubits, factory, expand, matrix, num_params, defaults)
+    for key in (name,) + tuple(aliases):
+        _REGISTRY[key] = spec
+    return spec
+
+def lookup_gate(name):
+    spec = _REGISTRY.get(name)
+    if spec is None:
+        raise ValueError(f"Unsupported gate: {name}")
+    return spec
+
+class ModuleSpec(GateSpec):
+    """A call of a ``module`` block, applied as one opaque gate.
+
+    The module's body is compiled by each backend once per circuit and
+    reused at every call site: into a Qiskit ``Gate`` by the executor and,
+    for small modules, into one fused unitary by the native simulator.
+    """
+
+    __slots__ = ('module',)
+
+    def __init__(self, module):
+        super().__init__(module.name, module.num_qubits)
+        self.module = module
+
+class OracleSpec(GateSpec):
+    """A phase oracle defined by an ``oracle`` statement (see ``phase_oracle``).
+
+    Qiskit output expands it into multi-controlled phase flips; the native
+    simulator negates the marked amplitudes directly.
+    """
+
+    __slots__ = ('oracle',)
+
+    def __init__(self, oracle):
+        super().__init__(oracle.name, oracle.num_qubits, expand=oracle.apply)
+        self.oracle = oracle
+
+def resolve_gate(name, circuit_def):
+    """Return the spec for opcode ``name``; modules and oracles of ``circuit_def`` shadow registered gates."""
+    module = circuit_def.modules.get(name)
+    if module is not None:
+        return ModuleSpec(module)
+    oracle = circuit_def.oracles.get(name)
+    if oracle is not None:
+        return OracleSpec(oracle)
+    return lookup_gate(name)
+
+def registered_gates():
+    return dict(_REGISTRY)
+
+def _library(class_name, *args):
+    def factory(*params):
+        from qiskit.circuit import library
+        return getattr(library, class_name)(*args, *params)
+    return factory
+
+def approximation_degree(value, name='QFT'):
+    """Validate the approximation degree of a QFT block; ``0`` keeps every rotation."""
+    try:
+        degree = int(value)
+    except TypeError:
+        raise ValueError(f"Gate {name} needs a constant approximation degree, got {value}") from None
+    if degree != value or degree < 0:
+        raise ValueError(f"Gate {name} approximation degree must be a non-negative integer, got {value}")
+    return degree
+
+def qft_partners(j, degree=0):
+    """Return the qubits ``m`` controlling a rotation by ``pi / 2**(j - m)`` on qubit ``j`` of a QFT.
+
+    With ``degree > 0`` rotations with ``j - m > degree`` are dropped, which
+    leaves at most ``degree`` per qubit.
+    """
+    return range(max(0, j - degree) if degree else 0, j)
+
+def apply_qft(qc, qubits, degree=0):
+    """Apply the Quantum Fourier Transform, ``qubits[0]`` least significant.
+
+    ``degree`` is the approximation degree; ``0`` keeps every rotation.
+    """
+    degree = approximation_degree(degree, 'QFT')
+    n = len(qubits)
+    for j in reversed(range(n)):
+        qc.h(qubits[j])
+        for m in reversed(qft_partners(j, degree)):
+            qc.cp(math.pi / float(2 ** (j - m)), qubits[j], qubits[m])
+    for qubit in range(n // 2):
+        qc.swap(qubits[qubit], qubits[n - qubit - 1])
+
+def apply_inverse_qft(qc, qubits, degree=0):
+    """Apply the inverse Quantum Fourier Transform."""
+    degree = approximation_degree(degree, 'InverseQFT')
+    n = len(qubits)
+    for qubit in range(n // 2):
+        qc.swap(qubits[qubit], qubits[n - qubit - 1])
+    for j in range(n):
+        for m in qft_partners(j, degree):
+            qc.cp(-math.pi / float(2 ** (j - m)), qubits[j], qubits[m])
+        qc.h(qubits[j])
+
+def flip_all_ones(qc, qubits):
+    """Apply a phase of ``-1`` to the all-ones state of ``qubits``."""
+    if len(qubits) == 1:
+        qc.z(qubits[0])
+    else:
+        qc.mcp(math.pi, list(qubits[:-1]), qubits[-1])
+
+def apply_diffuser(qc, qubits):
+    """Apply the Grover diffuser ``2|s><s| - I``, ``|s>`` the uniform superposition of ``qubits``."""
+    qc.h(qubits)
+    qc.x(qubits)
+    flip_all_ones(qc, qubits)
+    qc.x(qubits)
+    qc.h(qubits)
+    # The gates give I - 2|s><s|.
+    qc.global_phase += math.pi
+
+def _diagonal(*entries):
+    return tuple(tuple(entry if row == col else 0 for col in range(len(entries)))
+                 for row, entry in enumerate(entries))
+
+def _crz(theta):
+    return _diagonal(1, 1, cmath.exp(-0.5j * theta), cmath.exp(0.5j * theta))
+
+def _phase(theta):
+    return _diagonal(1, cmath.exp(1j * theta))
+
+def _rx(theta):
+    c, s = math.cos(theta / 2), math.sin(theta / 2)
+    return ((c, -1j * s), (-1j * s, c))
+
+def _ry(theta):
+    c, s = math.cos(theta / 2), math.sin(theta / 2)
+    return ((c, -s), (s, c))
+
+def _rz(theta):
+    return _diagonal(cmath.exp(-0.5j * theta), cmath.exp(0.5j * theta))
+
+def _u(theta, phi, lam):
+    c, s = math.cos(theta / 2), math.sin(theta / 2)
+    return ((c, -cmath.exp(1j * lam) * s), (cmath.exp(1j * phi) * s, cmath.exp(1j * (phi + lam)) * c))
+
+def _cphase(theta):
+    return _diagonal(1, 1, 1, cmath.exp(1j * theta))
+
+def _rzz(theta):
+    minus, plus = cmath.exp(-0.5j * theta), cmath.exp(0.5j * theta)
+    return _diagonal(minus, plus, plus, minus)
+
+_SQRT1_2 = math.sqrt(0.5)
+H_MATRIX = ((_SQRT1_2, _SQRT1_2), (_SQRT1_2, -_SQRT1_2))
+X_MATRIX = ((0, 1), (1, 0))
+Y_MATRIX = ((0, -1j), (1j, 0))
+CNOT_MATRIX = ((1, 0, 0, 0), (0, 1, 0, 0), (0, 0, 0, 1), (0, 0, 1, 0))
+SWAP_MATRIX = ((1, 0, 0, 0), (0, 0, 1, 0), (0, 1, 0, 0), (0, 0, 0, 1))
+CCNOT_MATRIX = tuple(tuple(1 if col == (row ^ 1 if row >= 6 else row) else 0 for col in range(8))
+                     for row in range(8))
+
+register_gate('H', 1, _library('HGate'), aliases=('Hadamard',), matrix=H_MATRIX)
+register_gate('X', 1, _library('XGate'), matrix=X_MATRIX)
+register_gate('Y', 1, _library('YGate'), matrix=Y_MATRIX)
+register_gate('Z', 1, _library('ZGate'), matrix=_diagonal(1, -1))
+register_gate('S', 1, _library('SGate'), matrix=_diagonal(1, 1j))
+register_gate('Sdg', 1, _library('SdgGate'), matrix=_diagonal(1, -1j))
+register_gate('T', 1, _library('TGate'), matrix=_diagonal(1, cmath.exp(0.25j * math.pi)))
+register_gate('Tdg', 1, _library('TdgGate'), matrix=_diagonal(1, cmath.exp(-0.25j * math.pi)))
+register_gate('Phase', 1, _library('PhaseGate'), matrix=_phase, num_params=1, defaults=(math.pi / 2,))
+register_gate('P', 1, _library('PhaseGate'), matrix=_phase, num_params=1)
+register_gate('RX', 1, _library('RXGate'), matrix=_rx, num_params=1)
+register_gate('RY', 1, _library('RYGate'), matrix=_ry, num_params=1)
+register_gate('RZ', 1, _library('RZGate'), matrix=_rz, num_params=1)
+register_gate('U', 1, _library('UGate'), matrix=_u, num_params=3)
+register_gate('CNOT', 2, _library('CXGate'), aliases=('CX',), matrix=CNOT_MATRIX)
+register_gate('CZ', 2, _library('CZGate'), matrix=_diagonal(1, 1, 1, -1))
+register_gate('Swap', 2, _library('SwapGate'), aliases=('SWAP',), matrix=SWAP_MATRIX)
+register_gate('CR', 2, _library('CRZGate'), matrix=_crz, num_params=1, defaults=(0.5,))
+register_gate('CR2', 2, _library('CRZGate'), matrix=_crz, num_params=1, defaults=(1.0,))
+register_gate('CRZ', 2, _library('CRZGate'), matrix=_crz, num_params=1)
+register_gate('CP', 2, _library('CPhaseGate'), aliases=('CPhase',), matrix=_cphase, num_params=1)
+register_gate('RZZ', 2, _library('RZZGate'), matrix=_rzz, num_params=1)
+register_gate('CCNOT', 3, _library('CCXGate'), aliases=('Toffoli',), matrix=CCNOT_MATRIX)
+register_gate('QFT', None, expand=apply_qft, num_params=1, defaults=(0,))
+register_gate('InverseQFT', None, expand=apply_inverse_qft, num_params=1, defaults=(0,))
+register_gate('Oracle', None)
+register_gate('Diffuser', None, expand=apply_diffuser)
@@ -0,0 +1,278 @@
+from collections import deque
+
+class CouplingGraph:
+    """Undirected qubit coupling map with precomputed shortest-path distances.
+
+    ``distance[i][j]`` is the number of couplers between physical qubits ``i``
+    and ``j`` (``None`` if they are disconnected), computed with one BFS per
+    qubit at construction time.
+    """
+
+    def __init__(self, edges):
+        self.nodes = []
+        self.index = {}
+        self.neighbors = []
+        for a, b in edges:
+            if a == b:
+                raise ValueError(f"Invalid qubit connectivity entry: {a} - {b}")
+            i, j = self._add(a), self._add(b)
+            if j not in self.neighbors[i]:
+                self.neighbors[i].append(j)
+                self.neighbors[j].append(i)
+        self.distance = [self._bfs(i) for i in range(len(self.nodes))]
+
+    def _add(self, name):
+        index = self.index.get(name)
+        if index is None:
+            index = self.index[name] = len(self.nodes)
+            self.nodes.append(name)
+            self.neighbors.append([])
+        return index
+
+    def _bfs(self, source):
+        distance = [None] * len(self.nodes)
+        distance[source] = 0
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            step = distance[node] + 1
+            for neighbor in self.neighbors[node]:
+                if distance[neighbor] is None:
+                    distance[neighbor] = step
+                    queue.append(neighbor)
+        return distance
+
+    @classmethod
+    def from_connectivity(cls, lines):
+        """Build a graph from ``qubit_connectivity`` lines such as ``q0 - q1 - q2``."""
+        edges = []
+        for line in lines:
+            names = [name.strip() for name in line.split('-')]
+            if len(names) < 2 or not all(names):
+                raise ValueError(f"Invalid qubit connectivity entry: {line}")
+            edges.extend(zip(names, names[1:]))
+        return cls(edges)
+
+    @classmethod
+    def from_circuit(cls, circuit_def):
+        lines = circuit_def.hardware_config.get('qubit_connectivity')
+        if not lines:
+            raise ValueError(f"Circuit {circuit_def.name} has no hardware qubit_connectivity block")
+        return cls.from_connectivity(lines)
+
+class RoutingResult:
+    """A routed circuit over physical qubits and the layouts before and after.
+
+    Layouts map logical qubit names to physical qubit names. ``unrouted``
+    counts gates on three or more qubits, which are remapped but not routed.
+    """
+
+    def __init__(self, circuit, initial_layout, final_layout, swaps, unrouted):
+        self.circuit = circuit
+        self.initial_layout = initial_layout
+        self.final_layout = final_layout
+        self.swaps = swaps
+        self.unrouted = unrouted
+
+def _interactions(circuit_def):
+    weights = {}
+    offsets = circuit_def.gate_offsets
+    operands = circuit_def.gate_operands
+    for i in range(circuit_def.num_gates):
+        if offsets[i + 1] - offsets[i] == 2:
+            a, b = operands[offsets[i]], operands[offsets[i] + 1]
+            key = (a, b) if a < b else (b, a)
+            weights[key] = weights.get(key, 0) + 1
+    return weights
+
+def initial_layout(circuit_def, graph):
+    """Choose a physical qubit for every logical qubit.
+
+    If every logical qubit name is also a physical qubit name, the layout
+    keeps them in place. Otherwise logical qubits are placed greedily in
+    order of interaction count, each on the free physical qubit minimizing
+    the interaction-weighted distance to the qubits already placed.
+    """
+    names = circuit_def.qubit_names
+    if len(names) > len(graph.nodes):
+        raise ValueError(f"Circuit {circuit_def.name} needs {len(names)} qubits but the hardware has {len(graph.nodes)}")
+    if all(name in graph.index for name in names):
+        return [graph.index[name] for name in names]
+
+    weights = _interactions(circuit_def)
+    partners = [dict() for _ in names]
+    for (a, b), weight in weights.items():
+        partners[a][b] = weight
+        partners[b][a] = weight
+    order = sorted(range(len(names)), key=lambda q: -sum(partners[q].values()))
+    layout = [None] * len(names)
+    free = set(range(len(graph.nodes)))
+    for q in order:
+        placed = [(layout[r], weight) for r, weight in partners[q].items() if layout[r] is not None]
+        best = None
+        for physical in free:
+            cost = 0
+            for other, weight in placed:
+                distance = graph.distance[physical][other]
+                cost += weight * (distance if distance is not None else len(graph.nodes))
+            key = (cost, -len(graph.neighbors[physical]), physical)
+            if best is None or key < best:
+                best = key
+        layout[q] = best[2]
+        free.discard(best[2])
+    return layout
+
+def route_circuit(circuit_def, graph=None, lookahead=20, layout=None):
+    """Insert SWAPs so every two-qubit gate acts on coupled physical qubits.
+
+    Gates are routed in order. While the next two-qubit gate is not on a
+    coupler, one of its qubits is swapped one step along a shortest path;
+    among those candidate swaps the one minimizing the summed distance of the
+    next ``lookahead`` two-qubit gates is chosen. Every swap shortens the
+    current gate's distance, so each gate needs at most ``distance - 1``
+    swaps. ``graph`` defaults to the circuit's ``qubit_connectivity`` block.
+    """
+    if circuit_def.control_blocks:
+        raise ValueError(f"Circuit {circuit_def.name} uses classical control flow, which routing does not support")
+    if graph is None:
+        graph = CouplingGraph.from_circuit(circuit_def)
+    if layout is None:
+        layout = initial_layout(circuit_def, graph)
+    distance = graph.distance
+    neighbors = graph.neighbors
+    names = circuit_def.qubit_names
+
+    position = list(layout)
+    occupant = [None] * len(graph.nodes)
+    for logical, physical in enumerate(position):
+        occupant[physical] = logical
+    initial = {names[q]: graph.nodes[p] for q, p in enumerate(position)}
+
+    routed = circuit_def.empty_copy()
+    routed.qubit_names = []
+    routed.qubit_index = {}
+    routed.qubit_declared = bytearray()
+    for node in graph.nodes:
+        routed.declare_qubit(node)
+    physical_names = graph.nodes
+
+    offsets = circuit_def.gate_offsets
+    operands = circuit_def.gate_operands
+    opcode_names = circuit_def.opcode_names
+    lines = circuit_def.gate_lines
+    two_qubit = [(operands[offsets[i]], operands[offsets[i] + 1])
+                 for i in range(circuit_def.num_gates) if offsets[i + 1] - offsets[i] == 2]
+    # Swaps never move a qubit out of its connected component, so the initial layout decides this.
+    for a, b in two_qubit:
+        if distance[position[a]][position[b]] is None:
+            raise ValueError(f"Qubits {names[a]} and {names[b]} are on disconnected parts of the hardware")
+
+    # touching[q] lists, in order, the gates of the lookahead window that act on logical qubit q.
+    touching = [[] for _ in names]
+
+    def enter(k):
+        if k < len(two_qubit):
+            for q in two_qubit[k]:
+                touching[q].append(k)
+
+    def leave(k):
+        for q in two_qubit[k]:
+            touching[q].pop(0)
+
+    for k in range(lookahead):
+        enter(k)
+
+    def shift(moved, source, target, other):
+        # Change in window distance when logical qubit ``moved`` goes from ``source`` to ``target``.
+        change = 0
+        for k in touching[moved]:
+            a, b = two_qubit[k]
+            partner = b if a == moved else a
+            if partner != other:
+                p = position[partner]
+                change += distance[target][p] - distance[source][p]
+        return change
+
+    def window_change(first, second):
+        # Only window gates on the two swapped logical qubits change distance, and a gate on both
+        # keeps it; the rest of the window cost is shared by every candidate, so the change ranks them.
+        a, b = occupant[first], occupant[second]
+        change = shift(a, first, second, b) if a is not None else 0
+        if b is not None:
+            change += shift(b, second, first, a)
+        return change
+
+    def apply_swap(first, second):
+        a, b = occupant[first], occupant[second]
+        occupant[first], occupant[second] = b, a
+        if a is not None:
+            position[a] = second
+        if b is not None:
+            position[b] = first
+        routed.gate_ops.append(swap)
+        routed.gate_operands.extend((first, second))
+        routed.gate_offsets.append(len(routed.gate_operands))
+        routed.gate_param_offsets.append(len(routed.gate_params))
+        routed.gate_lines.append(0)
+
+    # Physical qubit p is qubit p of the routed circuit and parameters keep their symbol
+    # indices, so gates are written straight into its packed arrays.
+    swap = routed.intern_opcode('Swap')
+    opcodes = [routed.intern_opcode(name) for name in opcode_names]
+    param_offsets = circuit_def.gate_param_offsets
+
+    def emit(opcode, qubits, line, source=None):
+        routed.gate_ops.append(opcode)
+        routed.gate_operands.extend(qubits)
+        routed.gate_offsets.append(len(routed.gate_operands))
+        if source is not None:
+            start, stop = param_offsets[source], param_offsets[source + 1]
+            if start != stop:
+                routed.gate_params.extend(circuit_def.gate_params[start:stop])
+                routed.gate_param_symbols.extend(circuit_def.gate_param_symbols[start:stop])
+                routed.gate_param_scales.extend(circuit_def.gate_param_scales[start:stop])
+        routed.gate_param_offsets.append(len(routed.gate_params))
+        routed.gate_lines.append(line)
+
+    swaps = unrouted = 0
+    next_two = 0
+    next_measure = 0
+    measure_positions = circuit_def.measure_positions
+    clbit_names = list(circuit_def.classical_bits)
+
+    def emit_measurements(upto):
+        nonlocal next_measure
+        while next_measure < len(measure_positions) and measure_positions[next_measure] <= upto:
+            qubit = circuit_def.measure_qubits[next_measure]
+            routed.append_measurement(physical_names[position[qubit]],
+                                      clbit_names[circuit_def.measure_clbits[next_measure]],
+                                      circuit_def.measure_lines[next_measure])
+            next_measure += 1
+
+    for i in range(circuit_def.num_gates):
+        emit_measurements(i)
+        qubits = operands[offsets[i]:offsets[i + 1]]
+        if len(qubits) == 2:
+            a, b = qubits
+            leave(next_two)
+            enter(next_two + lookahead)
+            next_two += 1
+            while distance[position[a]][position[b]] > 1:
+                pa, pb = position[a], position[b]
+                current = distance[pa][pb]
+                best = None
+                for moving, target in ((pa, pb), (pb, pa)):
+                    for neighbor in neighbors[moving]:
+                        if distance[neighbor][target] < current:
+                            key = window_change(moving, neighbor)
+                            if best is None or key < best[0]:
+                                best = (key, moving, neighbor)
+                apply_swap(best[1], best[2])
+                swaps += 1
+        elif len(qubits) > 2:
+            unrouted += 1
+        emit(opcodes[circuit_def.gate_ops[i]], [position[q] for q in qubits], lines[i], i)
+    emit_measurements(circuit_def.num_gates)
+
+    final = {names[q]: graph.nodes[p] for q, p in enumerate(position)}
+    return RoutingResult(routed, initial, final, swaps, unrouted)
@@ -0,0 +1,172 @@
+import copy
+import hashlib
+import threading
+from array import array
+
+import instrumentation
+from qiskit_parser import ELSE_PATTERN, iter_qadl_circuits, tokenize
+
+class BlockSpan:
+    """Source span of a ``Circuit``, ``module``, ``hardware`` or control-flow block.
+
+    ``start_line`` and ``end_line`` are the 1-based lines of the opening
+    statement and the closing brace. ``children`` holds the spans of nested
+    blocks. Top-level spans also carry the ``digest`` of their text and the
+    ``circuit`` parsed from it, or the ``error`` that parsing raised.
+    """
+
+    __slots__ = ('kind', 'name', 'start_line', 'end_line', 'children', 'digest', 'circuit', 'error')
+
+    def __init__(self, kind, name, start_line):
+        self.kind = kind
+        self.name = name
+        self.start_line = start_line
+        self.end_line = None
+        self.children = []
+        self.digest = None
+        self.circuit = None
+        self.error = None
+
+    def contains(self, line):
+        return self.start_line <= line <= (self.end_line or self.start_line)
+
+class IncrementalResult:
+    """Outcome of ``IncrementalParser.update``.
+
+    ``blocks`` are the top-level ``Circuit`` spans in source order,
+    ``circuits`` the successfully parsed circuits, ``stray_errors`` the
+    errors found outside any block, ``errors`` every ``SyntaxError`` found,
+    and ``reparsed`` the number of blocks whose text changed since the
+    previous update.
+    """
+
+    def __init__(self, blocks, stray_errors, reparsed):
+        self.blocks = blocks
+        self.circuits = [block.circuit for block in blocks if block.circuit is not None]
+        self.stray_errors = stray_errors
+        self.errors = stray_errors + [block.error for block in blocks if block.error is not None]
+        self.reparsed = reparsed
+
+    def block_at(self, line):
+        for block in self.blocks:
+            if block.contains(line):
+                return block
+        return None
+
+def _block_kind(token):
+    if token.kind in ('Circuit', 'module', 'hardware', 'qubit_connectivity'):
+        return token.kind
+    return 'control'
+
+def scan_blocks(lines):
+    """Build the block span tree for a buffer given as a list of lines.
+
+    Only block boundaries are tracked here; statements inside blocks are left
+    to the full parser. Statements outside any block are reported as errors.
+    """
+    blocks = []
+    errors = []
+    stack = []
+    for token in tokenize(lines):
+        if token.kind == 'close':
+            if stack and ELSE_PATTERN.match(token.text):
+                continue
+            if stack:
+                span = stack.pop()
+                span.end_line = token.line
+                if not stack:
+                    blocks.append(span)
+            else:
+                errors.append(SyntaxError(f"Syntax error on line {token.line}: Unrecognized statement."))
+        elif token.text[-1] == '{':
+            name = token.parts[1] if token.kind in ('Circuit', 'module') and len(token.parts) > 2 else None
+            span = BlockSpan(_block_kind(token), name, token.line)
+            if stack:
+                stack[-1].children.append(span)
+            stack.append(span)
+        elif not stack and token.kind != 'annotation':
+            errors.append(SyntaxError(f"Syntax error on line {token.line}: Unrecognized statement."))
+    if stack:
+        # An unterminated block runs to the end of the buffer; the parser reports it.
+        span = stack[0]
+        span.end_line = len(lines)
+        blocks.append(span)
+    return blocks, errors
+
+def _shift_lines(circuit, delta, shifted=None):
+    """Return a shallow copy of ``circuit`` with every source line moved by ``delta``.
+
+    The cached circuit may already be held by a worker, a render or a
+    running job, so it is never modified; only the line-bearing fields are
+    replaced in the copy, and the packed operation arrays stay shared.
+    """
+    # A module called from several scopes is shared, so it is copied only once.
+    if shifted is None:
+        shifted = {}
+    moved = shifted[id(circuit)] = copy.copy(circuit)
+    moved.gate_lines = array('I', [line + delta for line in circuit.gate_lines])
+    moved.measure_lines = array('I', [line + delta for line in circuit.measure_lines])
+    moved.control_blocks = []
+    for block in circuit.control_blocks:
+        block = copy.copy(block)
+        block.line += delta
+        moved.control_blocks.append(block)
+    moved.hardware_entries = [(key, args, line + delta) for key, args, line in circuit.hardware_entries]
+    moved.modules = {name: shifted.get(id(module)) or _shift_lines(module, delta, shifted)
+                     for name, module in circuit.modules.items()}
+    return moved
+
+class IncrementalParser:
+    """Re-parse only the top-level blocks whose text changed between updates.
+
+    Each ``Circuit`` block is hashed; blocks with a digest seen in the
+    previous update keep their already-built ``QuantumCircuitDef`` (or a
+    copy with line numbers shifted if the block moved), so unchanged
+    circuits also keep their content-hash cache entries downstream.
+    """
+
+    def __init__(self):
+        self._previous = {}
+        self._lock = threading.Lock()
+
+    def update(self, text):
+        with instrumentation.span('parse.incremental') as stage:
+            result = self._update(text)
+            stage.set(blocks=len(result.blocks), reparsed=result.reparsed, errors=len(result.errors))
+        return result
+
+    def _update(self, text):
+        lines = text.splitlines()
+        blocks, errors = scan_blocks(lines)
+        with self._lock:
+            previous = self._previous
+            current = {}
+            reparsed = 0
+            for block in blocks:
+                block_lines = lines[block.start_line - 1:block.end_line]
+                block.digest = hashlib.blake2b('\n'.join(block_lines).encode(), digest_size=16).hexdigest()
+                cached = previous.get(block.digest)
+                if cached is not None and block.digest not in current:
+                    start_line, circuit, error = cached
+                    if circuit is not None and start_line != block.start_line:
+                        circuit = _shift_lines(circuit, block.start_line - start_line)
+                    if error is not None and start_line != block.start_line:
+                        circuit, error = self._parse(block_lines, block.start_line)
+                else:
+                    reparsed += 1
+                    circuit, error = self._parse(block_lines, block.start_line)
+                block.circuit = circuit
+                block.error = error
+                current[block.digest] = (block.start_line, circuit, error)
+            self._previous = current
+        return IncrementalResult(blocks, errors, reparsed)
+
+    def _parse(self, block_lines, start_line):
+        try:
+            return next(iter_qadl_circuits(block_lines, start_line)), None
+        except SyntaxError as error:
+            return None, error
+
+    def reset(self):
+        with self._lock:
+            self._previous = {}
@@ -0,0 +1,243 @@
+"""Lightweight tracing of pipeline stages.
+
+The parser, executor, renderer and simulators wrap their stages in
+``span(name, **fields)`` and report cache lookups with ``count``. Events go
+to every installed sink; with no sink installed ``span`` returns a shared
+no-op context, so disabled instrumentation costs one function call per
+stage and nothing per gate.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+_RSS_SCALE = 1 if sys.platform == 'darwin' else 1024
+
+_sinks = ()
+_sinks_lock = threading.Lock()
+
+def _max_rss():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_SCALE
+
+class Event:
+    """One finished span or counter update.
+
+    ``start`` and ``wall`` are ``time.perf_counter`` seconds, ``cpu`` the CPU
+    time of the reporting thread and ``max_rss`` the process memory
+    high-water mark in bytes when the span ended (``None`` where the
+    platform does not report it). Counters have ``kind == 'count'`` and
+    carry their increment in ``fields['value']``.
+    """
+
+    __slots__ = ('name', 'kind', 'start', 'wall', 'cpu', 'fields', 'thread', 'max_rss')
+
+    def __init__(self, name, kind, start, wall, cpu, fields, thread, max_rss):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.wall = wall
+        self.cpu = cpu
+        self.fields = fields
+        self.thread = thread
+        self.max_rss = max_rss
+
+    def asdict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **fields):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ('name', 'fields', 'sinks', 'start', 'cpu')
+
+    def __init__(self, name, fields, sinks):
+        self.name = name
+        self.fields = fields
+        self.sinks = sinks
+
+    def __enter__(self):
+        self.cpu = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start
+        cpu = time.thread_time() - self.cpu
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        event = Event(self.name, 'span', self.start, wall, cpu, self.fields, threading.get_ident(), _max_rss())
+        for sink in self.sinks:
+            sink.emit(event)
+        return False
+
+    def set(self, **fields):
+        """Attach fields known only once the stage has run, such as gate counts."""
+        self.fields.update(fields)
+
+def enabled():
+    return bool(_sinks)
+
+def span(name, **fields):
+    """Return a context manager that reports the wall and CPU time of its body as ``name``."""
+    sinks = _sinks
+    if not sinks:
+        return _NULL_SPAN
+    return _Span(name, fields, sinks)
+
+def count(name, value=1, **fields):
+    """Report a counter increment, such as a cache hit."""
+    sinks = _sinks
+    if not sinks:
+        return
+    fields['value'] = value
+    event = Event(name, 'count', time.perf_counter(), 0.0, 0.0, fields, threading.get_ident(), None)
+    for sink in sinks:
+        sink.emit(event)
+
+def add_sink(sink):
+    global _sinks
+    with _sinks_lock:
+        if sink not in _sinks:
+            _sinks = _sinks + (sink,)
+
+def remove_sink(sink):
+    global _sinks
+    with _sinks_lock:
+        _sinks = tuple(installed for installed in _sinks if installed is not sink)
+
+@contextmanager
+def instrumented(*sinks):
+    """Install ``sinks`` for the duration of a ``with`` block, then flush them."""
+    for sink in sinks:
+        add_sink(sink)
+    try:
+        yield sinks[0] if len(sinks) == 1 else sinks
+    finally:
+        for sink in sinks:
+            remove_sink(sink)
+            sink.flush()
+
+class MemorySink:
+    """Keep events in a list, optionally only the last ``limit`` of them."""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.events = []
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        with self._lock:
+            self.events.append(event)
+            if self.limit is not None and len(self.events) > self.limit:
+                del self.events[:len(self.events) - self.limit]
+
+    def flush(self):
+        pass
+
+    def drain(self, thread=None):
+        """Remove and return the events, only those of ``thread`` if given."""
+        with self._lock:
+            if thread is None:
+                events, self.events = self.events, []
+            else:
+                events = [event for event in self.events if event.thread == thread]
+                self.events = [event for event in self.events if event.thread != thread]
+        return events
+
+    def summary(self):
+        """Return ``{name: {'calls', 'wall', 'cpu'}}`` for spans and ``{name: {'total'}}`` for counters."""
+        totals = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            if event.kind == 'count':
+                entry = totals.setdefault(event.name, {'total': 0})
+                entry['total'] += event.fields['value']
+            else:
+                entry = totals.setdefault(event.name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+                entry['calls'] += 1
+                entry['wall'] += event.wall
+                entry['cpu'] += event.cpu
+        return totals
+
+class JsonLinesSink:
+    """Append one JSON object per event to a file path or an open text stream."""
+
+    def __init__(self, target):
+        self._owned = isinstance(target, (str, os.PathLike))
+        self.stream = open(target, 'a', encoding='utf-8') if self._owned else target
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event.asdict(), default=str)
+        with self._lock:
+            self.stream.write(line + '\n')
+
+    def flush(self):
+        with self._lock:
+            self.stream.flush()
+
+    def close(self):
+        self.flush()
+        if self._owned:
+            self.stream.close()
+
+class ChromeTraceSink:
+    """Collect events in Chrome trace-event format and write them to ``path`` on ``flush``.
+
+    The file loads in ``chrome://tracing`` and Perfetto: spans are complete
+    (``X``) events on their thread's track and counters are running totals.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.trace_events = []
+        self._totals = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        timestamp = event.start * 1e6
+        with self._lock:
+            if event.kind == 'count':
+                total = self._totals[event.name] = self._totals.get(event.name, 0) + event.fields['value']
+                self.trace_events.append({'name': event.name, 'ph': 'C', 'ts': timestamp, 'pid': self._pid,
+                                          'args': {'value': total}})
+            else:
+                args = dict(event.fields, cpu_ms=event.cpu * 1e3)
+                if event.max_rss is not None:
+                    args['max_rss'] = event.max_rss
+                self.trace_events.append({'name': event.name, 'cat': 'qadl', 'ph': 'X', 'ts': timestamp,
+                                          'dur': event.wall * 1e6, 'pid': self._pid, 'tid': event.thread,
+                                          'args': args})
+
+    def flush(self):
+        with self._lock:
+            document = {'traceEvents': list(self.trace_events), 'displayTimeUnit': 'ms'}
+        with open(self.path, 'w', encoding='utf-8') as handle:
+            json.dump(document, handle, default=str)
+
+    def close(self):
+        self.flush()
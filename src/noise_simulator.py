@@ -0,0 +1,183 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from gate_registry import ModuleSpec, resolve_gate
+from instrumentation import span
+from statevector_simulator import (MAX_BATCH_AMPLITUDES, GateMatrices, SimulationResult, Statevector,
+                                   apply_gate, fold_counts, measures_midway)
+
+class NoiseModel:
+    """Per-qubit damping probabilities applied after every gate on that qubit.
+
+    ``amplitude[q]`` is the amplitude-damping probability (|1> decays to |0>)
+    and ``phase[q]`` the phase-damping probability, both per gate.
+    """
+
+    def __init__(self, amplitude=None, phase=None):
+        self.amplitude = dict(amplitude or {})
+        self.phase = dict(phase or {})
+
+    def __bool__(self):
+        return any(self.amplitude.values()) or any(self.phase.values())
+
+    @classmethod
+    def from_circuit(cls, circuit_def):
+        """Read the ``hardware`` block of ``circuit_def``.
+
+        ``decoherence_rate <qubit> <p>`` sets both amplitude and phase damping
+        to ``p``; ``amplitude_damping`` and ``phase_damping`` set one each.
+        """
+        model = cls()
+        for key, args, line in circuit_def.hardware_entries:
+            if key not in ('decoherence_rate', 'amplitude_damping', 'phase_damping'):
+                continue
+            if len(args) != 2:
+                raise SyntaxError(f"Syntax error on line {line}: Expected '{key} <qubit> <rate>'")
+            qubit, rate = args
+            try:
+                rate = float(rate)
+            except ValueError:
+                raise SyntaxError(f"Syntax error on line {line}: Invalid {key} value '{rate}'") from None
+            if not 0 <= rate <= 1:
+                raise SyntaxError(f"Syntax error on line {line}: {key} must be between 0 and 1")
+            if qubit not in circuit_def.qubit_index:
+                raise SyntaxError(f"Syntax error on line {line}: Unknown qubit '{qubit}'")
+            index = circuit_def.qubit_index[qubit]
+            if key != 'phase_damping':
+                model.amplitude[index] = rate
+            if key != 'amplitude_damping':
+                model.phase[index] = rate
+        return model
+
+def _damp(state, qubit, probability, rng, amplitude):
+    """Advance every trajectory through one damping channel on ``qubit``.
+
+    Each trajectory jumps with probability ``probability * P(qubit = 1)``.
+    Amplitude damping jumps move the |1> branch to |0>; phase damping jumps
+    project onto |1>. Non-jump trajectories scale |1> by
+    ``sqrt(1 - probability)``. The post-channel norms follow from
+    ``P(qubit = 1)``, so renormalization is folded into the same scaling.
+    """
+    view = state.data.reshape(state.batch, -1, 2, 1 << qubit)
+    zero = view[:, :, 0, :]
+    one = view[:, :, 1, :]
+    excited = np.einsum('tij,tij->t', one, one.conj()).real
+    jump = rng.random(state.batch) < probability * excited
+    rows = np.flatnonzero(jump)
+    if len(rows):
+        jumped = one[rows] / np.sqrt(excited[rows])[:, None, None]
+    keep_norm = np.sqrt(np.maximum(1 - probability * excited, 1e-300))
+    zero *= (1 / keep_norm)[:, None, None]
+    one *= (math.sqrt(1 - probability) / keep_norm)[:, None, None]
+    if len(rows):
+        if amplitude:
+            zero[rows] = jumped
+            one[rows] = 0
+        else:
+            zero[rows] = 0
+            one[rows] = jumped
+
+def _sample_trajectories(state, shot_counts, rng):
+    """Draw ``shot_counts[t]`` outcomes from trajectory ``t`` with one vectorized search."""
+    probabilities = np.abs(state.batched()) ** 2
+    cumulative = np.cumsum(probabilities, axis=1)
+    cumulative /= cumulative[:, -1:]
+    cumulative += np.arange(state.batch)[:, None]
+    draws = rng.random((state.batch, int(shot_counts.max(initial=0)))) + np.arange(state.batch)[:, None]
+    draws = draws[np.arange(draws.shape[1]) < shot_counts[:, None]]
+    flat = np.searchsorted(cumulative.reshape(-1), draws.reshape(-1), side='right')
+    flat = np.minimum(flat, cumulative.size - 1)
+    return flat % (1 << state.num_qubits)
+
+def _gates(circuit_def, qubits, parameters):
+    """Yield ``(spec, qubits, params)`` per gate with module calls expanded in place.
+
+    Calls are expanded so damping follows every gate inside a module rather
+    than the call as a whole.
+    """
+    specs = [resolve_gate(name, circuit_def) for name in circuit_def.opcode_names]
+    offsets = circuit_def.gate_offsets
+    operands = circuit_def.gate_operands
+    for i, opcode in enumerate(circuit_def.gate_ops):
+        targets = [qubits[q] for q in operands[offsets[i]:offsets[i + 1]]]
+        spec = specs[opcode]
+        spec.check_arity(len(targets))
+        params = circuit_def.gate_values(i, parameters)
+        spec.check_params(len(params))
+        if isinstance(spec, ModuleSpec):
+            yield from _gates(spec.module, targets, parameters)
+        else:
+            yield spec, targets, params
+
+def _run_batch(job):
+    circuit_def, model, batch, shot_counts, seed, dtype, parameters = job
+    rng = np.random.default_rng(seed)
+    state = Statevector(circuit_def.num_qubits, dtype, batch)
+    matrices = GateMatrices(dtype, parameters)
+    for spec, qubits, params in _gates(circuit_def, range(circuit_def.num_qubits), parameters):
+        apply_gate(state, spec, qubits, matrices, params)
+        for qubit in qubits:
+            gamma = model.amplitude.get(qubit)
+            if gamma:
+                _damp(state, qubit, gamma, rng, True)
+            lam = model.phase.get(qubit)
+            if lam:
+                _damp(state, qubit, lam, rng, False)
+    outcomes = _sample_trajectories(state, shot_counts, rng)
+    states, hits = np.unique(outcomes, return_counts=True)
+    return fold_counts(states, hits, circuit_def)
+
+def simulate_noisy(circuit_def, shots=1024, trajectories=None, seed=None, workers=1,
+                   model=None, dtype=np.complex128, parameters=None):
+    """Estimate noisy measurement counts by Monte Carlo quantum trajectories.
+
+    ``trajectories`` independent pure-state trajectories (default
+    ``min(shots, 1024)``) are simulated in batches that share one array, so
+    each gate and damping channel is a single vectorized kernel over the
+    whole batch. ``shots`` are split evenly across the trajectories, the
+    first ``shots % trajectories`` taking one extra. With ``workers > 1`` batches run across a process pool. The
+    noise model defaults to the circuit's ``hardware`` block and
+    ``parameters`` binds symbolic gate parameters by name.
+    """
+    undeclared = circuit_def.undeclared_qubits()
+    if undeclared:
+        raise ValueError(f"Undeclared qubit: {undeclared[0]}")
+    if circuit_def.control_blocks:
+        raise ValueError(f"Circuit {circuit_def.name} uses classical control flow, which the trajectory simulator does not support")
+    if measures_midway(circuit_def):
+        raise ValueError(f"Circuit {circuit_def.name} measures a qubit before its last gate, which the trajectory simulator does not support")
+    if model is None:
+        model = NoiseModel.from_circuit(circuit_def)
+    if trajectories is None:
+        trajectories = max(1, min(shots, 1024))
+    shot_counts = np.full(trajectories, shots // trajectories, dtype=np.int64)
+    shot_counts[:shots % trajectories] += 1
+    batch_size = max(1, min(trajectories, MAX_BATCH_AMPLITUDES >> circuit_def.num_qubits))
+
+    sizes = [batch_size] * (trajectories // batch_size)
+    if trajectories % batch_size:
+        sizes.append(trajectories % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    starts = np.cumsum([0] + sizes[:-1])
+    jobs = [(circuit_def, model, size, shot_counts[start:start + size], child, dtype, parameters)
+            for start, size, child in zip(starts, sizes, seeds)]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    with span('simulate.noisy', circuit=circuit_def.name, gates=circuit_def.num_gates,
+              qubits=circuit_def.num_qubits, trajectories=trajectories, workers=workers):
+        if workers <= 1:
+            partials = [_run_batch(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                partials = list(pool.map(_run_batch, jobs))
+
+    counts = {}
+    for partial in partials:
+        for key, hit in partial.items():
+            counts[key] = counts.get(key, 0) + hit
+    return SimulationResult(circuit_def.name, None, counts, shots, 'noisy')
@@ -0,0 +1,158 @@
+import numpy as np
+
+from gate_registry import ModuleSpec, resolve_gate
+from qiskit_parser import GateParameter
+from statevector_simulator import GateMatrices, Statevector, apply_gate, measures_midway
+
+# Amplitudes per sweep batch. Batches this size (1 MiB at complex128) stay in
+# cache across the gate list, which beats larger batches that stream memory.
+SWEEP_BATCH_AMPLITUDES = 1 << 16
+
+class SweepResult:
+    """Outcome of ``sweep_circuit`` over a parameter grid.
+
+    ``points[k]`` holds the values of ``names`` at grid point ``k``, in
+    row-major order over ``shape``. ``probabilities[k, v]`` is the
+    probability of classical register value ``v`` at that point.
+    ``counts[k]`` holds the sampled counts when shots were requested, and
+    ``statevectors[k]`` the final state when it was kept.
+    """
+
+    def __init__(self, name, names, shape, points, probabilities, counts=None, statevectors=None):
+        self.name = name
+        self.names = names
+        self.shape = shape
+        self.points = points
+        self.probabilities = probabilities
+        self.counts = counts
+        self.statevectors = statevectors
+
+    def grid(self):
+        """Return ``probabilities`` reshaped to ``shape + (register values,)``."""
+        return self.probabilities.reshape(self.shape + (-1,))
+
+def parameter_grid(values):
+    """Return ``(names, shape, points)`` for every combination of ``values``.
+
+    ``values`` maps parameter names to sequences of values; ``points`` is a
+    ``(grid size, len(names))`` array with the last name varying fastest.
+    """
+    names = list(values)
+    axes = [np.atleast_1d(np.asarray(values[name], dtype=np.float64)) for name in names]
+    shape = tuple(len(axis) for axis in axes)
+    if not names:
+        return names, shape, np.zeros((1, 0))
+    mesh = np.meshgrid(*axes, indexing='ij')
+    return names, shape, np.stack([column.reshape(-1) for column in mesh], axis=1)
+
+def _compile(circuit_def, names):
+    """Resolve every gate once into ``(spec, qubits, params, columns)``.
+
+    ``params`` are the constant parameters of gates without symbols. For
+    symbolic gates ``columns`` lists ``(column, scale, offset)`` per
+    parameter, with column ``-1`` for a constant ``offset``; they must have a
+    matrix, else ``ValueError`` is raised. Calls of modules without symbols
+    stay single steps; the others are expanded.
+    """
+    column_of = {name: column for column, name in enumerate(names)}
+    for name in names:
+        if name not in circuit_def.parameter_index:
+            raise ValueError(f"Unknown parameter: {name}")
+    steps = []
+
+    def emit(circuit_def, qubit_map):
+        specs = [resolve_gate(name, circuit_def) for name in circuit_def.opcode_names]
+        for i, opcode in enumerate(circuit_def.gate_ops):
+            spec = specs[opcode]
+            qubits = [qubit_map[q] for q in circuit_def.gate_qubits(i)]
+            spec.check_arity(len(qubits))
+            params = circuit_def.gate_parameters(i)
+            spec.check_params(len(params))
+            if isinstance(spec, ModuleSpec) and spec.module.parameter_names:
+                emit(spec.module, qubits)
+                continue
+            if not any(isinstance(param, GateParameter) for param in params):
+                steps.append((spec, qubits, tuple(params), None))
+                continue
+            columns = []
+            for param in params:
+                if not isinstance(param, GateParameter):
+                    columns.append((-1, 0.0, param))
+                elif param.name not in column_of:
+                    raise ValueError(f"Unbound parameter: {param.name}")
+                else:
+                    columns.append((column_of[param.name], param.scale, param.offset))
+            if spec.matrix is None:
+                raise ValueError(f"Gate {spec.name} on line {circuit_def.gate_lines[i]} has no matrix, "
+                                 f"so its symbolic parameters cannot be swept")
+            steps.append((spec, qubits, None, columns))
+
+    emit(circuit_def, range(circuit_def.num_qubits))
+    return steps
+
+def _register_values(circuit_def):
+    """Return the classical register value read out of every basis state."""
+    states = np.arange(1 << circuit_def.num_qubits, dtype=np.int64)
+    values = np.zeros_like(states)
+    for qubit, clbit in zip(circuit_def.measure_qubits, circuit_def.measure_clbits):
+        values &= ~np.int64(1 << clbit)
+        values |= ((states >> qubit) & 1) << clbit
+    return values
+
+def sweep_circuit(circuit_def, values, shots=None, seed=None, dtype=np.complex128, keep_states=False):
+    """Simulate ``circuit_def`` at every point of the ``values`` parameter grid.
+
+    The circuit is compiled once into a list of resolved gates. Grid points
+    are then run in cache-sized batches that share one ``Statevector``:
+    constant gates advance the whole batch with one kernel, and a symbolic
+    gate applies its per-point matrices with ``Statevector.apply_batched``.
+    With ``shots`` the classical register is also sampled at every point.
+    """
+    undeclared = circuit_def.undeclared_qubits()
+    if undeclared:
+        raise ValueError(f"Undeclared qubit: {undeclared[0]}")
+    if circuit_def.control_blocks or measures_midway(circuit_def):
+        raise ValueError(f"Circuit {circuit_def.name} has control flow or mid-circuit measurements and cannot be swept")
+    names, shape, points = parameter_grid(values)
+    steps = _compile(circuit_def, names)
+
+    num_qubits = circuit_def.num_qubits
+    num_values = 1 << len(circuit_def.classical_bits)
+    register = _register_values(circuit_def)
+    matrices = GateMatrices(dtype)
+    batch_size = max(1, SWEEP_BATCH_AMPLITUDES >> num_qubits)
+    probabilities = np.empty((len(points), num_values))
+    statevectors = np.empty((len(points), 1 << num_qubits), dtype=dtype) if keep_states else None
+
+    for start in range(0, len(points), batch_size):
+        chunk = points[start:start + batch_size]
+        state = Statevector(num_qubits, dtype, len(chunk))
+        for spec, qubits, params, columns in steps:
+            if columns is None:
+                apply_gate(state, spec, qubits, matrices, params)
+            else:
+                angles = np.stack([chunk[:, column] * scale + offset if column >= 0 else np.full(len(chunk), offset)
+                                   for column, scale, offset in columns], axis=1)
+                # Grid points repeat each angle, so build one matrix per distinct value.
+                distinct, inverse = np.unique(angles, axis=0, return_inverse=True)
+                unitaries = np.array([spec.unitary(tuple(point)) for point in distinct.tolist()], dtype=dtype)
+                state.apply_batched(unitaries[inverse.reshape(-1)], qubits)
+        amplitudes = state.batched()
+        weights = np.abs(amplitudes).astype(np.float64) ** 2
+        rows = np.arange(len(chunk))[:, None] * num_values + register
+        folded = np.bincount(rows.reshape(-1), weights.reshape(-1), minlength=len(chunk) * num_values)
+        probabilities[start:start + len(chunk)] = folded.reshape(len(chunk), num_values)
+        if keep_states:
+            statevectors[start:start + len(chunk)] = amplitudes
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+    counts = None
+    if shots:
+        rng = np.random.default_rng(seed)
+        width = len(circuit_def.classical_bits)
+        counts = []
+        for hits in rng.multinomial(shots, probabilities):
+            observed = np.flatnonzero(hits)
+            counts.append({format(value, f'0{width}b'): hit
+                           for value, hit in zip(observed.tolist(), hits[observed].tolist())})
+    return SweepResult(circuit_def.name, names, shape, points, probabilities, counts, statevectors)
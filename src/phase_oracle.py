@@ -0,0 +1,239 @@
+"""Phase oracles defined in QADL by marked bitstrings or a boolean expression.
+
+Two forms of the ``oracle`` statement define one::
+
+    oracle Mark marks 101 011
+    oracle Sat(a, b, c) = (a | b) & ~c
+
+``gate Mark q0 q1 q2`` then flips the sign of every basis state of its
+qubits that the oracle marks. Qubits bind to the characters of a bitstring
+or to the inputs of an expression in order, so the first listed qubit is
+the most significant bit, as for gate matrices. Expressions combine inputs
+with ``&``/``and``, ``|``/``or``, ``^``, ``~``/``not``, ``==``, ``!=``,
+the constants ``0`` and ``1`` and parentheses.
+
+The truth table is evaluated on Python integers used as ``2**n``-bit sets,
+with bit ``x`` standing for basis state ``x``, so every operator of the
+expression is one big-integer operation and nothing loops over basis
+states in Python.
+"""
+
+import ast
+import math
+import re
+
+from gate_registry import flip_all_ones
+
+ORACLE_EXPRESSION_PATTERN = re.compile(r'^oracle\s+(\w+)\s*\(([^)]*)\)\s*=\s*(.+)$')
+IDENTIFIER_PATTERN = re.compile(r'^[A-Za-z_]\w*$')
+BITSTRING_PATTERN = re.compile(r'^[01]+$')
+
+class OracleDefinition:
+    """One ``oracle`` statement: the name, the inputs and how marked states are found.
+
+    ``marks`` holds the marked basis states of a bitstring definition and
+    ``expression`` the checked ``ast`` node of an expression definition; the
+    other is ``None``. ``text`` is the statement itself, which is all that
+    needs storing to rebuild the definition.
+    """
+
+    __slots__ = ('name', 'inputs', 'marks', 'expression', 'text', '_table')
+
+    def __init__(self, name, inputs, marks=None, expression=None, text=''):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.marks = None if marks is None else tuple(sorted(set(marks)))
+        self.expression = expression
+        self.text = text
+        self._table = None
+
+    @property
+    def num_qubits(self):
+        return len(self.inputs)
+
+    def truth_table(self):
+        """Return the integer whose bit ``x`` is set when basis state ``x`` is marked."""
+        if self._table is None:
+            if self.marks is not None:
+                table = 0
+                for state in self.marks:
+                    table |= 1 << state
+            else:
+                table = _evaluate(self.expression, self._variables(), (1 << (1 << self.num_qubits)) - 1)
+            self._table = table
+        return self._table
+
+    def _variables(self):
+        # Input j is bit k - 1 - j of the basis state: runs of 2**bit clear then set bits, repeated.
+        k = self.num_qubits
+        size = 1 << k
+        variables = {}
+        for j, name in enumerate(self.inputs):
+            run = 1 << (k - 1 - j)
+            pattern = ((1 << run) - 1) << run
+            width = run << 1
+            while width < size:
+                pattern |= pattern << width
+                width <<= 1
+            variables[name] = pattern
+        return variables
+
+    def num_marked(self):
+        return len(self.marks) if self.marks is not None else self.truth_table().bit_count()
+
+    def marked_states(self):
+        """Return the marked basis states in increasing order."""
+        if self.marks is not None:
+            return list(self.marks)
+        table = self.truth_table()
+        states = []
+        while table:
+            low = table & -table
+            states.append(low.bit_length() - 1)
+            table ^= low
+        return states
+
+    def monomials(self):
+        """Return the algebraic normal form of the oracle as a list of basis-state masks.
+
+        The marked-state indicator is the XOR of one AND term per mask, over
+        the inputs whose bits the mask sets. It is the Moebius transform of
+        the truth table, one shift per input on the whole bit set.
+        """
+        table = self.truth_table()
+        size = 1 << self.num_qubits
+        full = (1 << size) - 1
+        variables = self._variables()
+        for bit, name in zip(range(self.num_qubits - 1, -1, -1), self.inputs):
+            table ^= (table & (full ^ variables[name])) << (1 << bit)
+        masks = []
+        while table:
+            low = table & -table
+            masks.append(low.bit_length() - 1)
+            table ^= low
+        return masks
+
+    def apply(self, qc, qubits):
+        """Append the oracle to the Qiskit circuit ``qc`` as multi-controlled phase flips.
+
+        Two constructions are compared and the one with fewer flips is used.
+        The first flips each marked state with one multi-controlled Z between
+        X gates on its zero bits, toggling only the bits that change from one
+        state to the next; when more than half the states are marked it
+        flips the unmarked ones and adds a global phase of ``pi``. The second
+        flips the sign once per term of the algebraic normal form, with a
+        multi-controlled Z on just that term's qubits, so a parity oracle
+        becomes one Z per qubit.
+        """
+        k = len(qubits)
+        size = 1 << k
+        states = self.marked_states()
+        complement = len(states) > size // 2
+        monomials = self.monomials()
+        if len(monomials) <= min(len(states), size - len(states)):
+            for mask in monomials:
+                if mask:
+                    flip_all_ones(qc, [qubits[j] for j in range(k) if mask >> (k - 1 - j) & 1])
+                else:
+                    qc.global_phase += math.pi
+            return
+        if complement:
+            marked = set(states)
+            states = [state for state in range(size) if state not in marked]
+            qc.global_phase += math.pi
+        flipped = 0
+        for state in states:
+            # X on the qubits whose bit is 0 so the state reads as all ones.
+            wanted = ~state & (size - 1)
+            for j in range(k):
+                if (wanted ^ flipped) >> (k - 1 - j) & 1:
+                    qc.x(qubits[j])
+            flipped = wanted
+            flip_all_ones(qc, qubits)
+        for j in range(k):
+            if flipped >> (k - 1 - j) & 1:
+                qc.x(qubits[j])
+
+    def __repr__(self):
+        return f"OracleDefinition({self.name!r}, {', '.join(self.inputs)})"
+
+def _evaluate(node, variables, full):
+    if isinstance(node, ast.Name):
+        return variables[node.id]
+    if isinstance(node, ast.Constant):
+        return full if node.value else 0
+    if isinstance(node, ast.UnaryOp):
+        return full ^ _evaluate(node.operand, variables, full)
+    if isinstance(node, ast.BoolOp):
+        values = [_evaluate(value, variables, full) for value in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = result & value if isinstance(node.op, ast.And) else result | value
+        return result
+    if isinstance(node, ast.Compare):
+        difference = _evaluate(node.left, variables, full) ^ _evaluate(node.comparators[0], variables, full)
+        return full ^ difference if isinstance(node.ops[0], ast.Eq) else difference
+    left = _evaluate(node.left, variables, full)
+    right = _evaluate(node.right, variables, full)
+    if isinstance(node.op, ast.BitAnd):
+        return left & right
+    if isinstance(node.op, ast.BitOr):
+        return left | right
+    return left ^ right
+
+def _check_expression(node, inputs, line_number):
+    """Raise ``SyntaxError`` unless ``node`` only uses the supported operators on ``inputs``."""
+    def fail(message):
+        raise SyntaxError(f"Syntax error on line {line_number}: {message}")
+
+    if isinstance(node, ast.Name):
+        if node.id not in inputs:
+            fail(f"Oracle expression uses '{node.id}', which is not one of its inputs")
+    elif isinstance(node, ast.Constant):
+        if node.value not in (0, 1) or isinstance(node.value, float):
+            fail(f"Oracle expression constants must be 0 or 1, got {node.value!r}")
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Invert, ast.Not)):
+        _check_expression(node.operand, inputs, line_number)
+    elif isinstance(node, ast.BoolOp):
+        for value in node.values:
+            _check_expression(value, inputs, line_number)
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr, ast.BitXor)):
+        _check_expression(node.left, inputs, line_number)
+        _check_expression(node.right, inputs, line_number)
+    elif (isinstance(node, ast.Compare) and len(node.ops) == 1
+          and isinstance(node.ops[0], (ast.Eq, ast.NotEq))):
+        _check_expression(node.left, inputs, line_number)
+        _check_expression(node.comparators[0], inputs, line_number)
+    else:
+        fail(f"Unsupported oracle expression '{ast.unparse(node)}'")
+
+def parse_oracle(text, line_number=0):
+    """Parse an ``oracle`` statement into an ``OracleDefinition``, raising ``SyntaxError`` if malformed."""
+    parts = text.split()
+    if len(parts) >= 3 and parts[2] == 'marks':
+        name, bitstrings = parts[1], parts[3:]
+        if not IDENTIFIER_PATTERN.match(name):
+            raise SyntaxError(f"Syntax error on line {line_number}: Invalid oracle name '{name}'")
+        if not bitstrings or not all(BITSTRING_PATTERN.match(bits) for bits in bitstrings):
+            raise SyntaxError(f"Syntax error on line {line_number}: Invalid oracle declaration. Expected 'oracle <name> marks <bitstrings...>'")
+        width = len(bitstrings[0])
+        if any(len(bits) != width for bits in bitstrings):
+            raise SyntaxError(f"Syntax error on line {line_number}: Marked bitstrings of oracle {name} differ in length")
+        return OracleDefinition(name, [f"x{j}" for j in range(width)], marks=[int(bits, 2) for bits in bitstrings],
+                                text=text)
+
+    match = ORACLE_EXPRESSION_PATTERN.match(text)
+    if match is None:
+        raise SyntaxError(f"Syntax error on line {line_number}: Invalid oracle declaration. Expected 'oracle <name> marks <bitstrings...>' or 'oracle <name>(<inputs>) = <expression>'")
+    name, inputs, expression = match.groups()
+    inputs = [item.strip() for item in inputs.split(',')] if inputs.strip() else []
+    if not inputs or not all(IDENTIFIER_PATTERN.match(item) for item in inputs):
+        raise SyntaxError(f"Syntax error on line {line_number}: Oracle {name} needs a list of input names")
+    if len(set(inputs)) != len(inputs):
+        raise SyntaxError(f"Syntax error on line {line_number}: Oracle {name} names an input twice")
+    try:
+        node = ast.parse(expression.strip(), mode='eval').body
+    except SyntaxError:
+        raise SyntaxError(f"Syntax error on line {line_number}: Invalid oracle expression '{expression.strip()}'") from None
+    _check_expression(node, set(inputs), line_number)
+    return OracleDefinition(name, inputs, expression=node, text=text)
@@ -0,0 +1,214 @@
+"""Headless ``qadl`` command line: check, analyze, compile, simulate or render QADL files.
+
+Run as ``python qadl_cli.py <command> <paths...>``. Only the standard library
+and the parser are imported at startup; NumPy, Qiskit and matplotlib are
+imported by the commands that need them, so ``check`` starts quickly enough
+for pre-commit hooks.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from circuit_validator import ERROR, validate_circuit
+from qiskit_parser import iter_qadl_circuits
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+def find_sources(paths):
+    """Return the ``.qadl`` files named by ``paths``, walking directories in sorted order."""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                sources.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.qadl'))
+        else:
+            sources.append(path)
+    return sources
+
+def _summary(circuit_def):
+    return {'circuit': circuit_def.name, 'qubits': circuit_def.num_qubits,
+            'gates': circuit_def.num_gates, 'measurements': len(circuit_def.measure_qubits)}
+
+def _check(circuit_def, options, stem):
+    return _summary(circuit_def)
+
+def _analyze(circuit_def, options, stem):
+    from circuit_analysis import analyze_circuit
+    return analyze_circuit(circuit_def).asdict(options.critical_path, options.shots)
+
+def _compile(circuit_def, options, stem):
+    from circuit_optimizer import optimize_circuit
+    from qiskit_executor import build_circuit
+    if options.optimize:
+        circuit_def, _ = optimize_circuit(circuit_def)
+    qc = build_circuit(circuit_def)
+    result = _summary(circuit_def)
+    result.update(size=qc.size(), depth=qc.depth())
+    if options.output_dir:
+        from qiskit import qpy
+        path = os.path.join(options.output_dir, f"{stem}_{circuit_def.name}.qpy")
+        with open(path, 'wb') as handle:
+            qpy.dump(qc, handle)
+        result['output'] = path
+    return result
+
+def _simulate(circuit_def, options, stem):
+    if options.noise:
+        from noise_simulator import simulate_noisy
+        outcome = simulate_noisy(circuit_def, options.shots, seed=options.seed, parameters=options.parameters)
+    else:
+        from statevector_simulator import simulate_circuit
+        outcome = simulate_circuit(circuit_def, options.shots, options.seed, parameters=options.parameters,
+                                   method=options.method, keep_state=False)
+    result = _summary(circuit_def)
+    result['method'] = outcome.method
+    result['counts'] = dict(sorted(outcome.counts.items()))
+    if circuit_def.error_correction:
+        from syndrome_decoder import decode_counts
+        result['logical_counts'] = dict(sorted(decode_counts(circuit_def, outcome.counts).items()))
+    return result
+
+def _render(circuit_def, options, stem):
+    import matplotlib
+    matplotlib.use('Agg')
+    from circuit_cache import get_cache
+    from qiskit_executor import execute_circuit
+    path = os.path.join(options.output_dir or '.', f"{stem}_{circuit_def.name}.png")
+    execute_circuit(circuit_def, path, None if options.no_cache else get_cache(), options.optimize)
+    result = _summary(circuit_def)
+    result['output'] = path
+    return result
+
+COMMANDS = {
+    'check': _check,
+    'analyze': _analyze,
+    'compile': _compile,
+    'simulate': _simulate,
+    'render': _render,
+}
+
+def _read_circuits(path, options):
+    if options.compiled:
+        from compiled_circuit import load_qadl_file
+        yield from load_qadl_file(path)
+        return
+    with open(path, encoding='utf-8') as handle:
+        yield from iter_qadl_circuits(handle)
+
+def run_file(job):
+    """Run one command over every circuit of one file and return its JSON record."""
+    command, path, options = job
+    record = {'path': path, 'circuits': [], 'errors': [], 'warnings': []}
+    stem = os.path.splitext(os.path.basename(path))[0]
+    try:
+        for circuit_def in _read_circuits(path, options):
+            diagnostics = validate_circuit(circuit_def)
+            for diagnostic in diagnostics:
+                field = 'errors' if diagnostic.severity == ERROR else 'warnings'
+                record[field].append(f"{diagnostic.circuit}: {diagnostic}")
+            if any(diagnostic.severity == ERROR for diagnostic in diagnostics):
+                continue
+            try:
+                record['circuits'].append(COMMANDS[command](circuit_def, options, stem))
+            except (SyntaxError, ValueError) as error:
+                record['errors'].append(f"{circuit_def.name}: {error}")
+    except (OSError, SyntaxError, ValueError) as error:
+        record['errors'].append(str(error))
+    return record
+
+def _parameter(item):
+    name, _, value = item.partition('=')
+    try:
+        if name.strip():
+            return name.strip(), float(value)
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"invalid parameter binding '{item}', expected NAME=VALUE")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='qadl', description="Check, analyze, compile, simulate or render QADL files.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('check', "parse and validate circuits"),
+                            ('analyze', "report depth, gate counts and simulation memory"),
+                            ('compile', "translate circuits to Qiskit"),
+                            ('simulate', "sample circuits with the native simulator"),
+                            ('render', "draw circuit diagrams")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('paths', nargs='+', help=".qadl files or directories searched recursively")
+        command.add_argument('-j', '--jobs', type=int, default=1,
+                             help="worker processes; 0 uses every CPU (default: 1)")
+        command.add_argument('--json', action='store_true', help="print one JSON document instead of text")
+        command.add_argument('--compiled', action='store_true',
+                             help="load circuits from .qadlc files next to the sources, rebuilding stale ones")
+        if name in ('compile', 'render'):
+            command.add_argument('-o', '--output-dir', help="directory for QPY files or diagrams")
+            command.add_argument('--optimize', action='store_true', help="run the circuit optimizer first")
+        if name == 'render':
+            command.add_argument('--no-cache', action='store_true', help="always translate and draw again")
+        if name == 'analyze':
+            command.add_argument('--shots', type=int, default=1024, help="shots assumed by the memory estimates")
+            command.add_argument('--critical-path', action='store_true', help="list the operations of a longest path")
+        if name == 'simulate':
+            command.add_argument('--shots', type=int, default=1024)
+            command.add_argument('--seed', type=int)
+            command.add_argument('--noise', action='store_true',
+                                 help="sample noisy trajectories from the hardware block")
+            command.add_argument('--method', choices=('statevector', 'branches', 'stabilizer'),
+                                 help="noiseless backend; by default picked from the circuit")
+            command.add_argument('-p', '--param', type=_parameter, action='append', default=[],
+                                 metavar='NAME=VALUE', help="bind a symbolic gate parameter")
+    return parser
+
+def _print_text(record, out):
+    for result in record['circuits']:
+        details = ', '.join(f"{key}={value}" for key, value in result.items() if key != 'circuit')
+        out.write(f"{record['path']}: {result['circuit']}: ok ({details})\n")
+    for warning in record['warnings']:
+        out.write(f"{record['path']}: warning: {warning}\n")
+    for error in record['errors']:
+        out.write(f"{record['path']}: error: {error}\n")
+
+def main(argv=None, out=None):
+    """Run the command line and return its exit code.
+
+    The exit code is ``EXIT_OK`` when every file succeeded, ``EXIT_FAILED``
+    when any file had errors and ``EXIT_USAGE`` for bad arguments or when
+    no ``.qadl`` file was found.
+    """
+    out = out or sys.stdout
+    parser = build_parser()
+    options = parser.parse_args(argv)
+    if options.command == 'simulate':
+        options.parameters = dict(options.param)
+    if getattr(options, 'output_dir', None):
+        os.makedirs(options.output_dir, exist_ok=True)
+    sources = find_sources(options.paths)
+    if not sources:
+        parser.error("no .qadl files found")
+
+    jobs = [(options.command, path, options) for path in sources]
+    workers = options.jobs if options.jobs > 0 else os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        records = [run_file(job) for job in jobs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            records = list(pool.map(run_file, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+    failed = any(record['errors'] for record in records)
+    if options.json:
+        json.dump({'command': options.command, 'files': records, 'ok': not failed}, out, indent=2)
+        out.write('\n')
+    else:
+        for record in records:
+            _print_text(record, out)
+    return EXIT_FAILED if failed else EXIT_OK
+
+if __name__ == '__main__':
+    sys.exit(main())
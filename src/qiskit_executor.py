@@ -1,63 +1,213 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
 from qiskit import QuantumCircuit
-from qiskit.visualization import circuit_drawer
-from qiskit.circuit.library import CRZGate
-import numpy as np
-
-def apply_inverse_qft(qc, qubits):
-    """Apply the inverse Quantum Fourier Transform."""
-    n = len(qubits)
-    for qubit in range(n // 2):
-        qc.swap(qubits[qubit], qubits[n - qubit - 1])
-    for j in range(n):
-        for m in range(j):
-            qc.cp(-np.pi / float(2 ** (j - m)), qubits[j], qubits[m])
-        qc.h(qubits[j])
-
-def execute_circuit(circuit_def):
-    num_qubits = len(circuit_def.qubits)
+from qiskit.circuit import CircuitInstruction, Parameter
+
+from circuit_cache import DEFAULT_CACHE_DIR, get_cache
+from circuit_optimizer import optimize_circuit
+from circuit_validator import ERROR, ValidationError, check_circuit, validate_circuit
+from gate_registry import ModuleSpec, resolve_gate
+from instrumentation import span
+from parameter_sweep import parameter_grid
+from qiskit_parser import GateParameter
+
+def _qiskit_parameter(param, parameters):
+    if not isinstance(param, GateParameter):
+        return param
+    expression = parameters[param.name]
+    if param.scale != 1:
+        expression = param.scale * expression
+    if param.offset:
+        expression = expression + param.offset
+    return expression
+
+def build_circuit(circuit_def):
+    """Translate a parsed circuit into a Qiskit ``QuantumCircuit``.
+
+    Every distinct opcode is resolved against the gate registry once, so the
+    per-gate work is a table lookup, an arity check and an append. Symbolic
+    gate parameters become Qiskit ``Parameter``s of the same name, so the
+    circuit is translated once and bound with ``assign_parameters``.
+    Measurements keep their position among the gates, and ``if``/``while``
+    blocks are lowered to ``if_test`` and ``while_loop`` on their classical
+    bit. A ``while`` with ``max <n>`` becomes a ``for_loop`` over ``n``
+    iterations around an ``if_test``, which stops running the body as soon as
+    the condition fails. Every module that is called is built once into a
+    Qiskit ``Gate`` whose definition is its body, and each ``call`` appends
+    that same gate.
+    """
+    undeclared = circuit_def.undeclared_qubits()
+    if undeclared:
+        raise ValueError(f"Undeclared qubit: {undeclared[0]}")
+    with span('translate', circuit=circuit_def.name, gates=circuit_def.num_gates,
+              qubits=circuit_def.num_qubits):
+        return _build(circuit_def, {name: Parameter(name) for name in circuit_def.parameter_names}, {})
+
+def _module_gate(module, parameters, gates):
+    gate = gates.get(id(module))
+    if gate is None:
+        gate = gates[id(module)] = _build(module, parameters, gates).to_gate()
+    return gate
+
+def _build(circuit_def, parameters, gates):
+    """Build ``circuit_def``; ``parameters`` and the module ``gates`` are shared with nested modules."""
+    num_qubits = circuit_def.num_qubits
     num_classical_bits = len(circuit_def.classical_bits)
-    qc = QuantumCircuit(num_qubits, num_classical_bits)
-
-    qubit_index = {qubit.name: idx for idx, qubit in enumerate(circuit_def.qubits)}
-    classical_bit_index = circuit_def.classical_bits
-
-    for gate in circuit_def.gates:
-        if gate.name == 'Hadamard' or gate.name == 'H':
-            qc.h(qubit_index[gate.qubits[0]])
-        elif gate.name == 'CNOT':
-            qc.cx(qubit_index[gate.qubits[0]], qubit_index[gate.qubits[1]])
-        elif gate.name == 'CZ':
-            qc.cz(qubit_index[gate.qubits[0]], qubit_index[gate.qubits[1]])
-        elif gate.name == 'X':
-            qc.x(qubit_index[gate.qubits[0]])
-        elif gate.name == 'CR':
-            qc.append(CRZGate(0.5), [qubit_index[gate.qubits[0]], qubit_index[gate.qubits[1]]])
-        elif gate.name == 'CR2':
-            qc.append(CRZGate(1.0), [qubit_index[gate.qubits[0]], qubit_index[gate.qubits[1]]])
-        elif gate.name == 'InverseQFT':
-            apply_inverse_qft(qc, [qubit_index[q] for q in gate.qubits])
-        elif gate.name == 'CCNOT' or gate.name == 'Toffoli':
-            qc.ccx(qubit_index[gate.qubits[0]], qubit_index[gate.qubits[1]], qubit_index[gate.qubits[2]])
-        elif gate.name == 'Phase':
-            qc.p(np.pi / 2, qubit_index[gate.qubits[0]])  # Example phase
-        elif gate.name == 'Z':
-            qc.z(qubit_index[gate.qubits[0]])
-        elif gate.name == 'Oracle':
-            pass
-        elif gate.name == 'Diffuser':
-            pass
+    qc = QuantumCircuit(num_qubits, num_classical_bits, name=circuit_def.name)
+
+    specs = [resolve_gate(name, circuit_def) for name in circuit_def.opcode_names]
+    instructions = [_module_gate(spec.module, parameters, gates) if isinstance(spec, ModuleSpec) else spec.instruction()
+                    for spec in specs]
+    arities = [spec.num_qubits for spec in specs]
+    gate_ops = circuit_def.gate_ops
+    param_offsets = circuit_def.gate_param_offsets
+    offsets = circuit_def.gate_offsets
+    operands = circuit_def.gate_operands
+    measure_qubits = circuit_def.measure_qubits
+    measure_clbits = circuit_def.measure_clbits
+    bits = qc.qubits
+    clbits = qc.clbits
+
+    def emit_gate(i, scoped):
+        opcode = gate_ops[i]
+        start, end = offsets[i], offsets[i + 1]
+        arity = arities[opcode]
+        if arity is not None and end - start != arity:
+            specs[opcode].check_arity(end - start)
+        params = ()
+        if param_offsets[i + 1] > param_offsets[i]:
+            specs[opcode].check_params(param_offsets[i + 1] - param_offsets[i])
+            params = [_qiskit_parameter(param, parameters) for param in circuit_def.gate_parameters(i)]
+            instruction = specs[opcode].instruction(params)
+        else:
+            specs[opcode].check_params(0)
+            instruction = instructions[opcode]
+        if instruction is None:
+            if specs[opcode].expand is not None:
+                specs[opcode].expand(qc, operands[start:end].tolist(), *params)
+        elif scoped:
+            # Inside a control-flow builder only append() sees the open scope.
+            qc.append(instruction, [bits[q] for q in operands[start:end]], copy=False)
         else:
-            raise ValueError(f"Unsupported gate: {gate.name}")
+            qc._append(CircuitInstruction(instruction, [bits[q] for q in operands[start:end]]))
 
-    for measurement in circuit_def.measurements:
-        qc.measure(qubit_index[measurement.qubit], classical_bit_index[measurement.classical_bit])
+    def emit(nodes, scoped):
+        for node in nodes:
+            kind = node[0]
+            if kind == 'gate':
+                emit_gate(node[1], scoped)
+            elif kind == 'measure':
+                qc.measure(measure_qubits[node[1]], measure_clbits[node[1]])
+            elif kind == 'if':
+                block = node[1]
+                with qc.if_test((clbits[block.clbit], block.value)) as orelse:
+                    emit(node[2], True)
+                if node[3]:
+                    with orelse:
+                        emit(node[3], True)
+            elif node[1].max_iterations is not None:
+                block = node[1]
+                with qc.for_loop(range(block.max_iterations)):
+                    with qc.if_test((clbits[block.clbit], block.value)):
+                        emit(node[2], True)
+            else:
+                block = node[1]
+                with qc.while_loop((clbits[block.clbit], block.value)):
+                    emit(node[2], True)
 
-    # Handle the conditional operations manually
-    if circuit_def.name == "QuantumTeleportation":
-        with qc.if_test((classical_bit_index['c0'], 1)):
-            qc.z(qubit_index['q2'])
-        with qc.if_test((classical_bit_index['c1'], 1)):
-            qc.x(qubit_index['q2'])
+    emit(circuit_def.program(), False)
+    return qc
 
-    qc.draw(output='mpl', filename='quantum_circuit.png')
+def draw_circuit(qc, filename):
+    with span('draw', circuit=qc.name, gates=len(qc.data), qubits=qc.num_qubits):
+        figure = qc.draw(output='mpl', filename=filename)
+        import matplotlib.pyplot as plt
+        plt.close(figure)
+
+def translate_circuit(circuit_def, cache=None):
+    """Return the Qiskit circuit for ``circuit_def``, reusing ``cache`` if given."""
+    if cache is None:
+        return build_circuit(circuit_def)
+    key = cache.key(circuit_def)
+    qc = cache.get_circuit(key)
+    if qc is None:
+        qc = build_circuit(circuit_def)
+        cache.put_circuit(key, qc)
+    return qc
+
+def render_circuit(circuit_def, cache=None):
+    """Return the path of the rendered diagram for ``circuit_def``.
+
+    Diagrams live in the cache directory under the circuit's content hash, so
+    an unchanged circuit is neither translated nor drawn again and separate
+    runs never write to the same file.
+    """
+    if cache is None:
+        cache = get_cache()
+    key = cache.key(circuit_def)
+    path = cache.get_image(key)
+    if path is None:
+        qc = translate_circuit(circuit_def, cache)
+        path = cache.put_image(key, lambda filename: draw_circuit(qc, filename))
+    return path
+
+def bound_circuits(circuit_def, values, cache=None):
+    """Yield the Qiskit circuit bound to every point of the ``values`` grid.
+
+    The circuit is translated once (or taken from ``cache``) and each point
+    only runs ``assign_parameters``; points follow
+    ``parameter_sweep.parameter_grid`` order.
+    """
+    names, _, points = parameter_grid(values)
+    qc = translate_circuit(circuit_def, cache)
+    parameters = {parameter.name: parameter for parameter in qc.parameters}
+    for name in names:
+        if name not in parameters:
+            raise ValueError(f"Unknown parameter: {name}")
+    order = [parameters[name] for name in names]
+    for point in points.tolist():
+        yield qc.assign_parameters(dict(zip(order, point)))
+
+def execute_circuit(circuit_def, filename='quantum_circuit.png', cache=None, optimize=False):
+    check_circuit(circuit_def, hardware=False)
+    if optimize:
+        circuit_def, _ = optimize_circuit(circuit_def)
+    if cache is None:
+        draw_circuit(build_circuit(circuit_def), filename)
+    else:
+        shutil.copyfile(render_circuit(circuit_def, cache), filename)
     return circuit_def.name
+
+def _execute_job(job):
+    circuit_def, filename, cache_dir, optimize = job
+    cache = get_cache(cache_dir) if cache_dir is not None else None
+    return execute_circuit(circuit_def, filename, cache, optimize), filename
+
+def execute_circuits(circuit_defs, max_workers=None, output_dir='.', cache_dir=DEFAULT_CACHE_DIR, optimize=False):
+    """Translate and render several circuits across a process pool.
+
+    Each circuit is drawn to its own ``<index>_<name>.png`` in ``output_dir``
+    so concurrent workers never share an output file. Returns a list of
+    ``(circuit_name, image_path)`` tuples in the same order as ``circuit_defs``.
+    ``max_workers`` defaults to the CPU count; ``1`` runs in-process. Unchanged
+    circuits are served from the diagram cache in ``cache_dir``; pass ``None``
+    to always re-render. With ``optimize`` each circuit first goes through
+    ``circuit_optimizer.optimize_circuit``. Every circuit is validated before
+    any is translated, and a ``ValidationError`` lists the errors of all of
+    them.
+    """
+    errors = [diagnostic for circuit_def in circuit_defs for diagnostic in validate_circuit(circuit_def, hardware=False)
+              if diagnostic.severity == ERROR]
+    if errors:
+        raise ValidationError(errors)
+    jobs = [(circuit_def, os.path.join(output_dir, f"{index:03d}_{circuit_def.name}.png"), cache_dir, optimize)
+            for index, circuit_def in enumerate(circuit_defs)]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(jobs))
+    if max_workers <= 1:
+        return [_execute_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_execute_job, jobs))
@@ -1,42 +1,390 @@
+from array import array
+import ast
+import io
+import math
 import re
 
+from error_correction import encode_qubits
+from instrumentation import span
+from phase_oracle import parse_oracle
+
 class Qubit:
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
 class QuantumGate:
-    def __init__(self, name, qubits):
+    __slots__ = ('name', 'qubits', 'params')
+
+    def __init__(self, name, qubits, params=()):
         self.name = name
         self.qubits = qubits
+        self.params = params
 
 class Measurement:
+    __slots__ = ('qubit', 'classical_bit')
+
     def __init__(self, qubit, classical_bit):
         self.qubit = qubit
         self.classical_bit = classical_bit
 
+class GateParameter:
+    """A symbolic gate angle ``scale * name + offset``."""
+
+    __slots__ = ('name', 'scale', 'offset')
+
+    def __init__(self, name, scale=1.0, offset=0.0):
+        self.name = name
+        self.scale = scale
+        self.offset = offset
+
+    def bind(self, value):
+        return self.scale * value + self.offset
+
+    def __eq__(self, other):
+        return (isinstance(other, GateParameter) and self.name == other.name
+                and self.scale == other.scale and self.offset == other.offset)
+
+    def __hash__(self):
+        return hash((self.name, self.scale, self.offset))
+
+    def __repr__(self):
+        text = self.name if self.scale == 1 else f"{self.scale!r}*{self.name}"
+        if self.offset:
+            text += f" {'-' if self.offset < 0 else '+'} {abs(self.offset)!r}"
+        return text
+
+class ControlBlock:
+    """An ``if`` or ``while`` block over a range of the packed operation arrays.
+
+    The body holds gates ``gate_start:gate_else`` and measurements
+    ``measure_start:measure_else``; an ``if`` block's ``else`` branch holds
+    ``gate_else:gate_end`` and ``measure_else:measure_end`` (empty when there
+    is no ``else``). The condition is ``classical bit clbit == value``, with
+    ``!=`` conditions stored negated. ``parent`` is the index of the
+    enclosing block in ``control_blocks`` (``-1`` at top level) and
+    ``in_else`` tells which branch of the parent it sits in. ``max_iterations``
+    is the optional ``max <n>`` bound of a ``while`` loop.
+    """
+
+    __slots__ = ('kind', 'clbit', 'value', 'max_iterations', 'parent', 'in_else',
+                 'gate_start', 'gate_else', 'gate_end',
+                 'measure_start', 'measure_else', 'measure_end', 'line')
+
+    def __init__(self, kind, clbit, value, max_iterations=None, parent=-1, in_else=False,
+                 gate_start=0, measure_start=0, line=0):
+        self.kind = kind
+        self.clbit = clbit
+        self.value = value
+        self.max_iterations = max_iterations
+        self.parent = parent
+        self.in_else = in_else
+        self.gate_start = self.gate_else = self.gate_end = gate_start
+        self.measure_start = self.measure_else = self.measure_end = measure_start
+        self.line = line
+
+    def astuple(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__ if slot != 'line')
+
+class _PackedView:
+    """Read-only sequence that builds compatibility objects on access."""
+
+    __slots__ = ('_size', '_build')
+
+    def __init__(self, size, build):
+        self._size = size
+        self._build = build
+
+    def __len__(self):
+        return self._size()
+
+    def __getitem__(self, index):
+        size = self._size()
+        if isinstance(index, slice):
+            return [self._build(i) for i in range(*index.indices(size))]
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("index out of range")
+        return self._build(index)
+
+    def __iter__(self):
+        build = self._build
+        for i in range(self._size()):
+            yield build(i)
+
 class QuantumCircuitDef:
+    """Parsed circuit stored as packed arrays.
+
+    Gate names are interned into small integer opcodes (``opcode_names`` maps
+    them back) and qubit names into indices at parse time. Gate ``i`` acts on
+    ``gate_operands[gate_offsets[i]:gate_offsets[i + 1]]`` with parameters
+    ``gate_params[gate_param_offsets[i]:gate_param_offsets[i + 1]]``. A
+    symbolic parameter ``k`` stores the index of its name in
+    ``parameter_names`` at ``gate_param_symbols[k]`` (``-1`` for a constant)
+    and its value as ``gate_param_scales[k] * symbol + gate_params[k]``.
+    Measurement ``j`` records ``measure_positions[j]``, the number of gates
+    that precede it in the source. ``if``/``while`` blocks are
+    ``ControlBlock`` ranges over these arrays, listed in ``control_blocks``
+    in source order; ``program()`` returns the nested structure. ``qubits``,
+    ``gates`` and ``measurements`` remain available as lazily built object
+    views.
+    """
+
+    __slots__ = (
+        'name', 'classical_bits', 'control_flow', 'control_blocks', 'error_correction',
+        'hardware_config', 'hardware_entries', 'modules', 'oracles', 'annotations',
+        'qubit_names', 'qubit_index', 'qubit_declared',
+        'opcode_names', 'opcodes', 'parameter_names', 'parameter_index',
+        'gate_ops', 'gate_offsets', 'gate_operands', 'gate_param_offsets',
+        'gate_params', 'gate_param_symbols', 'gate_param_scales', 'gate_lines',
+        'measure_qubits', 'measure_clbits', 'measure_positions', 'measure_lines',
+    )
+
     def __init__(self, name):
         self.name = name
-        self.qubits = []
-        self.gates = []
-        self.measurements = []
         self.classical_bits = {}
         self.control_flow = []
+        self.control_blocks = []
         self.error_correction = []
         self.hardware_config = {}
+        self.hardware_entries = []
         self.modules = {}
+        self.oracles = {}
         self.annotations = []
 
+        self.qubit_names = []
+        self.qubit_index = {}
+        self.qubit_declared = bytearray()
+
+        self.opcode_names = []
+        self.opcodes = {}
+        self.parameter_names = []
+        self.parameter_index = {}
+
+        self.gate_ops = array('H')
+        self.gate_offsets = array('I', [0])
+        self.gate_operands = array('i')
+        self.gate_param_offsets = array('I', [0])
+        self.gate_params = array('d')
+        self.gate_param_symbols = array('i')
+        self.gate_param_scales = array('d')
+        self.gate_lines = array('I')
+
+        self.measure_qubits = array('i')
+        self.measure_clbits = array('i')
+        self.measure_positions = array('I')
+        self.measure_lines = array('I')
+
+    def empty_copy(self):
+        """Return a circuit with the same symbols and metadata but no operations or blocks."""
+        copy = QuantumCircuitDef(self.name)
+        copy.classical_bits = dict(self.classical_bits)
+        copy.control_flow = list(self.control_flow)
+        copy.error_correction = list(self.error_correction)
+        copy.hardware_config = dict(self.hardware_config)
+        copy.hardware_entries = list(self.hardware_entries)
+        copy.modules = dict(self.modules)
+        copy.oracles = dict(self.oracles)
+        copy.annotations = list(self.annotations)
+        copy.qubit_names = list(self.qubit_names)
+        copy.qubit_index = dict(self.qubit_index)
+        copy.qubit_declared = bytearray(self.qubit_declared)
+        copy.parameter_names = list(self.parameter_names)
+        copy.parameter_index = dict(self.parameter_index)
+        return copy
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    @property
+    def num_qubits(self):
+        return len(self.qubit_names)
+
+    @property
+    def num_gates(self):
+        return len(self.gate_ops)
+
+    def intern_opcode(self, name):
+        opcode = self.opcodes.get(name)
+        if opcode is None:
+            opcode = self.opcodes[name] = len(self.opcode_names)
+            self.opcode_names.append(name)
+        return opcode
+
+    def resolve_qubit(self, name):
+        index = self.qubit_index.get(name)
+        if index is None:
+            index = self.qubit_index[name] = len(self.qubit_names)
+            self.qubit_names.append(name)
+            self.qubit_declared.append(0)
+        return index
+
+    def resolve_clbit(self, name):
+        index = self.classical_bits.get(name)
+        if index is None:
+            index = self.classical_bits[name] = len(self.classical_bits)
+        return index
+
+    def undeclared_qubits(self):
+        return [name for name, declared in zip(self.qubit_names, self.qubit_declared) if not declared]
+
+    def gate_qubits(self, i):
+        return self.gate_operands[self.gate_offsets[i]:self.gate_offsets[i + 1]]
+
+    def gate_parameters(self, i):
+        """Return the parameters of gate ``i`` as floats and ``GateParameter``s."""
+        params = []
+        for k in range(self.gate_param_offsets[i], self.gate_param_offsets[i + 1]):
+            symbol = self.gate_param_symbols[k]
+            if symbol < 0:
+                params.append(self.gate_params[k])
+            else:
+                params.append(GateParameter(self.parameter_names[symbol], self.gate_param_scales[k], self.gate_params[k]))
+        return params
+
+    def gate_values(self, i, bindings=None):
+        """Return the parameters of gate ``i`` as floats, binding symbols from ``bindings``."""
+        values = []
+        for k in range(self.gate_param_offsets[i], self.gate_param_offsets[i + 1]):
+            symbol = self.gate_param_symbols[k]
+            if symbol < 0:
+                values.append(self.gate_params[k])
+                continue
+            name = self.parameter_names[symbol]
+            if bindings is None or name not in bindings:
+                raise ValueError(f"Unbound parameter: {name}")
+            values.append(self.gate_param_scales[k] * bindings[name] + self.gate_params[k])
+        return values
+
+    def resolve_parameter(self, name):
+        index = self.parameter_index.get(name)
+        if index is None:
+            index = self.parameter_index[name] = len(self.parameter_names)
+            self.parameter_names.append(name)
+        return index
+
+    def declare_qubit(self, name):
+        self.qubit_declared[self.resolve_qubit(name)] = 1
+
+    def append_gate(self, name, qubits, params=(), line=0):
+        resolve = self.resolve_qubit
+        self.gate_ops.append(self.intern_opcode(name))
+        self.gate_operands.extend([resolve(qubit) for qubit in qubits])
+        self.gate_offsets.append(len(self.gate_operands))
+        for param in params:
+            if isinstance(param, GateParameter):
+                self.gate_params.append(param.offset)
+                self.gate_param_symbols.append(self.resolve_parameter(param.name))
+                self.gate_param_scales.append(param.scale)
+            else:
+                self.gate_params.append(param)
+                self.gate_param_symbols.append(-1)
+                self.gate_param_scales.append(0.0)
+        self.gate_param_offsets.append(len(self.gate_params))
+        self.gate_lines.append(line)
+
+    def append_measurement(self, qubit, classical_bit, line=0):
+        self.measure_qubits.append(self.resolve_qubit(qubit))
+        self.measure_clbits.append(self.resolve_clbit(classical_bit))
+        self.measure_positions.append(len(self.gate_ops))
+        self.measure_lines.append(line)
+
+    def open_block(self, kind, classical_bit, value, max_iterations=None, parent=-1, in_else=False, line=0):
+        """Start a control block at the current end of the operation arrays and return its index."""
+        self.control_blocks.append(ControlBlock(kind, self.resolve_clbit(classical_bit), value, max_iterations,
+                                                parent, in_else, len(self.gate_ops), len(self.measure_qubits), line))
+        return len(self.control_blocks) - 1
+
+    def start_else(self, index):
+        block = self.control_blocks[index]
+        block.gate_else = len(self.gate_ops)
+        block.measure_else = len(self.measure_qubits)
+
+    def close_block(self, index, has_else=False):
+        block = self.control_blocks[index]
+        block.gate_end = len(self.gate_ops)
+        block.measure_end = len(self.measure_qubits)
+        if not has_else:
+            block.gate_else = block.gate_end
+            block.measure_else = block.measure_end
+
     def add_qubit(self, qubit):
-        self.qubits.append(qubit)
+        self.declare_qubit(qubit.name)
 
     def add_gate(self, gate):
-        self.gates.append(gate)
+        self.append_gate(gate.name, gate.qubits, gate.params)
 
     def add_measurement(self, measurement):
-        if measurement.classical_bit not in self.classical_bits:
-            self.classical_bits[measurement.classical_bit] = len(self.classical_bits)
-        self.measurements.append(measurement)
+        self.append_measurement(measurement.qubit, measurement.classical_bit)
+
+    def _build_gate(self, i):
+        names = self.qubit_names
+        return QuantumGate(self.opcode_names[self.gate_ops[i]],
+                           [names[q] for q in self.gate_qubits(i)],
+                           self.gate_parameters(i))
+
+    @property
+    def qubits(self):
+        return [Qubit(name) for name, declared in zip(self.qubit_names, self.qubit_declared) if declared]
+
+    @property
+    def gates(self):
+        return _PackedView(self.gate_ops.__len__, self._build_gate)
+
+    @property
+    def measurements(self):
+        qubit_names = self.qubit_names
+        clbit_names = list(self.classical_bits)
+        return _PackedView(self.measure_qubits.__len__,
+                           lambda i: Measurement(qubit_names[self.measure_qubits[i]], clbit_names[self.measure_clbits[i]]))
+
+    def program(self):
+        """Return the operations as a nested list in execution order.
+
+        Items are ``('gate', i)``, ``('measure', j)``, ``('if', block, body,
+        orelse)`` and ``('while', block, body)``, where ``block`` is the
+        ``ControlBlock`` and ``body`` and ``orelse`` are nested lists of the
+        same form. Built in one merge over the gate, measurement and block
+        arrays.
+        """
+        blocks = self.control_blocks
+        positions = self.measure_positions
+        children = {}
+        for index, block in enumerate(blocks):
+            children.setdefault((block.parent, block.in_else), []).append(index)
+
+        def build(parent, in_else, gate, gate_end, measure, measure_end):
+            nodes = []
+            pending = children.get((parent, in_else), ())
+            k = 0
+            while True:
+                block = blocks[pending[k]] if k < len(pending) else None
+                if block is not None and block.gate_start == gate and block.measure_start == measure:
+                    index = pending[k]
+                    k += 1
+                    body = build(index, False, gate, block.gate_else, measure, block.measure_else)
+                    if block.kind == 'if':
+                        orelse = build(index, True, block.gate_else, block.gate_end, block.measure_else, block.measure_end)
+                        nodes.append(('if', block, body, orelse))
+                    else:
+                        nodes.append(('while', block, body))
+                    gate, measure = block.gate_end, block.measure_end
+                elif measure < measure_end and positions[measure] <= gate:
+                    nodes.append(('measure', measure))
+                    measure += 1
+                elif gate < gate_end:
+                    nodes.append(('gate', gate))
+                    gate += 1
+                else:
+                    return nodes
+
+        return build(-1, False, 0, len(self.gate_ops), 0, len(self.measure_qubits))
 
     def add_control_flow(self, control):
         self.control_flow.append(control)
@@ -47,120 +395,378 @@ class QuantumCircuitDef:
     def add_hardware_config(self, config):
         self.hardware_config.update(config)
 
+    def add_hardware_entry(self, key, args, line=0):
+        """Record one hardware statement; unlike ``hardware_config`` repeated keys are kept."""
+        self.hardware_entries.append((key, args, line))
+
     def add_module(self, name, module):
         self.modules[name] = module
 
+    def add_oracle(self, oracle):
+        self.oracles[oracle.name] = oracle
+
     def add_annotation(self, annotation):
         self.annotations.append(annotation)
 
-def parse_qadl(script):
-    lines = script.split('\n')
-    circuit = None
-    line_number = 0
-    control_flow_pattern = re.compile(r'if\s*\(.*\)\s*{|\s*while\s*\(.*\)\s*{')
-    in_hardware_block = False
-    hardware_config = {}
-
-    def parse_block(lines, start_index):
-        block_lines = []
-        depth = 0
-        for i in range(start_index, len(lines)):
-            line = lines[i].strip()
-            if line.startswith('{'):
-                depth += 1
-                if depth == 1:
-                    continue
-            elif line.startswith('}'):
-                depth -= 1
-                if depth == 0:
-                    return block_lines, i
-            block_lines.append(line)
-        return block_lines, len(lines) - 1
-
-    for i, line in enumerate(lines):
-        line_number += 1
-        line = line.strip()
-
-        if not line or line.startswith('//') or line.startswith('/*') or line.startswith('@'):
+CONTROL_FLOW_PATTERN = re.compile(r'(?:if|while)\s*\(.*{$')
+CONDITION_PATTERN = re.compile(r'(if|while)\s*\(\s*(\w+)\s*(==|!=)\s*([01])\s*\)\s*(?:max\s+(\d+)\s*)?{$')
+ELSE_PATTERN = re.compile(r'}\s*else\s*{$')
+
+
+class Token:
+    """A single logical QADL statement produced by the lexer."""
+
+    __slots__ = ('kind', 'parts', 'text', 'line')
+
+    def __init__(self, kind, parts, text, line):
+        self.kind = kind
+        self.parts = parts
+        self.text = text
+        self.line = line
+
+
+def _iter_lines(source):
+    if isinstance(source, str):
+        return io.StringIO(source)
+    return source
+
+
+def tokenize(source, first_line=1):
+    """Yield a Token per statement in a QADL script.
+
+    ``source`` may be a string, an open file or any iterable of lines; lines
+    are consumed one at a time so the script is never held as a line list.
+    ``first_line`` is the line number reported for the first line, for
+    callers that lex a slice of a larger buffer.
+    Comments, blank lines and the ``@startqadl``/``@endqadl`` markers are
+    dropped here so the parser only sees meaningful statements.
+    """
+    in_comment = False
+    for line_number, raw in enumerate(_iter_lines(source), first_line):
+        line = raw.strip()
+        if in_comment:
+            end = line.find('*/')
+            if end < 0:
+                continue
+            in_comment = False
+            line = line[end + 2:].strip()
+        if line.startswith('/*'):
+            end = line.find('*/', 2)
+            if end < 0:
+                in_comment = True
+                continue
+            line = line[end + 2:].strip()
+        comment = line.find('//')
+        if comment >= 0:
+            line = line[:comment].rstrip()
+        if not line:
             continue
 
-        if line.startswith('Circuit'):
+        if line[0] == '}':
+            yield Token('close', None, line, line_number)
+        elif line[0] == '@':
+            if line not in ('@startqadl', '@endqadl'):
+                yield Token('annotation', None, line, line_number)
+        else:
             parts = line.split()
-            if len(parts) != 3 or parts[2] != '{':
-                raise SyntaxError(f"Syntax error on line {line_number}: Invalid circuit declaration. Expected 'Circuit <name> {{'")
-            circuit = QuantumCircuitDef(parts[1])
+            yield Token(parts[0], parts, line, line_number)
 
-        elif line.startswith('qubit') and circuit:
-            parts = line.split()
-            if len(parts) != 2:
-                raise SyntaxError(f"Syntax error on line {line_number}: Invalid qubit declaration. Expected 'qubit <name>'")
-            circuit.add_qubit(Qubit(parts[1]))
 
-        elif line.startswith('gate') and circuit:
-            parts = line.split()
-            if len(parts) < 3:
-                raise SyntaxError(f"Syntax error on line {line_number}: Invalid gate declaration. Expected 'gate <name> <qubits...>'")
-            gate_name = parts[1]
-            qubits = parts[2:]
-            circuit.add_gate(QuantumGate(gate_name, qubits))
+class _Frame:
+    __slots__ = ('kind', 'circuit', 'data', 'line')
 
-        elif line.startswith('measure') and circuit:
-            parts = line.split()
-            if len(parts) != 4 or parts[2] != '->':
-                raise SyntaxError(f"Syntax error on line {line_number}: Invalid measurement declaration. Expected 'measure <qubit> -> <classical_bit>'")
-            qubit = parts[1]
-            classical_bit = parts[3]
-            circuit.add_measurement(Measurement(qubit, classical_bit))
+    def __init__(self, kind, circuit, data=None, line=0):
+        self.kind = kind
+        self.circuit = circuit
+        self.data = data
+        self.line = line
 
-        elif control_flow_pattern.match(line) and circuit:
-            circuit.add_control_flow(line)
 
-        elif line.startswith('error_correction') and circuit:
-            parts = line.split()
-            if len(parts) < 2:
-                raise SyntaxError(f"Syntax error on line {line_number}: Invalid error correction declaration. Expected 'error_correction <technique> <parameters>'")
-            circuit.add_error_correction(line)
-
-        elif line.startswith('hardware') and circuit:
-            in_hardware_block = True
-            hardware_config = {}
-            block_lines, end_index = parse_block(lines, i + 1)
-            for hw_line in block_lines:
-                hw_parts = hw_line.split()
-                if len(hw_parts) < 2:
-                    raise SyntaxError(f"Syntax error on line {line_number}: Invalid hardware configuration.")
-                if hw_parts[0] == "qubit_connectivity":
-                    connectivity = []
-                    for conn_line in block_lines:
-                        if conn_line.strip() == '}':
-                            break
-                        connectivity.append(conn_line)
-                    hardware_config["qubit_connectivity"] = connectivity
-                else:
-                    hardware_config[hw_parts[0]] = hw_parts[1:]
-            circuit.add_hardware_config(hardware_config)
-            in_hardware_block = False
-            line_number = end_index
+def _parse_hardware_statement(token, frame):
+    if frame.kind == 'qubit_connectivity':
+        frame.data.append(token.text)
+        frame.circuit.add_hardware_entry('qubit_connectivity', [token.text], token.line)
+        return None
+    parts = token.parts
+    if parts[-1] == '{':
+        if parts[0] != 'qubit_connectivity' or len(parts) != 2:
+            raise SyntaxError(f"Syntax error on line {token.line}: Invalid hardware configuration.")
+        return _Frame('qubit_connectivity', frame.circuit, [], token.line)
+    if len(parts) < 2:
+        raise SyntaxError(f"Syntax error on line {token.line}: Invalid hardware configuration.")
+    frame.data[parts[0]] = parts[1:]
+    frame.circuit.add_hardware_entry(parts[0], parts[1:], token.line)
+    return None
 
-        elif line.startswith('module') and circuit:
-            parts = line.split()
+
+PARAMETERIZED_GATE_PATTERN = re.compile(r'gate\s+(\w+)\s*\(([^()]*)\)\s+(\S.*)$')
+_CONSTANTS = {'pi': math.pi, 'tau': math.tau}
+
+
+def _affine(node):
+    # Returns (offset, scale, symbol) for an expression linear in at most one symbol.
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return float(node.value), 0.0, None
+    if isinstance(node, ast.Name):
+        if node.id in _CONSTANTS:
+            return _CONSTANTS[node.id], 0.0, None
+        return 0.0, 1.0, node.id
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        offset, scale, symbol = _affine(node.operand)
+        return (-offset, -scale, symbol) if isinstance(node.op, ast.USub) else (offset, scale, symbol)
+    if isinstance(node, ast.BinOp):
+        left, right = _affine(node.left), _affine(node.right)
+        if isinstance(node.op, (ast.Add, ast.Sub)):
+            if left[2] and right[2] and left[2] != right[2]:
+                raise ValueError("more than one symbol")
+            sign = 1.0 if isinstance(node.op, ast.Add) else -1.0
+            return left[0] + sign * right[0], left[1] + sign * right[1], left[2] or right[2]
+        if isinstance(node.op, ast.Mult):
+            if left[2] and right[2]:
+                raise ValueError("product of symbols")
+            constant, other = (left, right) if left[2] is None else (right, left)
+            return constant[0] * other[0], constant[0] * other[1], other[2]
+        if isinstance(node.op, ast.Div) and right[2] is None:
+            return left[0] / right[0], left[1] / right[0], left[2]
+    raise ValueError("unsupported expression")
+
+
+def parse_parameter(text, line_number=0):
+    """Parse a gate parameter such as ``0.3``, ``pi/4`` or ``2*theta + pi``.
+
+    Numbers and ``pi``/``tau`` fold into a float; an expression linear in
+    one other name becomes a ``GateParameter``.
+    """
+    try:
+        offset, scale, symbol = _affine(ast.parse(text.strip(), mode='eval').body)
+    except (SyntaxError, ValueError, ZeroDivisionError):
+        raise SyntaxError(f"Syntax error on line {line_number}: Invalid gate parameter '{text.strip()}'") from None
+    if symbol is None or scale == 0:
+        return offset
+    return GateParameter(symbol, scale, offset)
+
+
+def _check_encoded(qubits, encoded, what, line_number):
+    for qubit in qubits:
+        if qubit in encoded:
+            raise SyntaxError(f"Syntax error on line {line_number}: {what} acts on {qubit}, which is encoded by the error_correction on line {encoded[qubit].line}")
+
+
+def _parse_statement(token, circuit, encoded=None):
+    kind = token.kind
+    parts = token.parts
+    line_number = token.line
+
+    if kind == 'gate':
+        if '(' in token.text:
+            match = PARAMETERIZED_GATE_PATTERN.match(token.text)
+            if match is None:
+                raise SyntaxError(f"Syntax error on line {line_number}: Invalid gate declaration. Expected 'gate <name>(<parameters>) <qubits...>'")
+            name, params, qubits = match.groups()
+            if encoded:
+                _check_encoded(qubits.split(), encoded, f"Gate {name}", line_number)
+            circuit.append_gate(name, qubits.split(), [parse_parameter(param, line_number) for param in params.split(',')],
+                                line_number)
+            return
+        if len(parts) < 3:
+            raise SyntaxError(f"Syntax error on line {line_number}: Invalid gate declaration. Expected 'gate <name> <qubits...>'")
+        if encoded:
+            _check_encoded(parts[2:], encoded, f"Gate {parts[1]}", line_number)
+        circuit.append_gate(parts[1], parts[2:], line=line_number)
+
+    elif kind == 'qubit':
+        if len(parts) != 2:
+            raise SyntaxError(f"Syntax error on line {line_number}: Invalid qubit declaration. Expected 'qubit <name>'")
+        circuit.declare_qubit(parts[1])
+
+    elif kind == 'measure':
+        if len(parts) != 4 or parts[2] != '->':
+            raise SyntaxError(f"Syntax error on line {line_number}: Invalid measurement declaration. Expected 'measure <qubit> -> <classical_bit>'")
+        if encoded and parts[1] in encoded:
+            encoded[parts[1]].measure(circuit, parts[3], line_number)
+        else:
+            circuit.append_measurement(parts[1], parts[3], line_number)
+
+    else:
+        raise SyntaxError(f"Syntax error on line {line_number}: Unrecognized statement.")
+
+
+def _open_control_block(token, frame):
+    match = CONDITION_PATTERN.match(token.text)
+    if match is None:
+        raise SyntaxError(f"Syntax error on line {token.line}: Invalid control flow condition. Expected '{token.kind} (<classical_bit> == <0|1>) {{'")
+    kind, classical_bit, operator, value, max_iterations = match.groups()
+    if max_iterations is not None and kind != 'while':
+        raise SyntaxError(f"Syntax error on line {token.line}: Only 'while' loops take an iteration bound.")
+    value = int(value) if operator == '==' else 1 - int(value)
+    parent, in_else = frame.data if frame.kind == 'control' else (-1, False)
+    circuit = frame.circuit
+    circuit.add_control_flow(token.text)
+    index = circuit.open_block(kind, classical_bit, value,
+                               int(max_iterations) if max_iterations is not None else None,
+                               parent, in_else, token.line)
+    return _Frame('control', circuit, [index, False], token.line)
+
+
+def _parse_call(token, stack):
+    """Append a ``call <module> <qubits...>`` as a gate whose opcode names the module.
+
+    The module must be defined earlier in this or an enclosing scope; one
+    found in an enclosing scope is also registered on the calling circuit,
+    so every circuit resolves its calls through its own ``modules``. The
+    module's symbolic parameters become parameters of the caller.
+    """
+    parts = token.parts
+    line_number = token.line
+    if len(parts) < 3:
+        raise SyntaxError(f"Syntax error on line {line_number}: Invalid module call. Expected 'call <module> <qubits...>'")
+    name = parts[1]
+    circuit = stack[-1].circuit
+    module = None
+    for frame in reversed(stack):
+        module = frame.circuit.modules.get(name)
+        if module is not None:
+            break
+    if module is None:
+        raise SyntaxError(f"Syntax error on line {line_number}: Unknown module '{name}'")
+    if len(module.measure_qubits) or module.control_blocks:
+        raise SyntaxError(f"Syntax error on line {line_number}: Module {name} measures or branches and cannot be called")
+    if len(parts) - 2 != module.num_qubits:
+        raise SyntaxError(f"Syntax error on line {line_number}: Module {name} expects {module.num_qubits} qubit(s), got {len(parts) - 2}")
+    if len(set(parts[2:])) != len(parts) - 2:
+        raise SyntaxError(f"Syntax error on line {line_number}: Module call passes the same qubit twice")
+    if stack[0].circuit is circuit:
+        _check_encoded(parts[2:], stack[0].data, f"Call of {name}", line_number)
+    if circuit.modules.get(name) is not module:
+        circuit.add_module(name, module)
+    for parameter in module.parameter_names:
+        circuit.resolve_parameter(parameter)
+    circuit.append_gate(name, parts[2:], line=line_number)
+
+
+def _parse_error_correction(token, frame):
+    """Lower an ``error_correction`` directive into its encode and syndrome-extraction gates."""
+    if frame.kind != 'circuit':
+        raise SyntaxError(f"Syntax error on line {token.line}: error_correction must be at the top level of a Circuit")
+    for block in encode_qubits(frame.circuit, token.text, token.line, frame.data):
+        frame.data[block.qubit] = block
+    frame.circuit.add_error_correction(token.text)
+
+
+def iter_qadl_circuits(source, first_line=1):
+    """Yield every top-level ``Circuit`` of a QADL script as it is closed.
+
+    Nested ``module``, ``hardware`` and ``if``/``while`` blocks are tracked
+    with one stack of open frames instead of re-scanning block bodies, so
+    parse time and memory grow linearly with the script.
+    """
+    stack = []
+    found = False
+
+    for token in tokenize(source, first_line):
+        kind = token.kind
+        line_number = token.line
+        frame = stack[-1] if stack else None
+
+        if kind == 'close':
+            if frame is None:
+                raise SyntaxError(f"Syntax error on line {line_number}: Unrecognized statement.")
+            if ELSE_PATTERN.match(token.text):
+                index, has_else = frame.data if frame.kind == 'control' else (None, True)
+                if has_else or frame.circuit.control_blocks[index].kind != 'if':
+                    raise SyntaxError(f"Syntax error on line {line_number}: 'else' without a matching 'if'.")
+                frame.circuit.start_else(index)
+                frame.data[1] = True
+                continue
+            stack.pop()
+            if frame.kind == 'circuit':
+                found = True
+                yield frame.circuit
+            elif frame.kind == 'module':
+                stack[-1].circuit.add_module(frame.data, frame.circuit)
+            elif frame.kind == 'hardware':
+                frame.circuit.add_hardware_config(frame.data)
+            elif frame.kind == 'qubit_connectivity':
+                stack[-1].data['qubit_connectivity'] = frame.data
+            elif frame.kind == 'control':
+                frame.circuit.close_block(*frame.data)
+            continue
+
+        if frame is not None and frame.kind in ('hardware', 'qubit_connectivity'):
+            child = _parse_hardware_statement(token, frame)
+            if child is not None:
+                stack.append(child)
+            continue
+
+        if kind == 'annotation':
+            if frame is not None:
+                frame.circuit.add_annotation(token.text)
+            continue
+
+        if kind == 'Circuit':
+            parts = token.parts
+            if frame is not None or len(parts) != 3 or parts[2] != '{':
+                raise SyntaxError(f"Syntax error on line {line_number}: Invalid circuit declaration. Expected 'Circuit <name> {{'")
+            # A circuit frame's data maps its encoded qubits to their error correction blocks.
+            stack.append(_Frame('circuit', QuantumCircuitDef(parts[1]), {}, line_number))
+
+        elif frame is None:
+            raise SyntaxError(f"Syntax error on line {line_number}: Unrecognized statement.")
+
+        elif kind == 'module':
+            parts = token.parts
             if len(parts) != 3 or parts[2] != '{':
                 raise SyntaxError(f"Syntax error on line {line_number}: Invalid module declaration. Expected 'module <name> {{'")
-            module_name = parts[1]
-            block_lines, end_index = parse_block(lines, i + 1)
-            module_script = '\n'.join(block_lines)
-            circuit.add_module(module_name, parse_qadl(module_script))
-            line_number = end_index
+            stack.append(_Frame('module', QuantumCircuitDef(parts[1]), parts[1], line_number))
+
+        elif kind == 'hardware':
+            if token.parts != ['hardware', '{']:
+                raise SyntaxError(f"Syntax error on line {line_number}: Invalid hardware declaration. Expected 'hardware {{'")
+            stack.append(_Frame('hardware', frame.circuit, {}, line_number))
+
+        elif token.text[-1] == '{':
+            if not CONTROL_FLOW_PATTERN.match(token.text):
+                raise SyntaxError(f"Syntax error on line {line_number}: Unrecognized statement.")
+            stack.append(_open_control_block(token, frame))
 
-        elif line.startswith('}') and circuit:
-            break  # End of circuit
+        elif kind == 'call':
+            _parse_call(token, stack)
 
-        elif line.startswith('@') and circuit:
-            circuit.add_annotation(line)
+        elif kind == 'error_correction':
+            _parse_error_correction(token, frame)
+
+        elif kind == 'oracle':
+            oracle = parse_oracle(token.text, line_number)
+            if oracle.name in frame.circuit.oracles or oracle.name in frame.circuit.modules:
+                raise SyntaxError(f"Syntax error on line {line_number}: {oracle.name} is already defined")
+            frame.circuit.add_oracle(oracle)
 
         else:
-            raise SyntaxError(f"Syntax error on line {line_number}: Unrecognized statement.")
+            _parse_statement(token, frame.circuit, stack[0].data if frame.circuit is stack[0].circuit else None)
 
-    if not circuit:
+    if stack:
+        frame = stack[-1]
+        raise SyntaxError(f"Syntax error on line {frame.line}: Unterminated '{frame.kind}' block.")
+    if not found:
         raise SyntaxError("No valid circuit found in the script.")
-    return circuit
+
+
+def parse_qadl(source):
+    """Parse the first ``Circuit`` of a QADL script.
+
+    Reading stops at the closing brace of that circuit, so the rest of the
+    source is never consumed.
+    """
+    with span('parse') as stage:
+        for circuit in iter_qadl_circuits(source):
+            stage.set(circuits=1, gates=circuit.num_gates, qubits=circuit.num_qubits)
+            return circuit
+
+
+def parse_qadl_all(source):
+    """Parse every ``Circuit`` of a QADL script, in source order."""
+    with span('parse') as stage:
+        circuits = list(iter_qadl_circuits(source))
+        stage.set(circuits=len(circuits), gates=sum(circuit.num_gates for circuit in circuits),
+                  qubits=max((circuit.num_qubits for circuit in circuits), default=0))
+    return circuits
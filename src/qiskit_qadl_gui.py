@@ -1,163 +1,57 @@
 import tkinter as tk
-from tkinter import scrolledtext, filedialog, messagebox
+from tkinter import scrolledtext, filedialog, messagebox, ttk
 from PIL import Image, ImageTk, ImageGrab
-from qiskit import QuantumCircuit
-from qiskit.visualization import circuit_drawer
-from qiskit.circuit.library import CRZGate
-import numpy as np
 import os
+import queue
+import shutil
+import threading
 
-class Qubit:
-    def __init__(self, name):
-        self.name = name
-
-class QuantumGate:
-    def __init__(self, name, qubits):
-        self.name = name
-        self.qubits = qubits
-
-class Measurement:
-    def __init__(self, qubit, classical_bit):
-        self.qubit = qubit
-        self.classical_bit = classical_bit
-
-class QuantumCircuitDef:
-    def __init__(self, name):
-        self.name = name
-        self.qubits = []
-        self.gates = []
-        self.measurements = []
-        self.classical_bits = {}
-
-    def add_qubit(self, qubit):
-        self.qubits.append(qubit)
-
-    def add_gate(self, gate):
-        self.gates.append(gate)
-
-    def add_measurement(self, measurement):
-        if measurement.classical_bit not in self.classical_bits:
-            self.classical_bits[measurement.classical_bit] = len(self.classical_bits)
-        self.measurements.append(measurement)
-
-def parse_qadl(script):
-    lines = script.split('\n')
-    circuit = None
-    line_number = 0
-
-    for line in lines:
-        line_number += 1
-        line = line.strip()
-
-        if not line or line.startswith('//') or line.startswith('/*') or line.startswith('@'):
-            continue
-
-        if line.startswith('Circuit'):
-            parts = line.split()
-            if len(parts) != 3 or parts[2] != '{':
-                raise SyntaxError(f"Syntax error on line {line_number}: Invalid circuit declaration. Expected 'Circuit <name> {{'.")
-            circuit = QuantumCircuitDef(parts[1])
-
-        elif line.startswith('qubit') and circuit:
-            parts = line.split()
-            if len(parts) != 2:
-                raise SyntaxError(f"Syntax error on line {line_number}: Invalid qubit declaration. Expected 'qubit <name>'.")
-            circuit.add_qubit(Qubit(parts[1]))
-
-        elif line.startswith('gate') and circuit:
-            parts = line.split()
-            if len(parts) < 3:
-                raise SyntaxError(f"Syntax error on line {line_number}: Invalid gate declaration. Expected 'gate <name> <qubits...>'.")
-            gate_name = parts[1]
-            qubits = parts[2:]
-            circuit.add_gate(QuantumGate(gate_name, qubits))
-
-        elif line.startswith('measure') and circuit:
-            parts = line.split()
-            if len(parts) != 4 or parts[2] != '->':
-                raise SyntaxError(f"Syntax error on line {line_number}: Invalid measurement declaration. Expected 'measure <qubit> -> <classical_bit>'.")
-            qubit = parts[1]
-            classical_bit = parts[3]
-            circuit.add_measurement(Measurement(qubit, classical_bit))
-
-        elif line.startswith('}'):
-            break  # End of circuit
+import matplotlib
+matplotlib.use("Agg")  # Diagrams are rendered off the Tk thread
 
-        else:
-            raise SyntaxError(f"Syntax error on line {line_number}: Unrecognized statement.")
-
-    if not circuit:
-        raise SyntaxError("No valid circuit found in the script.")
-    return circuit
-
-def apply_inverse_qft(qc, qubits):
-    """Apply the inverse Quantum Fourier Transform."""
-    n = len(qubits)
-    for qubit in range(n // 2):
-        qc.swap(qubits[qubit], qubits[n - qubit - 1])
-    for j in range(n):
-        for m in range(j):
-            qc.cp(-np.pi / float(2 ** (j - m)), qubits[j], qubits[m])
-        qc.h(qubits[j])
-
-def execute_circuit(circuit_def):
-    num_qubits = len(circuit_def.qubits)
-    num_classical_bits = len(circuit_def.classical_bits)
-    qc = QuantumCircuit(num_qubits, num_classical_bits)
-
-    qubit_index = {qubit.name: idx for idx, qubit in enumerate(circuit_def.qubits)}
-    classical_bit_index = circuit_def.classical_bits
-
-    for gate in circuit_def.gates:
-        if gate.name == 'Hadamard':
-            qc.h(qubit_index[gate.qubits[0]])
-        elif gate.name == 'CNOT':
-            qc.cx(qubit_index[gate.qubits[0]], qubit_index[gate.qubits[1]])
-        elif gate.name == 'CZ':
-            qc.cz(qubit_index[gate.qubits[0]], qubit_index[gate.qubits[1]])
-        elif gate.name == 'X':
-            qc.x(qubit_index[gate.qubits[0]])
-        elif gate.name == 'CR':
-            qc.append(CRZGate(0.5), [qubit_index[gate.qubits[0]], qubit_index[gate.qubits[1]]])
-        elif gate.name == 'CR2':
-            qc.append(CRZGate(1.0), [qubit_index[gate.qubits[0]], qubit_index[gate.qubits[1]]])
-        elif gate.name == 'InverseQFT':
-            apply_inverse_qft(qc, [qubit_index[q] for q in gate.qubits])
-        elif gate.name == 'CCNOT':
-            qc.ccx(qubit_index[gate.qubits[0]], qubit_index[gate.qubits[1]], qubit_index[gate.qubits[2]])
-        elif gate.name == 'Oracle':
-            pass
-        elif gate.name == 'Diffuser':
-            pass
-        else:
-            raise ValueError(f"Unsupported gate: {gate.name}")
-
-    for measurement in circuit_def.measurements:
-        qc.measure(qubit_index[measurement.qubit], classical_bit_index[measurement.classical_bit])
+from circuit_analysis import analyze_circuit
+from circuit_cache import get_cache
+from circuit_layout import CircuitLayout
+from circuit_validator import check_circuit
+from circuit_viewer import CircuitViewer
+from incremental_parser import IncrementalParser
+from instrumentation import MemorySink, add_sink, remove_sink
+from qiskit_executor import render_circuit
 
-    # Handle the conditional operations manually
-    if circuit_def.name == "QuantumTeleportation":
-        with qc.if_test((classical_bit_index['c0'], 1)):
-            qc.z(qubit_index['q2'])
-        with qc.if_test((classical_bit_index['c1'], 1)):
-            qc.x(qubit_index['q2'])
+POLL_INTERVAL_MS = 50
+LIVE_PREVIEW_DELAY_MS = 750
 
-    qc.draw(output='mpl', filename='quantum_circuit.png')
-    return circuit_def.name
+class _CancelledJob(Exception):
+    pass
 
 class QADLApp:
     def __init__(self, root):
         self.root = root
         self.root.title("QADL GUI with Qiskit")
         self.filename = None
+        self.live_preview = tk.BooleanVar(value=False)
+        self._job_id = 0
+        self._job_cancel = None
+        self._job_results = queue.Queue()
+        self._polling = False
+        self._preview_after_id = None
+        self.show_timings = tk.BooleanVar(value=False)
+        self.timing_sink = None
+        self._slowest_stage = None
+        self.current_circuit = None
+        self.current_analysis = None
+        self.incremental_parser = IncrementalParser()
         self.create_widgets()
 
     def create_widgets(self):
         self.create_menu()
         self.create_toolbar()
+        self.create_status_bar()
+        # The editor keeps its width when the window is resized; the diagram takes the rest.
+        self.panes = tk.PanedWindow(self.root, orient=tk.HORIZONTAL, sashrelief=tk.RAISED, sashwidth=6)
+        self.panes.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         self.create_text_editor()
         self.create_output_display()
-        self.create_status_bar()
 
     def create_menu(self):
         menu_bar = tk.Menu(self.root)
@@ -168,6 +62,7 @@ class QADLApp:
         file_menu.add_command(label="Open", command=self.open_file)
         file_menu.add_command(label="Save", command=self.save_file)
         file_menu.add_command(label="Save As...", command=self.save_file_as)
+        file_menu.add_command(label="Export Diagram...", command=self.export_diagram)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
         menu_bar.add_cascade(label="File", menu=file_menu)
@@ -179,6 +74,24 @@ class QADLApp:
         edit_menu.add_command(label="Copy", command=lambda: self.script_input.event_generate("<<Copy>>"))
         edit_menu.add_command(label="Paste", command=lambda: self.script_input.event_generate("<<Paste>>"))
         menu_bar.add_cascade(label="Edit", menu=edit_menu)
+
+        # Run Menu
+        run_menu = tk.Menu(menu_bar, tearoff=0)
+        run_menu.add_command(label="Run", command=self.run_qadl)
+        run_menu.add_command(label="Cancel", command=self.cancel_run)
+        run_menu.add_checkbutton(label="Live Preview", variable=self.live_preview, command=self.schedule_preview)
+        run_menu.add_checkbutton(label="Show Timings", variable=self.show_timings, command=self.toggle_timings)
+        menu_bar.add_cascade(label="Run", menu=run_menu)
+
+        # View Menu
+        view_menu = tk.Menu(menu_bar, tearoff=0)
+        view_menu.add_command(label="Zoom In", command=lambda: self.viewer.zoom_by(1.25))
+        view_menu.add_command(label="Zoom Out", command=lambda: self.viewer.zoom_by(0.8))
+        view_menu.add_command(label="Fit Diagram", command=lambda: self.viewer.fit())
+        view_menu.add_command(label="Actual Size", command=lambda: self.viewer.set_zoom(1.0))
+        view_menu.add_separator()
+        view_menu.add_command(label="Circuit Statistics...", command=self.show_statistics)
+        menu_bar.add_cascade(label="View", menu=view_menu)
         
         # Help Menu
         help_menu = tk.Menu(menu_bar, tearoff=0)
@@ -218,16 +131,70 @@ class QADLApp:
             return tk.PhotoImage(width=32, height=32)
 
     def create_text_editor(self):
-        self.text_editor_frame = tk.Frame(self.root)
-        self.text_editor_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.text_editor_frame = tk.Frame(self.panes)
+        self.panes.add(self.text_editor_frame, stretch="never", minsize=200)
         self.script_input = scrolledtext.ScrolledText(self.text_editor_frame, height=30, width=40)
         self.script_input.pack(expand=True, fill=tk.BOTH)
+        self.script_input.bind("<<Modified>>", self.on_text_modified)
 
     def create_output_display(self):
-        self.output_display_frame = tk.Frame(self.root)
-        self.output_display_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.output_display = tk.Label(self.output_display_frame)
-        self.output_display.pack(expand=True, fill=tk.BOTH)
+        self.output_display_frame = tk.Frame(self.panes)
+        self.panes.add(self.output_display_frame, stretch="always", minsize=200, width=600)
+        self.create_timing_panel()
+        self.viewer = CircuitViewer(self.output_display_frame)
+        self.viewer.pack(expand=True, fill=tk.BOTH)
+
+    def create_timing_panel(self):
+        """Collapsible table of the stages of the last run.
+
+        Timings are only recorded while the panel is open, so a closed panel
+        leaves instrumentation disabled.
+        """
+        panel = tk.Frame(self.output_display_frame, bd=1, relief=tk.GROOVE)
+        panel.pack(side=tk.BOTTOM, fill=tk.X)
+        tk.Checkbutton(panel, text="Timings", variable=self.show_timings, command=self.toggle_timings,
+                       indicatoron=False, anchor=tk.W).pack(fill=tk.X)
+        columns = ("wall", "cpu", "memory", "details")
+        self.timing_table = ttk.Treeview(panel, columns=columns, height=6)
+        self.timing_table.heading("#0", text="Stage")
+        self.timing_table.heading("wall", text="Wall ms")
+        self.timing_table.heading("cpu", text="CPU ms")
+        self.timing_table.heading("memory", text="Peak MiB")
+        self.timing_table.heading("details", text="Details")
+        self.timing_table.column("#0", width=120)
+        for column in ("wall", "cpu", "memory"):
+            self.timing_table.column(column, width=70, anchor=tk.E)
+        self.timing_table.column("details", width=240)
+
+    def toggle_timings(self):
+        if self.show_timings.get():
+            self.timing_sink = MemorySink()
+            add_sink(self.timing_sink)
+            self.timing_table.pack(fill=tk.X)
+        else:
+            remove_sink(self.timing_sink)
+            self.timing_sink = None
+            self.timing_table.pack_forget()
+
+    def show_timing_rows(self, events):
+        """Fill the timing table with one row per span and one per counter, and return the slowest span."""
+        self.timing_table.delete(*self.timing_table.get_children())
+        counters = {}
+        slowest = None
+        for event in events:
+            if event.kind == 'count':
+                key = (event.name, event.fields.get('kind'))
+                counters[key] = counters.get(key, 0) + event.fields['value']
+                continue
+            if slowest is None or event.wall > slowest.wall:
+                slowest = event
+            memory = f"{event.max_rss / 2 ** 20:.0f}" if event.max_rss is not None else ""
+            details = ", ".join(f"{key}={value}" for key, value in event.fields.items())
+            self.timing_table.insert("", tk.END, text=event.name,
+                                     values=(f"{event.wall * 1e3:.1f}", f"{event.cpu * 1e3:.1f}", memory, details))
+        for (name, kind), total in counters.items():
+            self.timing_table.insert("", tk.END, text=name, values=("", "", "", f"{kind}: {total}" if kind else total))
+        return slowest
 
     def create_status_bar(self):
         self.status_bar = tk.Label(self.root, text="Ready", bd=1, relief=tk.SUNKEN, anchor=tk.W)
@@ -268,23 +235,187 @@ class QADLApp:
                 file.write(self.script_input.get("1.0", tk.END))
             self.update_status(f"Saved As {os.path.basename(self.filename)}")
 
+    def on_text_modified(self, event=None):
+        self.script_input.edit_modified(False)
+        if self.live_preview.get():
+            self.schedule_preview()
+
+    def schedule_preview(self):
+        """Re-run the script once typing has paused for the debounce interval."""
+        if self._preview_after_id is not None:
+            self.root.after_cancel(self._preview_after_id)
+            self._preview_after_id = None
+        if self.live_preview.get():
+            self._preview_after_id = self.root.after(LIVE_PREVIEW_DELAY_MS, self._run_preview)
+
+    def _run_preview(self):
+        self._preview_after_id = None
+        self.run_qadl()
+
     def run_qadl(self):
+        """Start parsing, checking and laying out the script on a worker thread.
+
+        Any job still in flight is cancelled; its result is dropped even if it
+        finishes, since only the latest job id is displayed.
+        """
         script = self.script_input.get("1.0", tk.END)
+        cursor_line = int(self.script_input.index(tk.INSERT).split('.')[0])
+        self._start_job(self._run_job, script, cursor_line)
+        self.update_status("Parsing...")
+
+    def _start_job(self, target, *args):
+        """Cancel the job in flight and run ``target(job_id, *args, cancel)`` on a worker thread."""
+        self.cancel_run(update=False)
+        self._job_id += 1
+        self._job_cancel = threading.Event()
+        worker = threading.Thread(target=target, args=(self._job_id, *args, self._job_cancel), daemon=True)
+        worker.start()
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_INTERVAL_MS, self._poll_job_results)
+
+    def cancel_run(self, update=True):
+        if self._job_cancel is not None and not self._job_cancel.is_set():
+            self._job_cancel.set()
+            if update:
+                self.update_status("Cancelled")
+
+    def _run_job(self, job_id, script, cursor_line, cancel):
+        def report(kind, payload):
+            if cancel.is_set():
+                raise _CancelledJob()
+            self._job_results.put((job_id, kind, payload))
+
         try:
-            circuit_def = parse_qadl(script)
-            circuit_name = execute_circuit(circuit_def)
-            
-            if os.path.exists("quantum_circuit.png"):
-                img = Image.open("quantum_circuit.png")
-                img = img.resize((600, 400), Image.LANCZOS)
-                img = ImageTk.PhotoImage(img)
-                self.output_display.config(image=img)
-                self.output_display.image = img
-                self.update_status(f"Executed {circuit_name}")
+            circuit_def = self._select_circuit(self.incremental_parser.update(script), cursor_line)
+            check_circuit(circuit_def, hardware=False)
+            report("progress", f"Laying out {circuit_def.name}...")
+            layout = CircuitLayout(circuit_def)
+            analysis = analyze_circuit(circuit_def)
+            report("timings", self._take_timings())
+            report("done", (layout, analysis))
+        except _CancelledJob:
+            pass
         except SyntaxError as se:
-            self.update_status(f"Syntax Error: {se}")
+            self._job_results.put((job_id, "timings", self._take_timings()))
+            self._job_results.put((job_id, "error", f"Syntax Error: {se}"))
+        except Exception as e:
+            self._job_results.put((job_id, "timings", self._take_timings()))
+            self._job_results.put((job_id, "error", f"Error: {e}"))
+        finally:
+            self._take_timings()  # Drop what a cancelled job recorded
+
+    def _take_timings(self):
+        """Remove and return the events this worker thread recorded, if timings are shown."""
+        sink = self.timing_sink
+        return sink.drain(threading.get_ident()) if sink is not None else []
+
+    def _select_circuit(self, parsed, cursor_line):
+        """Pick the circuit under the cursor, falling back to the first one.
+
+        Only blocks whose text changed since the last run are re-parsed; a
+        syntax error in the selected block, or outside any block, is raised.
+        """
+        block = parsed.block_at(cursor_line)
+        if block is None and parsed.blocks:
+            block = parsed.blocks[0]
+        if block is not None and block.error is not None:
+            raise block.error
+        if parsed.stray_errors:
+            raise parsed.stray_errors[0]
+        if block is None:
+            raise SyntaxError("No valid circuit found in the script.")
+        return block.circuit
+
+    def _poll_job_results(self):
+        while True:
+            try:
+                job_id, kind, payload = self._job_results.get_nowait()
+            except queue.Empty:
+                break
+            if job_id != self._job_id or self._job_cancel.is_set():
+                continue
+            if kind == "progress":
+                self.update_status(payload)
+            elif kind == "timings":
+                self._slowest_stage = self.show_timing_rows(payload) if self.show_timings.get() else None
+            elif kind == "done":
+                layout, analysis = payload
+                self.current_circuit = layout.circuit
+                self.current_analysis = analysis
+                circuit_name = self.current_circuit.name
+                self.viewer.show(layout)
+                summary = f"{analysis.num_gates} gates, depth {analysis.depth}"
+                if self._slowest_stage is not None:
+                    slowest = self._slowest_stage
+                    self.update_status(f"Executed {circuit_name} ({summary}; slowest stage: {slowest.name}, "
+                                       f"{slowest.wall * 1e3:.0f} ms)")
+                else:
+                    self.update_status(f"Executed {circuit_name} ({summary})")
+                self._job_cancel.set()
+            elif kind == "exported":
+                rendered, path = payload
+                try:
+                    shutil.copyfile(rendered, path)
+                    self.update_status(f"Diagram saved as {path}")
+                except OSError as e:
+                    self.update_status(f"Error: {e}")
+                self._job_cancel.set()
+            else:
+                self.update_status(payload)
+                self._job_cancel.set()
+        if self._job_cancel.is_set():
+            self._polling = False
+        else:
+            self.root.after(POLL_INTERVAL_MS, self._poll_job_results)
+
+    def show_statistics(self):
+        """Open a window with the depth, gate counts and memory estimates of the displayed circuit."""
+        analysis = self.current_analysis
+        if analysis is None:
+            messagebox.showinfo("Circuit Statistics", "Run a circuit first.")
+            return
+        window = tk.Toplevel(self.root)
+        window.title(f"Statistics of {analysis.name}")
+        table = ttk.Treeview(window, columns=("value",), height=20)
+        table.heading("#0", text="Figure")
+        table.heading("value", text="Value")
+        table.column("#0", width=220)
+        table.column("value", width=240)
+        table.pack(expand=True, fill=tk.BOTH)
+        for key, value in analysis.asdict().items():
+            if isinstance(value, dict):
+                parent = table.insert("", tk.END, text=key, open=key != "idle")
+                for name, entry in value.items():
+                    if key == "memory":
+                        entry = f"{entry / 2 ** 20:,.2f} MiB" if entry is not None else "unsupported"
+                    table.insert(parent, tk.END, text=name, values=(entry,))
+            else:
+                table.insert("", tk.END, text=key, values=(value,))
+        path = table.insert("", tk.END, text="critical_path", values=(f"{len(analysis.critical_path)} operations",))
+        for op in analysis.critical_path[:500]:
+            table.insert(path, tk.END, text=analysis.describe(op))
+
+    def export_diagram(self):
+        """Save the Qiskit drawing of the displayed circuit as a PNG file."""
+        if self.current_circuit is None:
+            messagebox.showinfo("Export Diagram", "Run a circuit first.")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG Files", "*.png"), ("All Files", "*.*")])
+        if not path:
+            return
+        self._start_job(self._export_job, self.current_circuit, path)
+        self.update_status(f"Rendering {self.current_circuit.name}...")
+
+    def _export_job(self, job_id, circuit_def, path, cancel):
+        try:
+            rendered = render_circuit(circuit_def, get_cache())
+            if not cancel.is_set():
+                self._job_results.put((job_id, "exported", (rendered, path)))
         except Exception as e:
-            self.update_status(f"Error: {e}")
+            self._job_results.put((job_id, "error", f"Error: {e}"))
+        finally:
+            self._take_timings()  # Exports do not update the timing table
 
     def take_screenshot(self):
         screenshot_path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG Files", "*.png"), ("All Files", "*.*")])
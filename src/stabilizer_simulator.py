@@ -0,0 +1,351 @@
+"""Stabilizer-tableau simulation of Clifford circuits.
+
+A Clifford circuit on ``n`` qubits keeps ``|0...0>`` a stabilizer state,
+described by ``n`` signed Pauli generators instead of ``2**n`` amplitudes.
+``Tableau`` stores them bit-packed, 64 generators per word, so every gate is
+a few word-wise NumPy operations over ``n / 64`` words and a circuit costs
+``O(gates * n / 64)``. Sampling reduces the tableau once to the affine space
+of possible outcomes of the measured qubits and draws every shot from it
+with one matrix product, so thousands of shots of thousands of qubits take
+seconds.
+
+Supported gates are ``H``, ``X``, ``Y``, ``Z``, ``S``, ``Sdg``, ``CNOT``,
+``CZ`` and ``Swap``, ``Phase``, ``P`` and ``RZ`` by multiples of ``pi / 2``,
+placeholders, and calls of modules built from these. ``clifford_obstacle``
+names the first gate that is not.
+"""
+
+import math
+
+import numpy as np
+
+from gate_registry import ModuleSpec, OracleSpec, resolve_gate
+from instrumentation import span
+from statevector_simulator import SimulationResult
+
+_ONE = np.uint64(1)
+
+# Quarter turns of a rotation below which its angle counts as a multiple of pi / 2.
+ANGLE_TOLERANCE = 1e-9
+
+_ROTATIONS = ('Phase', 'P', 'RZ')
+
+try:
+    _popcount = np.bitwise_count
+except AttributeError:  # NumPy < 2.0
+    def _popcount(words):
+        bits = np.unpackbits(words.view(np.uint8), axis=-1)
+        return bits.reshape(words.shape + (64,)).sum(axis=-1)
+
+class Tableau:
+    """Stabilizer generators of a state of ``num_qubits`` qubits.
+
+    ``x[q]`` and ``z[q]`` are bit vectors over the generators: bit ``g``,
+    in word ``g >> 6``, says whether the Pauli of generator ``g`` on qubit
+    ``q`` has an X and a Z part (a Y has both), and the same bit of
+    ``signs`` whether the generator is negated. A gate on qubit ``q`` only
+    rewrites ``x[q]``, ``z[q]`` and ``signs``.
+    """
+
+    __slots__ = ('num_qubits', 'x', 'z', 'signs')
+
+    def __init__(self, num_qubits):
+        words = (num_qubits + 63) >> 6
+        self.num_qubits = num_qubits
+        self.x = np.zeros((num_qubits, words), dtype=np.uint64)
+        self.z = np.zeros((num_qubits, words), dtype=np.uint64)
+        self.signs = np.zeros(words, dtype=np.uint64)
+        # |0...0> is stabilized by Z on every qubit.
+        generators = np.arange(num_qubits)
+        self.z[generators, generators >> 6] = _ONE << (generators & 63).astype(np.uint64)
+
+    def h(self, q):
+        x, z = self.x[q], self.z[q]
+        self.signs ^= x & z
+        swapped = x.copy()
+        x[:] = z
+        z[:] = swapped
+
+    def s(self, q):
+        x, z = self.x[q], self.z[q]
+        self.signs ^= x & z
+        z ^= x
+
+    def sdg(self, q):
+        x, z = self.x[q], self.z[q]
+        self.signs ^= x & ~z
+        z ^= x
+
+    def pauli_x(self, q):
+        self.signs ^= self.z[q]
+
+    def pauli_y(self, q):
+        self.signs ^= self.x[q] ^ self.z[q]
+
+    def pauli_z(self, q):
+        self.signs ^= self.x[q]
+
+    def cnot(self, control, target):
+        xc, zc, xt, zt = self.x[control], self.z[control], self.x[target], self.z[target]
+        self.signs ^= xc & zt & ~(xt ^ zc)
+        xt ^= xc
+        zc ^= zt
+
+    def cz(self, a, b):
+        xa, za, xb, zb = self.x[a], self.z[a], self.x[b], self.z[b]
+        self.signs ^= xa & xb & (za ^ zb)
+        za ^= xb
+        zb ^= xa
+
+    def swap(self, a, b):
+        self.x[[a, b]] = self.x[[b, a]]
+        self.z[[a, b]] = self.z[[b, a]]
+
+    def rotate(self, q, turns):
+        """Apply ``diag(1, i**turns)``, a Z rotation by ``turns`` quarter turns up to global phase."""
+        if turns == 1:
+            self.s(q)
+        elif turns == 2:
+            self.pauli_z(q)
+        elif turns == 3:
+            self.sdg(q)
+
+    def _rows(self):
+        # One row per generator with its qubits packed 64 per word, and the signs as 0/1 bytes.
+        n = self.num_qubits
+        words = (n + 63) >> 6
+
+        def transpose(columns):
+            bits = np.unpackbits(columns.view(np.uint8), axis=1, bitorder='little')[:, :n]
+            rows = np.zeros((n, words * 64), dtype=np.uint8)
+            rows[:, :n] = bits.T
+            return np.packbits(rows, axis=1, bitorder='little').view(np.uint64)
+
+        signs = np.unpackbits(self.signs.view(np.uint8), bitorder='little')[:n]
+        return transpose(self.x), transpose(self.z), signs
+
+    def stabilizers(self):
+        """Return the generators as strings such as ``'+XZ'``, qubit 0 first."""
+        n = self.num_qubits
+        x, z, signs = self._rows()
+        x = np.unpackbits(x.view(np.uint8), axis=1, bitorder='little')[:, :n]
+        z = np.unpackbits(z.view(np.uint8), axis=1, bitorder='little')[:, :n]
+        return [('-' if sign else '+') + ''.join('IXZY'[code] for code in row)
+                for sign, row in zip(signs.tolist(), (x | z << 1).tolist())]
+
+    def sample(self, qubits, shots, rng):
+        """Return a ``(shots, len(qubits))`` array of Z measurement outcomes of ``qubits``.
+
+        Gaussian elimination, on the X parts and on the Z parts of the
+        unmeasured qubits first, leaves generators that are products of Z on
+        measured qubits only. Each fixes the parity of the outcomes it
+        covers, and all outcomes that satisfy them are equally likely: once
+        these constraints are fully reduced, the qubits that are not their
+        pivots are fair coins and the pivots follow from them.
+        """
+        n = self.num_qubits
+        x, z, signs = self._rows()
+        measured = set(qubits)
+        columns = [(x, q) for q in range(n)]
+        columns += [(z, q) for q in range(n) if q not in measured]
+        free_from = len(columns)
+        columns += [(z, q) for q in qubits]
+        rank = 0
+        constraints_from = None
+        pivots = []
+        for index, (part, q) in enumerate(columns):
+            if index == free_from:
+                constraints_from = rank
+            word, mask = q >> 6, _ONE << np.uint64(q & 63)
+            hits = np.flatnonzero(part[rank:, word] & mask)
+            if not len(hits):
+                continue
+            pivot = rank + hits[0]
+            if pivot != rank:
+                for array in (x, z, signs):
+                    array[[rank, pivot]] = array[[pivot, rank]]
+            # Forward elimination only: reducing the rows above as well fills them in.
+            targets = rank + 1 + np.flatnonzero(part[rank + 1:, word] & mask)
+            if len(targets):
+                _multiply_rows(x, z, signs, targets, rank)
+            if index >= free_from:
+                pivots.append(q)
+            rank += 1
+        if constraints_from is None:
+            constraints_from = rank
+        # Back substitution, last constraint first, so every constraint has a single pivot.
+        for row in range(rank - 1, constraints_from - 1, -1):
+            q = pivots[row - constraints_from]
+            word, mask = q >> 6, _ONE << np.uint64(q & 63)
+            targets = constraints_from + np.flatnonzero(z[constraints_from:row, word] & mask)
+            if len(targets):
+                _multiply_rows(x, z, signs, targets, row)
+
+        position = {q: k for k, q in enumerate(qubits)}
+        pivot_set = set(pivots)
+        free = [q for q in qubits if q not in pivot_set]
+        outcomes = np.zeros((shots, len(qubits)), dtype=np.uint8)
+        coins = rng.integers(0, 2, size=(shots, len(free)), dtype=np.uint8)
+        outcomes[:, [position[q] for q in free]] = coins
+        if pivots:
+            rows = np.unpackbits(z[constraints_from:].view(np.uint8), axis=1, bitorder='little')
+            values = np.broadcast_to(signs[constraints_from:], (shots, len(pivots))).astype(np.int64)
+            if free:
+                # Exact in float32 while fewer than 2**24 coins are summed.
+                coefficients = rows[:, free].T.astype(np.float32)
+                values = values + (coins.astype(np.float32) @ coefficients).astype(np.int64)
+            outcomes[:, [position[q] for q in pivots]] = values & 1
+        return outcomes
+
+def _multiply_rows(x, z, signs, targets, source):
+    """Multiply the generators ``targets`` by generator ``source`` in row form, fixing their signs."""
+    xs, zs = x[source], z[source]
+    xt, zt = x[targets], z[targets]
+    # Exponent of i picked up on each qubit, as in Aaronson and Gottesman's rowsum.
+    plus = (xs & zs & zt & ~xt) | (xs & ~zs & zt & xt) | (~xs & zs & xt & ~zt)
+    minus = (xs & zs & xt & ~zt) | (xs & ~zs & zt & ~xt) | (~xs & zs & xt & zt)
+    phase = _popcount(plus).sum(axis=1, dtype=np.int64) - _popcount(minus).sum(axis=1, dtype=np.int64)
+    signs[targets] ^= (signs[source] ^ ((phase & 3) >> 1)).astype(np.uint8)
+    x[targets] = xt ^ xs
+    z[targets] = zt ^ zs
+
+_KERNELS = {
+    'H': Tableau.h,
+    'X': Tableau.pauli_x,
+    'Y': Tableau.pauli_y,
+    'Z': Tableau.pauli_z,
+    'S': Tableau.s,
+    'Sdg': Tableau.sdg,
+    'CNOT': Tableau.cnot,
+    'CZ': Tableau.cz,
+    'Swap': Tableau.swap,
+}
+
+def _quarter_turns(angle):
+    turns = angle / (math.pi / 2)
+    whole = round(turns)
+    return whole % 4 if abs(turns - whole) < ANGLE_TOLERANCE else None
+
+def _is_placeholder(spec):
+    return spec.factory is None and spec.expand is None and spec.matrix is None
+
+def clifford_obstacle(circuit_def, parameters=None):
+    """Return why ``circuit_def`` cannot run on a tableau, or ``None`` if it is Clifford.
+
+    Looks at every gate and called module, binding symbolic rotation angles
+    from ``parameters``; control flow and mid-circuit measurements are left
+    to the caller.
+    """
+    pending = [circuit_def]
+    seen = {id(circuit_def)}
+    while pending:
+        circuit = pending.pop()
+        rotations = set()
+        for opcode, name in enumerate(circuit.opcode_names):
+            try:
+                spec = resolve_gate(name, circuit)
+            except ValueError as error:
+                return str(error)
+            if isinstance(spec, ModuleSpec):
+                if id(spec.module) not in seen:
+                    seen.add(id(spec.module))
+                    pending.append(spec.module)
+            elif isinstance(spec, OracleSpec) or (spec.name not in _KERNELS and spec.name not in _ROTATIONS
+                                                  and not _is_placeholder(spec)):
+                if opcode not in circuit.gate_ops:
+                    continue
+                line = circuit.gate_lines[list(circuit.gate_ops).index(opcode)]
+                return f"gate {name} on line {line} of {circuit.name} is not a Clifford gate"
+            elif spec.name in _ROTATIONS:
+                rotations.add(opcode)
+        if rotations:
+            for i, opcode in enumerate(circuit.gate_ops):
+                if opcode not in rotations:
+                    continue
+                try:
+                    params = circuit.gate_values(i, parameters)
+                except ValueError as error:
+                    return str(error)
+                spec = resolve_gate(circuit.opcode_names[opcode], circuit)
+                if _quarter_turns((params or spec.defaults)[0]) is None:
+                    return (f"gate {circuit.opcode_names[opcode]} on line {circuit.gate_lines[i]} of "
+                            f"{circuit.name} is not a multiple of pi/2")
+    return None
+
+def _apply(tableau, circuit_def, qubits, parameters):
+    specs = [resolve_gate(name, circuit_def) for name in circuit_def.opcode_names]
+    offsets = circuit_def.gate_offsets
+    operands = circuit_def.gate_operands
+    param_offsets = circuit_def.gate_param_offsets
+    start = 0
+    for i, opcode in enumerate(circuit_def.gate_ops):
+        end = offsets[i + 1]
+        spec = specs[opcode]
+        targets = [qubits[q] for q in operands[start:end]] if qubits is not None else operands[start:end].tolist()
+        start = end
+        spec.check_arity(len(targets))
+        if isinstance(spec, ModuleSpec):
+            _apply(tableau, spec.module, targets, parameters)
+        elif isinstance(spec, OracleSpec):
+            raise ValueError(f"Oracle {spec.name} is not a Clifford gate")
+        elif spec.name in _KERNELS:
+            _KERNELS[spec.name](tableau, *targets)
+        elif spec.name in _ROTATIONS:
+            params = circuit_def.gate_values(i, parameters) if param_offsets[i + 1] > param_offsets[i] else ()
+            spec.check_params(len(params))
+            turns = _quarter_turns((params or spec.defaults)[0])
+            if turns is None:
+                raise ValueError(f"Gate {spec.name} on line {circuit_def.gate_lines[i]} is not a Clifford rotation")
+            tableau.rotate(targets[0], turns)
+        elif not _is_placeholder(spec):
+            raise ValueError(f"Gate {spec.name} is not a Clifford gate")
+
+def run_tableau(circuit_def, parameters=None):
+    """Apply every gate of ``circuit_def`` to ``|0...0>`` and return the ``Tableau``."""
+    undeclared = circuit_def.undeclared_qubits()
+    if undeclared:
+        raise ValueError(f"Undeclared qubit: {undeclared[0]}")
+    tableau = Tableau(circuit_def.num_qubits)
+    _apply(tableau, circuit_def, None, parameters)
+    return tableau
+
+def _counts(outcomes, qubits, circuit_def):
+    # Later measurements into a classical bit overwrite earlier ones, as in the statevector simulator.
+    num_clbits = len(circuit_def.classical_bits)
+    column = {q: k for k, q in enumerate(qubits)}
+    register = np.zeros((len(outcomes), num_clbits), dtype=np.uint8)
+    for qubit, clbit in zip(circuit_def.measure_qubits, circuit_def.measure_clbits):
+        register[:, clbit] = outcomes[:, column[qubit]]
+    packed = np.packbits(register[:, ::-1], axis=1)
+    hits = {}
+    for row in packed:
+        key = row.tobytes()
+        hits[key] = hits.get(key, 0) + 1
+    counts = {}
+    for key, hit in hits.items():
+        bits = np.unpackbits(np.frombuffer(key, dtype=np.uint8))[:num_clbits]
+        counts[''.join('1' if bit else '0' for bit in bits.tolist())] = hit
+    return counts
+
+def simulate_stabilizer(circuit_def, shots=1024, seed=None, parameters=None):
+    """Sample the measurements of a Clifford circuit from its stabilizer tableau.
+
+    Measurements must come after the last gate on their qubit and the
+    circuit must not use ``if``/``while``; ``ValueError`` is raised for
+    those and for non-Clifford gates. The result carries no statevector.
+    """
+    if circuit_def.control_blocks:
+        raise ValueError(f"Circuit {circuit_def.name} uses classical control flow, "
+                         f"which the stabilizer simulator does not support")
+    from statevector_simulator import measures_midway
+    if measures_midway(circuit_def):
+        raise ValueError(f"Circuit {circuit_def.name} measures a qubit before its last gate, "
+                         f"which the stabilizer simulator does not support")
+    with span('simulate.stabilizer', circuit=circuit_def.name, gates=circuit_def.num_gates,
+              qubits=circuit_def.num_qubits, shots=shots):
+        tableau = run_tableau(circuit_def, parameters)
+        if not shots or not circuit_def.classical_bits:
+            return SimulationResult(circuit_def.name, None, {}, shots, 'stabilizer')
+        qubits = list(dict.fromkeys(circuit_def.measure_qubits))
+        outcomes = tableau.sample(qubits, shots, np.random.default_rng(seed))
+        return SimulationResult(circuit_def.name, None, _counts(outcomes, qubits, circuit_def), shots, 'stabilizer')
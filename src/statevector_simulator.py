@@ -0,0 +1,570 @@
+import math
+
+import numpy as np
+
+from gate_registry import ModuleSpec, OracleSpec, approximation_degree, lookup_gate, qft_partners, resolve_gate
+from instrumentation import span
+
+# Bound on amplitudes held by one batched state (2**24 complex128 values is 256 MiB).
+MAX_BATCH_AMPLITUDES = 1 << 24
+
+# Widest module that is fused into one unitary (64x64 at six qubits).
+MAX_FUSED_QUBITS = 6
+
+# Oracles marking at most this many states negate them one slice each instead of multiplying by a diagonal.
+SPARSE_ORACLE_STATES = 16
+
+class SimulationResult:
+    """Outcome of a native simulation.
+
+    ``statevector`` uses Qiskit's little-endian ordering (qubit 0 is the least
+    significant bit of the index) and ``counts`` maps classical bitstrings,
+    highest classical bit first, to the number of shots that produced them.
+    ``method`` names the backend that produced the result.
+    """
+
+    def __init__(self, name, statevector, counts, shots, method=None):
+        self.name = name
+        self.statevector = statevector
+        self.counts = counts
+        self.shots = shots
+        self.method = method
+
+def sparse_plan(matrix):
+    """Return ``(diagonal, rows, saved)`` describing the non-zero structure of ``matrix``.
+
+    For a diagonal matrix ``diagonal`` lists its entries and the rest is
+    ``None``. Otherwise ``rows`` lists ``(row, [(column, entry), ...])`` for
+    every row that is not an identity row, and ``saved`` the columns whose
+    input slices are overwritten before they are read.
+    """
+    size = len(matrix)
+    entries = []
+    for row in range(size):
+        columns = np.flatnonzero(matrix[row]).tolist()
+        entries.append(list(zip(columns, matrix[row, columns].tolist())))
+    if all(all(column == row for column, _ in row_entries) for row, row_entries in enumerate(entries)):
+        return [dict(row_entries).get(row, 0) for row, row_entries in enumerate(entries)], None, None
+    identity = [row_entries == [(row, 1)] for row, row_entries in enumerate(entries)]
+    rows = [(row, entries[row]) for row in range(size) if not identity[row]]
+    saved = sorted({column for _, row_entries in rows for column, _ in row_entries if not identity[column]})
+    return None, rows, saved
+
+class Statevector:
+    """Dense statevector with gates applied to strided views of the state.
+
+    Qubit ``q`` is bit ``q`` of the flat amplitude index, so a gate only
+    reshapes the array around its own qubits and never builds a ``2**n``
+    square operator. With ``batch > 1`` the array holds that many independent
+    states back to back and every gate advances all of them at once.
+    """
+
+    def __init__(self, num_qubits, dtype=np.complex128, batch=1):
+        self.num_qubits = num_qubits
+        self.batch = batch
+        self.data = np.zeros(batch << num_qubits, dtype=dtype)
+        self.data[::1 << num_qubits] = 1
+
+    @classmethod
+    def from_batched(cls, amplitudes):
+        """Wrap a contiguous ``(batch, 2**n)`` amplitude array without copying it."""
+        state = cls.__new__(cls)
+        state.batch, size = amplitudes.shape
+        state.num_qubits = size.bit_length() - 1
+        state.data = amplitudes.reshape(-1)
+        return state
+
+    def batched(self):
+        """Return the amplitudes as a ``(batch, 2**n)`` view."""
+        return self.data.reshape(self.batch, -1)
+
+    def apply_single(self, matrix, qubit):
+        low = 1 << qubit
+        view = self.data.reshape(-1, 2, low)
+        zero, one = view[:, 0, :], view[:, 1, :]
+        if matrix[0, 1] == 0 and matrix[1, 0] == 0:
+            if matrix[0, 0] != 1:
+                zero *= matrix[0, 0]
+            if matrix[1, 1] != 1:
+                one *= matrix[1, 1]
+            return
+        saved = zero.copy()
+        np.multiply(saved, matrix[0, 0], out=zero)
+        zero += matrix[0, 1] * one
+        one *= matrix[1, 1]
+        one += matrix[1, 0] * saved
+
+    def apply(self, matrix, qubits, plan=None):
+        """Apply ``matrix`` (first listed qubit most significant) to ``qubits``.
+
+        The state is viewed with one length-2 axis per target qubit and
+        updated in place: only the ``2**k`` slices whose matrix row is not an
+        identity row are rewritten, each from the input slices with a
+        non-zero entry, so controlled permutation gates reduce to a few block
+        copies and diagonal gates to in-place scaling. ``plan`` is the
+        ``sparse_plan`` of ``matrix`` when the caller has it cached.
+        """
+        if len(qubits) == 1:
+            self.apply_single(matrix, qubits[0])
+            return
+        if plan is None:
+            plan = sparse_plan(matrix)
+        diagonal, rows, saved_columns = plan
+        view, blocks = self._blocks(qubits)
+        if diagonal is not None:
+            for index, entry in zip(blocks, diagonal):
+                if entry != 1:
+                    view[index] *= entry
+            return
+        saved = {column: view[blocks[column]].copy() for column in saved_columns}
+        for row, entries in rows:
+            target = view[blocks[row]]
+            if not entries:
+                target[...] = 0
+                continue
+            for n, (column, entry) in enumerate(entries):
+                source = saved[column] if column in saved else view[blocks[column]]
+                if n == 0:
+                    if entry == 1:
+                        np.copyto(target, source)
+                    else:
+                        np.multiply(source, entry, out=target)
+                elif entry == 1:
+                    target += source
+                else:
+                    target += entry * source
+
+    def _view(self, qubits, batch_axis=False):
+        """Return a view with one length-2 axis per qubit and the axis of every qubit.
+
+        With ``batch_axis`` the batch gets its own leading axis, otherwise it
+        is folded into the outermost axis.
+        """
+        shape = [self.batch] if batch_axis else []
+        axis = {}
+        previous = self.num_qubits
+        for qubit in sorted(qubits, reverse=True):
+            shape += [1 << (previous - qubit - 1), 2]
+            axis[qubit] = len(shape) - 1
+            previous = qubit
+        shape.append(1 << previous)
+        if not batch_axis:
+            shape[0] = -1  # Absorbs the batch axis
+        return self.data.reshape(shape), axis
+
+    def _blocks(self, qubits, batch_axis=False):
+        """Return ``_view`` and the index of every basis block of ``qubits``."""
+        k = len(qubits)
+        view, axis = self._view(qubits, batch_axis)
+
+        def block(basis):
+            index = [slice(None)] * view.ndim
+            for j, qubit in enumerate(qubits):
+                index[axis[qubit]] = (basis >> (k - 1 - j)) & 1
+            return tuple(index)
+
+        return view, [block(basis) for basis in range(1 << k)]
+
+    def apply_fourier(self, qubits, inverse=False):
+        """Apply the QFT (or its inverse) to ``qubits``, ``qubits[0]`` least significant.
+
+        The target axes are gathered into one register axis and transformed
+        with a single NumPy FFT, which costs ``O(n * 2**n)`` instead of the
+        ``O(n**2)`` gate passes of the circuit.
+        """
+        view, axis = self._view(qubits)
+        k = len(qubits)
+        # Most significant register bit first, so the gathered axis indexes the register value.
+        register = np.moveaxis(view, [axis[qubit] for qubit in reversed(qubits)], range(-k, 0))
+        outer = register.shape[:-k]
+        transform = np.fft.fft if inverse else np.fft.ifft
+        register[...] = transform(register.reshape(outer + (1 << k,)), axis=-1, norm='ortho').reshape(register.shape)
+
+    def _register(self, qubits):
+        # The axes of qubits moved last, qubits[0] the outermost of them.
+        view, axis = self._view(qubits)
+        return np.moveaxis(view, [axis[qubit] for qubit in qubits], range(-len(qubits), 0))
+
+    def negate(self, states, qubits):
+        """Negate the amplitudes in which ``qubits``, first listed most significant, hold one of ``states``."""
+        register = self._register(qubits)
+        k = len(qubits)
+        for basis in states:
+            register[(Ellipsis,) + tuple((basis >> (k - 1 - j)) & 1 for j in range(k))] *= -1
+
+    def _runs(self, qubits):
+        """Return a view with one axis per run of consecutive ``qubits`` and the axes of those runs.
+
+        A run axis indexes its qubits with the highest one most significant.
+        Merging runs keeps reductions and broadcasts over many qubits down to
+        a few axes.
+        """
+        shape = []
+        axes = []
+        previous = self.num_qubits
+        ordered = sorted(qubits, reverse=True)
+        i = 0
+        while i < len(ordered):
+            j = i
+            while j + 1 < len(ordered) and ordered[j + 1] == ordered[j] - 1:
+                j += 1
+            shape += [1 << (previous - ordered[i] - 1), 1 << (j - i + 1)]
+            axes.append(len(shape) - 1)
+            previous = ordered[j]
+            i = j + 1
+        shape.append(1 << previous)
+        shape[0] = -1  # Absorbs the batch axis
+        return self.data.reshape(shape), axes
+
+    def apply_diagonal(self, diagonal, qubits):
+        """Multiply by the diagonal operator ``diagonal`` on ``qubits``, first listed most significant.
+
+        One broadcast multiply over the state, without a matrix or a
+        gate decomposition.
+        """
+        view, axes = self._runs(qubits)
+        k = len(qubits)
+        # Reorder the diagonal's qubit axes to the state's, highest qubit first.
+        order = sorted(range(k), key=lambda j: -qubits[j])
+        shape = [1] * view.ndim
+        for axis in axes:
+            shape[axis] = view.shape[axis]
+        view *= diagonal.reshape((2,) * k).transpose(order).reshape(shape)
+
+    def reflect_about_mean(self, qubits):
+        """Apply ``2|s><s| - I`` to ``qubits``, ``|s>`` their uniform superposition.
+
+        Every amplitude becomes twice the mean over its ``qubits`` subspace
+        minus itself, in one pass after the mean is taken.
+        """
+        view, axes = self._runs(qubits)
+        mean = view.mean(axis=tuple(axes), keepdims=True)
+        np.subtract(2 * mean, view, out=view)
+
+    def apply_batched(self, matrices, qubits):
+        """Apply ``matrices[b]`` to state ``b`` of the batch.
+
+        Uses the same block decomposition as ``apply``, with every matrix
+        entry broadcast as a column of per-state values. Entries that are
+        zero for the whole batch are skipped, so diagonal rotations stay
+        in-place scalings.
+        """
+        view, blocks = self._blocks(qubits, batch_axis=True)
+        columns = matrices.reshape(matrices.shape + (1,) * (view.ndim - len(qubits) - 1))
+        nonzero = np.any(matrices != 0, axis=0)
+        if np.count_nonzero(nonzero) == np.count_nonzero(np.diagonal(nonzero)):
+            for basis, index in enumerate(blocks):
+                view[index] *= columns[:, basis, basis]
+            return
+        saved = [view[index].copy() for index in blocks]
+        for row, index in enumerate(blocks):
+            target = view[index]
+            entries = np.flatnonzero(nonzero[row])
+            if not len(entries):
+                target[...] = 0
+                continue
+            np.multiply(saved[entries[0]], columns[:, row, entries[0]], out=target)
+            for column in entries[1:]:
+                target += saved[column] * columns[:, row, column]
+
+    def probabilities(self):
+        probs = np.abs(self.data).astype(np.float64) ** 2
+        return probs / probs.sum()
+
+def _approximate_qft(state, qubits, matrices, degree, inverse):
+    """Apply an approximate QFT gate by gate, mirroring ``gate_registry.apply_qft``."""
+    n = len(qubits)
+    swap = matrices['Swap']
+    sign = -1j if inverse else 1j
+
+    def rotate(j, m):
+        phase = np.exp(sign * math.pi / float(2 ** (j - m)))
+        state.apply(np.diag([1, 1, 1, phase]), [qubits[j], qubits[m]])
+
+    def swap_ends():
+        for qubit in range(n // 2):
+            state.apply(swap, [qubits[qubit], qubits[n - qubit - 1]], matrices.plan(swap))
+
+    if inverse:
+        swap_ends()
+        for j in range(n):
+            for m in qft_partners(j, degree):
+                rotate(j, m)
+            state.apply_single(matrices['H'], qubits[j])
+    else:
+        for j in reversed(range(n)):
+            state.apply_single(matrices['H'], qubits[j])
+            for m in reversed(qft_partners(j, degree)):
+                rotate(j, m)
+        swap_ends()
+
+def _fourier(inverse):
+    name = 'InverseQFT' if inverse else 'QFT'
+
+    def kernel(state, qubits, matrices, params=()):
+        degree = approximation_degree(params[0] if params else 0, name)
+        if not degree or degree >= len(qubits) - 1:
+            state.apply_fourier(qubits, inverse)
+        else:
+            _approximate_qft(state, qubits, matrices, degree, inverse)
+    return kernel
+
+def _diffuser(state, qubits, matrices, params=()):
+    state.reflect_about_mean(qubits)
+
+_COMPOSITE_KERNELS = {
+    'QFT': _fourier(False),
+    'InverseQFT': _fourier(True),
+    'Diffuser': _diffuser,
+}
+
+def apply_gate(state, spec, qubits, matrices, params=()):
+    """Apply one registered gate or module call to ``state``; placeholders are ignored."""
+    if spec.matrix is not None:
+        matrix = matrices.matrix(spec, params)
+        state.apply(matrix, qubits, matrices.plan(matrix))
+    elif isinstance(spec, ModuleSpec):
+        steps, unitary = matrices.module(spec.module)
+        if unitary is not None:
+            # The fused unitary indexes module qubit q by bit q, so the last
+            # listed qubit is its most significant one.
+            state.apply(unitary, qubits[::-1], matrices.plan(unitary))
+            return
+        for step_spec, step_qubits, step_params in steps:
+            apply_gate(state, step_spec, [qubits[q] for q in step_qubits], matrices, step_params)
+    elif isinstance(spec, OracleSpec):
+        marked = matrices.oracle(spec.oracle)
+        if isinstance(marked, list):
+            state.negate(marked, qubits)
+        else:
+            state.apply_diagonal(marked, qubits)
+    elif spec.name in _COMPOSITE_KERNELS:
+        _COMPOSITE_KERNELS[spec.name](state, qubits, matrices, params)
+
+def _compile_module(module, matrices):
+    """Return the resolved gate list of ``module`` and its fused unitary or ``None``.
+
+    A module on at most ``MAX_FUSED_QUBITS`` qubits is run once over every
+    basis state as one batch, which yields its unitary. The unitary is kept
+    when applying it touches fewer amplitudes than running the gates one by
+    one would, counting nested module calls at their flattened size.
+    """
+    specs = [resolve_gate(name, module) for name in module.opcode_names]
+    steps = []
+    cost = 0
+    for i, opcode in enumerate(module.gate_ops):
+        spec = specs[opcode]
+        qubits = module.gate_qubits(i).tolist()
+        spec.check_arity(len(qubits))
+        params = module.gate_values(i, matrices.parameters)
+        spec.check_params(len(params))
+        steps.append((spec, qubits, params))
+        cost += matrices.module_cost(spec.module) if isinstance(spec, ModuleSpec) else 1
+    unitary = None
+    k = module.num_qubits
+    if 0 < k <= MAX_FUSED_QUBITS and cost > 1:
+        size = 1 << k
+        basis = Statevector(k, matrices.dtype, size)
+        basis.batched()[:] = np.eye(size)
+        for spec, qubits, params in steps:
+            apply_gate(basis, spec, qubits, matrices, params)
+        # Row b of the batch is the image of basis state b.
+        candidate = basis.batched().T.copy()
+        candidate[np.abs(candidate) < 1e-12] = 0
+        if np.count_nonzero(candidate) < cost * size:
+            unitary = candidate
+    return steps, unitary, cost
+
+class GateMatrices(dict):
+    """Gate name to NumPy unitary, converted from the registry on first use.
+
+    Parameterized gates are keyed by ``(name, params)`` through ``matrix``.
+    Modules are compiled by ``module`` and oracles by ``oracle`` once per
+    run, with symbolic module parameters bound from ``parameters``, and
+    ``plan`` caches the ``sparse_plan`` of every matrix handed out.
+    """
+
+    def __init__(self, dtype, parameters=None):
+        super().__init__()
+        self.dtype = dtype
+        self.parameters = parameters
+        self.modules = {}
+        self.oracles = {}
+        self.plans = {}
+
+    def plan(self, matrix):
+        # Matrices handed out stay referenced by this object, so their ids are stable.
+        plan = self.plans.get(id(matrix))
+        if plan is None:
+            plan = self.plans[id(matrix)] = sparse_plan(matrix)
+        return plan
+
+    def module(self, module):
+        """Return ``(steps, unitary)`` for ``module``, compiling it on first use."""
+        compiled = self.modules.get(id(module))
+        if compiled is None:
+            compiled = self.modules[id(module)] = _compile_module(module, self)
+        return compiled[:2]
+
+    def oracle(self, oracle):
+        """Return the marked states of ``oracle`` as a list when there are few, else its +-1 diagonal."""
+        compiled = self.oracles.get(id(oracle))
+        if compiled is None:
+            if oracle.num_marked() <= SPARSE_ORACLE_STATES:
+                compiled = oracle.marked_states()
+            else:
+                size = 1 << oracle.num_qubits
+                table = np.frombuffer(oracle.truth_table().to_bytes((size + 7) // 8, 'little'), dtype=np.uint8)
+                marked = np.unpackbits(table, bitorder='little')[:size]
+                compiled = 1 - 2 * marked.astype(np.int8)
+            self.oracles[id(oracle)] = compiled
+        return compiled
+
+    def module_cost(self, module):
+        """Return the number of registered gates a call of ``module`` flattens to."""
+        self.module(module)
+        return self.modules[id(module)][2]
+
+    def __missing__(self, key):
+        if isinstance(key, tuple):
+            matrix = np.asarray(lookup_gate(key[0]).unitary(key[1]), dtype=self.dtype)
+        else:
+            matrix = np.asarray(lookup_gate(key).unitary(), dtype=self.dtype)
+        self[key] = matrix
+        return matrix
+
+    def matrix(self, spec, params=()):
+        return self[(spec.name, tuple(params))] if params else self[spec.name]
+
+def sample_counts(probabilities, circuit_def, shots, rng):
+    """Sample ``shots`` outcomes and fold them onto the measured classical bits."""
+    num_clbits = len(circuit_def.classical_bits)
+    if not shots or not num_clbits:
+        return {}
+    hits = rng.multinomial(shots, probabilities)
+    states = np.flatnonzero(hits)
+    return fold_counts(states, hits[states], circuit_def)
+
+def fold_counts(states, hits, circuit_def):
+    """Map basis-state indices and their hit counts onto classical bitstrings.
+
+    A circuit without classical bits has no counts, as in every backend.
+    """
+    num_clbits = len(circuit_def.classical_bits)
+    if not num_clbits:
+        return {}
+    values = np.zeros(len(states), dtype=np.int64)
+    for qubit, clbit in zip(circuit_def.measure_qubits, circuit_def.measure_clbits):
+        values &= ~np.int64(1 << clbit)
+        values |= ((states >> qubit) & 1) << clbit
+    counts = {}
+    for value, hit in zip(values.tolist(), np.asarray(hits).tolist()):
+        key = format(value, f'0{num_clbits}b')
+        counts[key] = counts.get(key, 0) + hit
+    return counts
+
+def run_statevector(circuit_def, dtype=np.complex128, parameters=None):
+    """Apply every gate of ``circuit_def`` to ``|0...0>`` and return the state.
+
+    Consecutive single-qubit gates on a qubit are multiplied into one 2x2
+    matrix and only applied when a multi-qubit gate touches that qubit or the
+    circuit ends. A ``call`` of a module is compiled once, into a fused
+    unitary when that is cheaper, and reused at every call site. Symbolic
+    gate parameters are bound from the ``parameters`` dict.
+    """
+    undeclared = circuit_def.undeclared_qubits()
+    if undeclared:
+        raise ValueError(f"Undeclared qubit: {undeclared[0]}")
+
+    state = Statevector(circuit_def.num_qubits, dtype)
+    matrices = GateMatrices(dtype, parameters)
+    specs = [resolve_gate(name, circuit_def) for name in circuit_def.opcode_names]
+    offsets = circuit_def.gate_offsets
+    operands = circuit_def.gate_operands
+    param_offsets = circuit_def.gate_param_offsets
+    pending = {}
+
+    def flush(qubits):
+        for qubit in qubits:
+            matrix = pending.pop(qubit, None)
+            if matrix is not None:
+                state.apply_single(matrix, qubit)
+
+    start = 0
+    for i, opcode in enumerate(circuit_def.gate_ops):
+        end = offsets[i + 1]
+        spec = specs[opcode]
+        qubits = operands[start:end].tolist()
+        start = end
+        spec.check_arity(len(qubits))
+        params = circuit_def.gate_values(i, parameters) if param_offsets[i + 1] > param_offsets[i] else ()
+        spec.check_params(len(params))
+        if spec.matrix is not None:
+            matrix = matrices.matrix(spec, params)
+            if len(qubits) == 1:
+                qubit = qubits[0]
+                previous = pending.get(qubit)
+                pending[qubit] = matrix if previous is None else matrix @ previous
+                continue
+            flush(qubits)
+            state.apply(matrix, qubits, matrices.plan(matrix))
+        else:
+            flush(qubits)
+            apply_gate(state, spec, qubits, matrices, params)
+    flush(list(pending))
+    return state
+
+def measures_midway(circuit_def):
+    """Whether a gate acts on a qubit after it has been measured."""
+    last_gate = {}
+    operands = circuit_def.gate_operands
+    offsets = circuit_def.gate_offsets
+    for i in range(circuit_def.num_gates):
+        for qubit in operands[offsets[i]:offsets[i + 1]]:
+            last_gate[qubit] = i
+    return any(position <= last_gate.get(qubit, -1)
+               for qubit, position in zip(circuit_def.measure_qubits, circuit_def.measure_positions))
+
+def simulate_circuit(circuit_def, shots=1024, seed=None, dtype=np.complex128, parameters=None, method=None,
+                     keep_state=True):
+    """Simulate ``circuit_def`` without Qiskit and sample its measurements.
+
+    ``method`` picks the backend: ``'statevector'``, ``'branches'``
+    (``branch_simulator.simulate_branches``) or ``'stabilizer'``
+    (``stabilizer_simulator.simulate_stabilizer``, without a statevector in
+    the result). By default circuits with ``if``/``while`` blocks or
+    mid-circuit measurements take the branch simulator and the rest the
+    statevector, except that Clifford circuits take the stabilizer tableau
+    when ``keep_state`` is false or their state would exceed
+    ``MAX_BATCH_AMPLITUDES``; the span records why a circuit was not
+    Clifford. The result's ``method`` names the backend that ran.
+    ``parameters`` binds symbolic gate parameters by name.
+    """
+    with span('simulate', circuit=circuit_def.name, gates=circuit_def.num_gates,
+              qubits=circuit_def.num_qubits, shots=shots) as stage:
+        if method is None:
+            if circuit_def.control_blocks or measures_midway(circuit_def):
+                method = 'branches'
+            else:
+                from stabilizer_simulator import clifford_obstacle  # stabilizer_simulator imports this module
+                obstacle = clifford_obstacle(circuit_def, parameters)
+                fits = (1 << circuit_def.num_qubits) <= MAX_BATCH_AMPLITUDES
+                method = 'statevector' if obstacle or (keep_state and fits) else 'stabilizer'
+                if obstacle:
+                    stage.set(not_clifford=obstacle)
+        stage.set(method=method)
+        if method == 'branches':
+            from branch_simulator import simulate_branches  # branch_simulator imports this module
+            return simulate_branches(circuit_def, shots, seed, dtype, parameters)
+        if method == 'stabilizer':
+            from stabilizer_simulator import simulate_stabilizer
+            return simulate_stabilizer(circuit_def, shots, seed, parameters)
+        if method != 'statevector':
+            raise ValueError(f"Unknown simulation method: {method}")
+        if circuit_def.control_blocks or measures_midway(circuit_def):
+            raise ValueError(f"Circuit {circuit_def.name} has control flow or mid-circuit measurements, "
+                             f"which need the branch simulator")
+        state = run_statevector(circuit_def, dtype, parameters)
+        rng = np.random.default_rng(seed)
+        counts = sample_counts(state.probabilities(), circuit_def, shots, rng)
+        return SimulationResult(circuit_def.name, state.data, counts, shots, 'statevector')
@@ -0,0 +1,182 @@
+"""Batch syndrome decoding for the codes of ``error_correction``.
+
+Decoding never loops over shots in Python. Each check type of a code gets a
+``LookupDecoder`` holding, for every syndrome, a minimum-weight error that
+produces it. The table is filled by a breadth-first search over the
+syndrome space, one NumPy step per error weight. Whole batches are then
+decoded with one matrix product, turning syndrome bits into table indices,
+and one gather.
+"""
+
+import functools
+
+import numpy as np
+
+from error_correction import encoded_blocks, lookup_code
+from instrumentation import span
+
+# Largest number of checks of one type given a table; it holds 2**checks rows.
+MAX_LOOKUP_CHECKS = 20
+# Shots sampled and decoded per batch by logical_error_rate.
+CHUNK_SHOTS = 1 << 18
+
+def check_matrix(checks, num_qubits):
+    """Return the ``(len(checks), num_qubits)`` parity-check matrix of ``checks`` as uint8."""
+    matrix = np.zeros((len(checks), num_qubits), dtype=np.uint8)
+    for row, check in enumerate(checks):
+        matrix[row, list(check)] = 1
+    return matrix
+
+class LookupDecoder:
+    """Minimum-weight lookup-table decoder for one parity-check matrix.
+
+    ``table[s]`` is a lowest-weight error whose syndrome, read as an integer
+    with check ``i`` as bit ``i``, is ``s``. Syndromes no error produces map
+    to no correction.
+    """
+
+    __slots__ = ('checks', 'table', 'weights')
+
+    def __init__(self, checks):
+        num_checks, num_qubits = checks.shape
+        if num_checks > MAX_LOOKUP_CHECKS:
+            raise ValueError(f"A lookup table for {num_checks} checks is too large; at most {MAX_LOOKUP_CHECKS} are supported")
+        self.checks = checks
+        self.weights = np.left_shift(1, np.arange(num_checks, dtype=np.int64))
+        size = 1 << num_checks
+        table = np.zeros((size, num_qubits), dtype=np.uint8)
+        seen = np.zeros(size, dtype=bool)
+        seen[0] = True
+        # The syndrome of an error on each single qubit; adding one flips these bits.
+        flips = self.weights @ checks.astype(np.int64)
+        frontier = np.zeros(1, dtype=np.int64)
+        while frontier.size:
+            reached = (frontier[:, None] ^ flips[None, :]).ravel()
+            source = np.repeat(frontier, num_qubits)
+            qubit = np.tile(np.arange(num_qubits), len(frontier))
+            fresh = ~seen[reached]
+            reached, first = np.unique(reached[fresh], return_index=True)
+            source = source[fresh][first]
+            qubit = qubit[fresh][first]
+            table[reached] = table[source]
+            table[reached, qubit] ^= 1
+            seen[reached] = True
+            frontier = reached
+        self.table = table
+
+    def syndromes(self, errors):
+        """Return the syndrome bits of each row of the 0/1 matrix ``errors``."""
+        return (errors.astype(np.uint8) @ self.checks.T) & 1
+
+    def decode(self, syndromes):
+        """Return the correction for each row of the 0/1 syndrome matrix ``syndromes``."""
+        return self.table[syndromes.astype(np.int64) @ self.weights]
+
+class CodeDecoder:
+    """The two lookup decoders of a CSS code.
+
+    ``x_decoder`` corrects X errors from the Z-check syndromes and
+    ``z_decoder`` Z errors from the X-check syndromes.
+    """
+
+    __slots__ = ('code', 'x_decoder', 'z_decoder', 'logical_x', 'logical_z')
+
+    def __init__(self, code):
+        n = code.num_qubits
+        self.code = code
+        self.x_decoder = LookupDecoder(check_matrix(code.z_checks, n))
+        self.z_decoder = LookupDecoder(check_matrix(code.x_checks, n))
+        self.logical_x = check_matrix([code.logical_x], n)[0]
+        self.logical_z = check_matrix([code.logical_z], n)[0]
+
+    def decode_readout(self, bits):
+        """Return the corrected logical Z value of each row of data qubit outcomes ``bits``.
+
+        The syndrome is recomputed from the outcomes themselves, so X errors
+        up to the code distance are corrected whatever happened before the
+        readout.
+        """
+        bits = bits.astype(np.uint8)
+        corrected = bits ^ self.x_decoder.decode(self.x_decoder.syndromes(bits))
+        return (corrected @ self.logical_z & 1).astype(np.uint8)
+
+    def logical_failures(self, x_errors, z_errors):
+        """Return which rows of the Pauli errors ``x_errors``/``z_errors`` the decoders fail to correct."""
+        x_residual = x_errors ^ self.x_decoder.decode(self.x_decoder.syndromes(x_errors))
+        z_residual = z_errors ^ self.z_decoder.decode(self.z_decoder.syndromes(z_errors))
+        return ((x_residual @ self.logical_z) & 1 | (z_residual @ self.logical_x) & 1).astype(bool)
+
+@functools.lru_cache(maxsize=None)
+def _build_decoder(name):
+    code = lookup_code(name)
+    with span('qec.decoder', code=name, checks=code.num_checks):
+        return CodeDecoder(code)
+
+def code_decoder(name):
+    """Return the cached ``CodeDecoder`` of the code registered as ``name``."""
+    return _build_decoder(lookup_code(name).name)
+
+def logical_error_rate(name, probability, shots=1_000_000, seed=None):
+    """Estimate the logical error rate of a code under independent depolarizing noise.
+
+    Each data qubit suffers X, Y or Z with probability ``probability / 3``
+    each, the syndromes of ``shots`` such errors are decoded in batches of
+    ``CHUNK_SHOTS`` and the fraction whose residual flips a logical
+    operator is returned.
+    """
+    if not 0 <= probability <= 1:
+        raise ValueError(f"Error probability must be between 0 and 1, got {probability}")
+    decoder = code_decoder(name)
+    rng = np.random.default_rng(seed)
+    n = decoder.code.num_qubits
+    failures = 0
+    with span('qec.error_rate', code=decoder.code.name, shots=shots):
+        for start in range(0, shots, CHUNK_SHOTS):
+            draws = rng.random((min(CHUNK_SHOTS, shots - start), n), dtype=np.float32)
+            # [0, p/3) is X, [p/3, 2p/3) is Y and [2p/3, p) is Z.
+            x_errors = (draws < 2 * probability / 3).view(np.uint8)
+            z_errors = ((draws >= probability / 3) & (draws < probability)).view(np.uint8)
+            failures += int(np.count_nonzero(decoder.logical_failures(x_errors, z_errors)))
+    return failures / shots if shots else 0.0
+
+def decode_counts(circuit_def, counts, keep_syndromes=False):
+    """Return ``counts`` with every encoded measurement replaced by its decoded logical value.
+
+    ``counts`` are the raw counts of ``circuit_def`` after its
+    ``error_correction`` directives were lowered. For each block whose
+    qubit was measured, the bit it was measured into gets the corrected
+    logical value of the block's last readout. Unless ``keep_syndromes`` is
+    set, the other data bits and the syndrome bits are dropped from the
+    keys, leaving the circuit's own classical bits in their usual order.
+    """
+    blocks = encoded_blocks(circuit_def)
+    if not blocks or not counts:
+        return dict(counts)
+    width = len(circuit_def.classical_bits)
+    keys = list(counts)
+    with span('qec.decode', circuit=circuit_def.name, outcomes=len(keys)):
+        # Row k is outcome k with classical bit b in column b.
+        register = (np.frombuffer(''.join(keys).encode('ascii'), dtype=np.uint8).reshape(len(keys), width)
+                    - ord('0'))[:, ::-1].copy()
+        index = circuit_def.qubit_index
+        last_clbit = {}
+        for qubit, clbit in zip(circuit_def.measure_qubits, circuit_def.measure_clbits):
+            last_clbit[qubit] = clbit
+        dropped = set()
+        for block in blocks:
+            dropped.update(circuit_def.classical_bits[name] for name in sum(block.ancillas, ()))
+            readout = [last_clbit.get(index[name]) for name in block.data]
+            if None in readout:
+                continue
+            logical = readout[block.template.input]
+            register[:, logical] = code_decoder(block.code.name).decode_readout(register[:, readout])
+            dropped.update(clbit for clbit in readout if clbit != logical)
+        kept = [clbit for clbit in range(width) if keep_syndromes or clbit not in dropped]
+        digits = (register[:, kept[::-1]] + ord('0')).astype(np.uint8)
+        rows = digits.tobytes().decode('ascii')
+        step = len(kept)
+        decoded = {}
+        for k, count in enumerate(counts.values()):
+            key = rows[k * step:(k + 1) * step]
+            decoded[key] = decoded.get(key, 0) + count
+        return decoded
@@ -0,0 +1,21 @@
+from benchmarks.generator import WorkloadSpec, generate_script
+from benchmarks.runner import compare_results, run_suite
+from qiskit_parser import parse_qadl_all
+
+def test_generated_script_has_the_requested_shape():
+    spec = WorkloadSpec(num_qubits=5, num_gates=200, module_depth=2, circuits=3, seed=4)
+    script = generate_script(spec)
+    assert generate_script(spec) == script
+    circuits = parse_qadl_all(script)
+    assert len(circuits) == 3
+    for circuit_def in circuits:
+        assert circuit_def.num_qubits == 5
+        assert circuit_def.num_gates == 200
+        assert len(circuit_def.modules) >= 1
+
+def test_suite_results_compare_against_a_baseline():
+    document = run_suite([WorkloadSpec(num_qubits=3, num_gates=50)], stages=('parse', 'simulate'), memory=False)
+    assert [record['stage'] for record in document['results']] == ['parse', 'simulate']
+    assert compare_results(document, document) == []
+    slower = {'results': [dict(record, seconds=record['seconds'] / 10) for record in document['results']]}
+    assert {regression[1] for regression in compare_results(document, slower)} == {'parse', 'simulate'}
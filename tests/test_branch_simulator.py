@@ -0,0 +1,68 @@
+import math
+
+import pytest
+
+from branch_simulator import simulate_branches
+from qiskit_parser import parse_qadl
+from statevector_simulator import simulate_circuit
+
+TELEPORT = """@startqadl
+Circuit Teleport {
+    qubit q0
+    qubit q1
+    qubit q2
+    gate RY(1.0) q0
+    gate Hadamard q1
+    gate CNOT q1 q2
+    gate CNOT q0 q1
+    gate Hadamard q0
+    measure q0 -> c0
+    measure q1 -> c1
+    if (c1 == 1) {
+        gate X q2
+    }
+    if (c0 == 1) {
+        gate Z q2
+    }
+    gate RY(-1.0) q2
+    measure q2 -> c2
+}
+@endqadl"""
+
+REPEAT_UNTIL_ZERO = """@startqadl
+Circuit Retry {
+    qubit q0
+    gate H q0
+    measure q0 -> c0
+    while (c0 == 1) max 4 {
+        gate H q0
+        measure q0 -> c0
+    }
+}
+@endqadl"""
+
+def test_feed_forward_teleports_the_state():
+    result = simulate_circuit(parse_qadl(TELEPORT), shots=2000, seed=5)
+    assert result.method == 'branches'
+    # RY(-1) undoes the teleported RY(1), so c2 reads 0 on every shot whatever c0 and c1 were.
+    assert sum(result.counts.values()) == 2000
+    assert all(key[0] == '0' for key in result.counts)
+    assert len(result.counts) == 4
+
+def test_bounded_while_loop_retries_measurement():
+    counts = simulate_branches(parse_qadl(REPEAT_UNTIL_ZERO), shots=20000, seed=7).counts
+    # Five tries of a fair coin: 1 remains only if every try gave 1.
+    assert counts.get('1', 0) / 20000 == pytest.approx(1 / 32, abs=0.01)
+
+def test_mid_circuit_measurement_collapses_state():
+    result = simulate_circuit(parse_qadl("""@startqadl
+Circuit Twice {
+    qubit q0
+    gate H q0
+    measure q0 -> c0
+    gate H q0
+    measure q0 -> c1
+}
+@endqadl"""), shots=8000, seed=2)
+    for key in ('00', '01', '10', '11'):
+        assert result.counts[key] / 8000 == pytest.approx(0.25, abs=0.03)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from circuit_analysis import analyze_circuit
+from qiskit_executor import build_circuit
+from qiskit_parser import QuantumCircuitDef, parse_qadl
+
+@pytest.mark.parametrize('seed', range(4))
+def test_depth_matches_qiskit_for_plain_gates(seed):
+    rng = np.random.default_rng(seed)
+    circuit_def = QuantumCircuitDef('Random')
+    qubits = [f"q{q}" for q in range(6)]
+    for qubit in qubits:
+        circuit_def.declare_qubit(qubit)
+    for _ in range(80):
+        width = int(rng.integers(1, 4))
+        targets = [qubits[q] for q in rng.choice(6, width, replace=False)]
+        circuit_def.append_gate(('H', 'CNOT', 'CCNOT')[width - 1], targets)
+    for q, qubit in enumerate(qubits[:3]):
+        circuit_def.append_measurement(qubit, f"c{q}")
+    analysis = analyze_circuit(circuit_def)
+    assert analysis.depth == build_circuit(circuit_def).depth()
+    assert len(analysis.critical_path) == analysis.depth
+    assert sum(analysis.layer_widths()) == analysis.num_gates + analysis.num_measurements
+
+def test_composite_gates_take_one_layer():
+    analysis = analyze_circuit(parse_qadl("""@startqadl
+Circuit Composite {
+    qubit q0
+    qubit q1
+    qubit q2
+    gate H q0
+    gate QFT q0 q1 q2
+    gate T q2
+    measure q2 -> c0
+}
+@endqadl"""))
+    assert analysis.depth == 4
+    assert analysis.gate_counts == {'H': 1, 'QFT': 1, 'T': 1}
+    assert analysis.multi_qubit_gates == 1
+    assert [analysis.describe(op) for op in analysis.critical_path] == [
+        'H q0 (line 6)', 'QFT q0 q1 q2 (line 7)', 'T q2 (line 8)', 'measure q2 (line 9)']
+    assert list(analysis.idle) == [2, 3, 1]
+    assert analysis.backend == 'statevector'
+    assert analysis.memory(shots=10)['statevector'] == 16 * 8
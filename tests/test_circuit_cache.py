@@ -0,0 +1,42 @@
+import os
+
+from circuit_cache import CircuitCache, circuit_key
+from qiskit_executor import build_circuit, translate_circuit
+from qiskit_parser import parse_qadl
+
+BELL = """@startqadl
+Circuit Bell {
+    qubit q0
+    qubit q1
+    gate H q0
+    gate CNOT q0 q1
+    measure q0 -> c0
+}
+@endqadl"""
+
+def test_key_ignores_layout_but_not_content():
+    key = circuit_key(parse_qadl(BELL))
+    assert circuit_key(parse_qadl(BELL.replace('Circuit Bell {', '// moved\n\nCircuit Bell {'))) == key
+    assert circuit_key(parse_qadl(BELL.replace('gate H q0', 'gate X q0'))) != key
+
+def test_translated_circuit_survives_a_new_process_cache(tmp_path):
+    circuit_def = parse_qadl(BELL)
+    first = CircuitCache(str(tmp_path))
+    qc = translate_circuit(circuit_def, first)
+    assert (first.hits, first.misses) == (0, 1)
+    second = CircuitCache(str(tmp_path))
+    assert translate_circuit(circuit_def, second) == qc == build_circuit(circuit_def)
+    assert (second.hits, second.misses) == (1, 0)
+
+def test_eviction_keeps_the_newest_entries_and_foreign_files(tmp_path):
+    foreign = tmp_path / 'notes.txt'
+    foreign.write_text('x' * 5000)
+    cache = CircuitCache(str(tmp_path), max_disk_bytes=10_000)
+    for k in range(30):
+        cache.put_image(f"k{k:02d}", lambda path: open(path, 'w').write('y' * 1000))
+    kept = sorted(name for name in os.listdir(tmp_path) if name.endswith('.png'))
+    assert 1 <= len(kept) <= 10
+    assert kept == [f"k{k:02d}.png" for k in range(30 - len(kept), 30)]
+    assert foreign.exists()
+    cache.clear()
+    assert os.listdir(tmp_path) == ['notes.txt']
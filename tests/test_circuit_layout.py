@@ -0,0 +1,54 @@
+from circuit_layout import (GATE_FILL, MODULE_FILL, PLACEHOLDER_FILL, TILE_SIZE, CircuitLayout, _fill,
+                            render_tile)
+from qiskit_parser import QuantumCircuitDef, parse_qadl
+
+SOURCE = """@startqadl
+Circuit Drawn {
+    qubit q0
+    qubit q1
+    qubit q2
+    module Pair {
+        qubit a
+        qubit b
+        gate CNOT a b
+    }
+    oracle Mark marks 11
+    gate H q0
+    gate X q2
+    call Pair q0 q1
+    gate Mark q1 q2
+    measure q0 -> c0
+    if (c0 == 1) {
+        gate Z q2
+    }
+}
+@endqadl"""
+
+def test_operations_are_packed_into_columns():
+    layout = CircuitLayout(parse_qadl(SOURCE))
+    assert list(layout.columns) == [0, 0, 1, 2, 2, 3]
+    assert [layout.label(k) for k in layout.operations_in(2, 2)] == ['Mark', 'M c0']
+    assert layout.blocks == [(3, 3, 'if (c0 == 1)')]
+    assert layout.operations_in(7, 9) == ()
+
+def test_fill_marks_modules_oracles_and_unknown_gates():
+    circuit_def = parse_qadl(SOURCE)
+    assert _fill(circuit_def, 'Pair') == MODULE_FILL
+    assert _fill(circuit_def, 'Mark') == GATE_FILL
+    assert _fill(circuit_def, 'H') == GATE_FILL
+    assert _fill(circuit_def, 'Nowhere') == PLACEHOLDER_FILL
+
+def test_tiles_cover_a_large_circuit():
+    circuit_def = QuantumCircuitDef('Wide')
+    for q in range(4):
+        circuit_def.declare_qubit(f"q{q}")
+    for _ in range(20000):
+        circuit_def.append_gate('CNOT', ['q0', 'q3'])
+    layout = CircuitLayout(circuit_def)
+    assert layout.num_columns == 20000
+    width, height = layout.size(0.5)
+    assert width > 500000 * 0.5 and height < TILE_SIZE
+    for zoom in (1.0, 0.3, 0.05):
+        tile = render_tile(layout, zoom, 100, 0)
+        assert tile.size == (TILE_SIZE, TILE_SIZE)
+        assert len(tile.getcolors(TILE_SIZE * TILE_SIZE)) > 1
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from circuit_optimizer import optimize_circuit
+from qiskit_parser import QuantumCircuitDef, parse_qadl
+from statevector_simulator import run_statevector
+
+def test_inverse_pairs_cancel_through_commuting_gates():
+    circuit_def = parse_qadl("""@startqadl
+Circuit Redundant {
+    qubit a
+    qubit b
+    gate H a
+    gate H a
+    gate CNOT a b
+    gate Z a
+    gate CNOT a b
+    gate RZ(0.25) b
+    gate RZ(0.5) b
+    gate Oracle a b
+    measure a -> c0
+}
+@endqadl""")
+    optimized, report = optimize_circuit(circuit_def)
+    names = [optimized.opcode_names[op] for op in optimized.gate_ops]
+    assert names == ['Z', 'RZ']
+    assert optimized.gate_parameters(1) == [0.75]
+    assert (report.gates_before, report.gates_after, report.placeholders) == (8, 2, 1)
+    assert len(optimized.measure_qubits) == 1
+
+@pytest.mark.parametrize('seed', range(6))
+def test_optimized_circuit_is_equivalent(seed):
+    rng = np.random.default_rng(seed)
+    circuit_def = QuantumCircuitDef('Random')
+    for q in range(4):
+        circuit_def.declare_qubit(f"q{q}")
+    for _ in range(80):
+        name = str(rng.choice(['H', 'X', 'Z', 'S', 'Sdg', 'T', 'RZ', 'RX', 'CNOT', 'CZ', 'Swap']))
+        if name in ('CNOT', 'CZ', 'Swap'):
+            a, b = rng.choice(4, 2, replace=False)
+            circuit_def.append_gate(name, [f"q{a}", f"q{b}"])
+        elif name in ('RZ', 'RX'):
+            circuit_def.append_gate(name, [f"q{rng.integers(4)}"], [float(rng.choice([0.5, -0.5, 1.0]))])
+        else:
+            circuit_def.append_gate(name, [f"q{rng.integers(4)}"])
+    optimized, report = optimize_circuit(circuit_def)
+    assert report.gates_after < report.gates_before
+    assert np.allclose(run_statevector(optimized).data, run_statevector(circuit_def).data)
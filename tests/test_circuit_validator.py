@@ -0,0 +1,52 @@
+import pytest
+
+from circuit_validator import ERROR, WARNING, ValidationError, check_circuit, validate_circuit
+from qiskit_parser import parse_qadl
+
+FAULTY = """@startqadl
+Circuit Faulty {
+    qubit q0
+    qubit q1
+    qubit q2
+    module M {
+        qubit a
+        qubit b
+        gate CNOT a a
+        gate Foo b
+    }
+    call M q0 q1
+    gate CNOT q0 q2
+    gate CNOT q0 q2
+    gate RX q1
+    if (c5 == 1) {
+        gate X q0
+    }
+    measure q0 -> c0
+    hardware {
+        qubit_connectivity {
+            q0 - q1 - q2
+        }
+    }
+}
+@endqadl"""
+
+def test_every_problem_is_reported_in_one_pass():
+    diagnostics = validate_circuit(parse_qadl(FAULTY))
+    found = [(diagnostic.severity, diagnostic.line, diagnostic.message) for diagnostic in diagnostics]
+    assert found == [
+        (ERROR, 9, "Gate CNOT uses qubit a twice"),
+        (ERROR, 10, "Unsupported gate: Foo"),
+        (ERROR, 15, "Gate RX expects 1 parameter(s), got 0"),
+        (ERROR, 16, "Unknown classical bit 'c5': no measurement writes it"),
+        (WARNING, 13, "Qubits q0 and q2 are not coupled; routing will insert swaps"),
+    ]
+    assert diagnostics[4].count == 2
+
+def test_check_circuit_raises_with_all_errors():
+    with pytest.raises(ValidationError) as raised:
+        check_circuit(parse_qadl(FAULTY))
+    assert len(raised.value.diagnostics) == 4
+
+def test_hardware_checks_can_be_skipped():
+    assert [diagnostic.severity for diagnostic in validate_circuit(parse_qadl(FAULTY), hardware=False)] == [
+        ERROR, ERROR, ERROR, ERROR]
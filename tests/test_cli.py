@@ -0,0 +1,38 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+from qadl_cli import EXIT_FAILED, EXIT_OK, main
+
+SRC = os.path.join(os.path.dirname(__file__), '..', 'src')
+DEMO = os.path.join(os.path.dirname(__file__), '..', 'QADL_Help_Demo.qadl')
+
+def _run(*argv):
+    out = io.StringIO()
+    code = main(list(argv), out=out)
+    return code, out.getvalue()
+
+def test_simulate_reports_counts_as_json():
+    code, text = _run('simulate', DEMO, '--json', '--seed', '3', '--shots', '200')
+    assert code == EXIT_OK
+    document = json.loads(text)
+    circuits = {result['circuit']: result for result in document['files'][0]['circuits']}
+    assert circuits['DeutschJosza']['counts'] == {'11': 200}
+    assert circuits['BellState']['method'] == 'stabilizer'
+    assert set(circuits['BellState']['counts']) == {'00', '11'}
+
+def test_errors_set_the_exit_code(tmp_path):
+    broken = tmp_path / 'broken.qadl'
+    broken.write_text("@startqadl\nCircuit Broken {\n    qubit q0\n    gate Foo q0\n}\n@endqadl\n")
+    code, text = _run('check', str(broken))
+    assert code == EXIT_FAILED
+    assert "Unsupported gate: Foo" in text
+
+def test_startup_and_check_do_not_import_numerical_packages():
+    script = ("import io, sys, qadl_cli; qadl_cli.main(['check', sys.argv[1]], out=io.StringIO()); "
+              "print(sorted(m for m in ('numpy', 'qiskit', 'matplotlib') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', script, DEMO], cwd=SRC, capture_output=True, text=True,
+                            check=True).stdout
+    assert output.strip() == '[]'
@@ -0,0 +1,53 @@
+import pytest
+
+from compiled_circuit import compile_file, load_compiled, load_qadl_file, source_digest
+from qiskit_parser import parse_qadl_all
+from statevector_simulator import simulate_circuit
+
+SOURCE = """@startqadl
+Circuit Packed {
+    qubit q0
+    qubit q1
+    qubit q2
+    oracle Odd(a, b, c) = a ^ b ^ c
+    gate H q0
+    gate RZ(2 * theta + 0.5) q1
+    gate Odd q0 q1 q2
+    measure q0 -> c0
+    if (c0 == 1) {
+        gate X q2
+    }
+    measure q2 -> c1
+}
+@endqadl"""
+
+ARRAYS = ('gate_ops', 'gate_offsets', 'gate_operands', 'gate_param_offsets', 'gate_params',
+          'gate_param_symbols', 'gate_param_scales', 'gate_lines', 'measure_qubits',
+          'measure_clbits', 'measure_positions', 'measure_lines')
+
+def test_compiled_file_round_trips(tmp_path):
+    source = tmp_path / 'packed.qadl'
+    source.write_text(SOURCE)
+    expected, = parse_qadl_all(SOURCE)
+    loaded, = load_compiled(compile_file(str(source)), source_digest(SOURCE.encode()))
+    for field in ARRAYS:
+        assert list(getattr(loaded, field)) == list(getattr(expected, field)), field
+    assert loaded.qubit_names == expected.qubit_names
+    assert loaded.parameter_names == expected.parameter_names
+    assert list(loaded.oracles) == ['Odd']
+    assert [block.line for block in loaded.control_blocks] == [11]
+    parameters = {'theta': 0.25}
+    assert (simulate_circuit(loaded, 200, seed=4, parameters=parameters).counts
+            == simulate_circuit(expected, 200, seed=4, parameters=parameters).counts)
+
+def test_stale_file_is_rejected_and_rebuilt(tmp_path):
+    source = tmp_path / 'packed.qadl'
+    source.write_text(SOURCE)
+    path = compile_file(str(source))
+    changed = SOURCE.replace('gate H q0', 'gate X q0')
+    source.write_text(changed)
+    with pytest.raises(ValueError, match="out of date"):
+        load_compiled(path, source_digest(changed.encode()))
+    circuit_def, = load_qadl_file(str(source))
+    assert circuit_def.opcode_names[circuit_def.gate_ops[0]] == 'X'
+    assert load_compiled(path, source_digest(changed.encode()))[0].num_gates == 4
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from error_correction import lookup_code
+from qiskit_parser import parse_qadl
+from statevector_simulator import simulate_circuit
+from syndrome_decoder import code_decoder, decode_counts, logical_error_rate
+
+CODES = ('BitFlip', 'PhaseFlip', 'Shor', 'Steane', 'Surface3')
+
+def _encoded(code, flip):
+    return parse_qadl(f"""@startqadl
+Circuit Encoded {{
+    qubit q0
+    {'gate X q0' if flip else ''}
+    error_correction {code} q0 rounds 1
+    measure q0 -> c0
+}}
+@endqadl""")
+
+@pytest.mark.parametrize('code', CODES)
+@pytest.mark.parametrize('flip', (0, 1))
+def test_noiseless_readout_decodes_to_the_logical_value(code, flip):
+    circuit_def = _encoded(code, flip)
+    result = simulate_circuit(circuit_def, shots=50, seed=1, keep_state=False)
+    assert result.method == 'stabilizer'
+    assert decode_counts(circuit_def, result.counts) == {str(flip): 50}
+
+@pytest.mark.parametrize('code', ('Shor', 'Steane', 'Surface3', 'Surface5'))
+def test_every_single_qubit_error_is_corrected(code):
+    decoder = code_decoder(code)
+    n = lookup_code(code).num_qubits
+    single = np.eye(n, dtype=np.uint8)
+    none = np.zeros_like(single)
+    assert not decoder.logical_failures(single, none).any()
+    assert not decoder.logical_failures(none, single).any()
+    assert not decoder.logical_failures(single, single).any()
+
+def test_logical_error_rate_is_below_the_physical_rate():
+    assert logical_error_rate('Steane', 0.0, 1000, seed=1) == 0.0
+    assert logical_error_rate('Steane', 0.01, 100000, seed=1) < 0.005
+    with pytest.raises(ValueError, match="between 0 and 1"):
+        logical_error_rate('Steane', 1.5)
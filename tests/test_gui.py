@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+tk = pytest.importorskip('tkinter')
+
+from circuit_layout import CircuitLayout
+from qiskit_parser import QuantumCircuitDef
+
+SCRIPT = """@startqadl
+Circuit Bell {
+    qubit q0
+    qubit q1
+    gate H q0
+    gate CNOT q0 q1
+    measure q0 -> c0
+    measure q1 -> c1
+}
+@endqadl"""
+
+@pytest.fixture
+def root():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    root.withdraw()
+    yield root
+    root.destroy()
+
+def _pump(root, done, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not done() and time.monotonic() < deadline:
+        root.update()
+        time.sleep(0.01)
+    assert done()
+
+def test_run_happens_off_the_main_thread(root):
+    from qiskit_qadl_gui import QADLApp
+    app = QADLApp(root)
+    app.script_input.insert('1.0', SCRIPT)
+    app.run_qadl()
+    app.run_qadl()  # supersedes the first run, whose result is dropped
+    assert app.status_bar.cget('text') == "Parsing..."
+    _pump(root, lambda: app.current_analysis is not None)
+    assert app.current_circuit.name == 'Bell'
+    assert app.status_bar.cget('text').startswith("Executed Bell (2 gates, depth 3")
+
+def test_viewer_cache_stays_bounded_while_panning(root):
+    from circuit_viewer import CircuitViewer
+    circuit_def = QuantumCircuitDef('Wide')
+    for q in range(40):
+        circuit_def.declare_qubit(f"q{q}")
+    for i in range(4000):
+        circuit_def.append_gate('CNOT', [f"q{i % 40}", f"q{(i * 7 + 1) % 40}"])
+    viewer = CircuitViewer(root, width=600, height=256)
+    viewer.pack()
+    root.update()
+    viewer.show(CircuitLayout(circuit_def))
+    for _ in range(50):
+        viewer.left += 97
+        viewer.refresh()
+        _pump(root, lambda: not viewer._pending)
+        assert len(viewer._tiles) <= max(viewer._limit, len(viewer._items))
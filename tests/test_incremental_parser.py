@@ -0,0 +1,46 @@
+from incremental_parser import IncrementalParser
+from qiskit_parser import parse_qadl_all
+
+FIRST = """Circuit First {
+    qubit q0
+    gate H q0
+    measure q0 -> c0
+}"""
+
+SECOND = """Circuit Second {
+    qubit q0
+    if (c0 == 1) {
+        gate X q0
+    }
+    measure q0 -> c0
+}"""
+
+def _script(*blocks):
+    return '@startqadl\n' + '\n'.join(blocks) + '\n@endqadl\n'
+
+def test_only_edited_blocks_are_reparsed():
+    parser = IncrementalParser()
+    first = parser.update(_script(FIRST, SECOND))
+    assert first.reparsed == 2
+    edited = parser.update(_script(FIRST.replace('gate H q0', 'gate X q0'), SECOND))
+    assert edited.reparsed == 1
+    assert edited.circuits[1] is first.circuits[1]
+
+def test_moved_block_gets_shifted_copy_and_cached_one_is_untouched():
+    parser = IncrementalParser()
+    cached = parser.update(_script(FIRST, SECOND)).circuits[1]
+    lines = list(cached.gate_lines), [block.line for block in cached.control_blocks]
+    moved = parser.update(_script(FIRST, '// a comment', SECOND))
+    assert moved.reparsed == 0
+    shifted = moved.circuits[1]
+    assert (list(cached.gate_lines), [block.line for block in cached.control_blocks]) == lines
+    fresh = parse_qadl_all(_script(FIRST, '// a comment', SECOND))[1]
+    assert list(shifted.gate_lines) == list(fresh.gate_lines)
+    assert [block.line for block in shifted.control_blocks] == [block.line for block in fresh.control_blocks]
+
+def test_syntax_error_stays_in_its_block():
+    parser = IncrementalParser()
+    result = parser.update(_script(FIRST, SECOND.replace('gate X q0', 'gate X')))
+    assert [circuit.name for circuit in result.circuits] == ['First']
+    assert len(result.errors) == 1
+    assert result.block_at(10).error is result.errors[0]
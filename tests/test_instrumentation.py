@@ -0,0 +1,42 @@
+import threading
+
+from instrumentation import MemorySink, count, enabled, instrumented, span
+from qiskit_executor import build_circuit
+from qiskit_parser import parse_qadl
+
+BELL = """@startqadl
+Circuit Bell {
+    qubit q0
+    qubit q1
+    gate H q0
+    gate CNOT q0 q1
+}
+@endqadl"""
+
+def test_pipeline_stages_are_recorded():
+    with instrumented(MemorySink()) as sink:
+        build_circuit(parse_qadl(BELL))
+        count('test.counter', 3)
+    summary = sink.summary()
+    assert summary['parse']['calls'] == 1
+    assert summary['translate']['calls'] == 1
+    assert summary['test.counter']['total'] == 3
+    translate, = [event for event in sink.events if event.name == 'translate']
+    assert translate.fields['gates'] == 2
+    assert not enabled()
+
+def test_spans_are_free_without_sinks_and_drain_by_thread():
+    with span('idle') as stage:
+        stage.set(ignored=True)
+    def work():
+        with span('worker'):
+            pass
+
+    sink = MemorySink()
+    with instrumented(sink):
+        worker = threading.Thread(target=work)
+        with span('main'):
+            worker.start()
+            worker.join()
+    assert [event.name for event in sink.drain(threading.get_ident())] == ['main']
+    assert [event.name for event in sink.drain()] == ['worker']
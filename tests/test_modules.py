@@ -0,0 +1,35 @@
+import numpy as np
+from qiskit.quantum_info import Statevector
+
+from circuit_optimizer import optimize_circuit
+from qiskit_executor import build_circuit
+from qiskit_parser import parse_qadl
+from statevector_simulator import run_statevector
+
+ROTATED = """@startqadl
+Circuit Rotated {
+    module Rot {
+        qubit x
+        gate RZ(theta) x
+        gate RY(theta) x
+    }
+    qubit a
+    qubit b
+    gate H a
+    call Rot a
+    gate CNOT a b
+    call Rot b
+}
+@endqadl"""
+
+def test_call_registers_module_parameters():
+    circuit_def = parse_qadl(ROTATED)
+    assert circuit_def.parameter_names == ['theta']
+
+def test_optimized_parameterized_module_translates():
+    optimized, _ = optimize_circuit(parse_qadl(ROTATED))
+    assert optimized.parameter_names == ['theta']
+    qc = build_circuit(optimized)
+    assert [parameter.name for parameter in qc.parameters] == ['theta']
+    expected = Statevector(qc.assign_parameters({qc.parameters[0]: 0.7})).data
+    assert np.allclose(run_statevector(optimized, parameters={'theta': 0.7}).data, expected)
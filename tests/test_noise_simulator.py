@@ -0,0 +1,48 @@
+import pytest
+
+from noise_simulator import simulate_noisy
+from qiskit_parser import parse_qadl
+from statevector_simulator import simulate_circuit
+
+BELL = """@startqadl
+Circuit Bell {
+    qubit q0
+    qubit q1
+    gate H q0
+    gate CNOT q0 q1
+    measure q0 -> c0
+    measure q1 -> c1
+}
+@endqadl"""
+
+REMEASURED = """@startqadl
+Circuit Remeasured {
+    qubit q0
+    gate H q0
+    measure q0 -> c0
+    gate H q0
+    measure q0 -> c1
+}
+@endqadl"""
+
+def test_mid_circuit_measurement_is_rejected():
+    with pytest.raises(ValueError, match="measures a qubit before its last gate"):
+        simulate_noisy(parse_qadl(REMEASURED), shots=1000, seed=1)
+
+@pytest.mark.parametrize('shots, trajectories', [(1500, None), (1500, 1024), (10, 64), (5000, 7)])
+def test_shots_are_split_exactly(shots, trajectories):
+    result = simulate_noisy(parse_qadl(BELL), shots=shots, trajectories=trajectories, seed=1)
+    assert result.shots == shots
+    assert sum(result.counts.values()) == shots
+    assert set(result.counts) <= {'00', '11'}
+
+def test_empty_register_has_no_counts_in_every_backend():
+    circuit_def = parse_qadl("""@startqadl
+Circuit Silent {
+    qubit q0
+    gate H q0
+}
+@endqadl""")
+    assert simulate_noisy(circuit_def, shots=100, seed=1).counts == {}
+    for method in ('statevector', 'branches', 'stabilizer'):
+        assert simulate_circuit(circuit_def, shots=100, seed=1, method=method).counts == {}
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from qiskit.quantum_info import Statevector
+
+from parameter_sweep import sweep_circuit
+from qiskit_executor import bound_circuits
+from qiskit_parser import parse_qadl
+
+ANSATZ = """@startqadl
+Circuit Ansatz {
+    qubit q0
+    qubit q1
+    gate RY(theta) q0
+    gate CNOT q0 q1
+    gate RZ(2 * phi - 0.5) q1
+    gate RX(phi) q1
+    measure q0 -> c0
+    measure q1 -> c1
+}
+@endqadl"""
+
+def test_sweep_matches_bound_qiskit_circuits():
+    circuit_def = parse_qadl(ANSATZ)
+    values = {'theta': np.linspace(0, np.pi, 4), 'phi': np.linspace(-1, 1, 3)}
+    result = sweep_circuit(circuit_def, values, keep_states=True)
+    assert result.grid().shape == (4, 3, 4)
+    for k, qc in enumerate(bound_circuits(circuit_def, values)):
+        expected = Statevector(qc.remove_final_measurements(inplace=False))
+        assert np.allclose(result.statevectors[k], expected.data)
+        assert np.allclose(result.probabilities[k], expected.probabilities())
+
+def test_sampled_sweep_counts_add_up():
+    result = sweep_circuit(parse_qadl(ANSATZ), {'theta': [0, np.pi], 'phi': [0]}, shots=300, seed=4)
+    assert result.counts[0] == {'00': 300}
+    assert result.counts[1] == {'11': 300}
+
+def test_unknown_and_unsweepable_parameters_are_rejected():
+    with pytest.raises(ValueError, match="Unknown parameter: psi"):
+        sweep_circuit(parse_qadl(ANSATZ), {'psi': [0]})
+    circuit_def = parse_qadl(ANSATZ.replace('gate RX(phi) q1', 'gate QFT(k) q0 q1'))
+    with pytest.raises(ValueError, match="Gate QFT on line 8 has no matrix"):
+        sweep_circuit(circuit_def, {'theta': [0], 'phi': [0], 'k': [0, 1]})
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from qiskit_executor import execute_circuits
+from qiskit_parser import GateParameter, parse_qadl, parse_qadl_all
+
+DEMO = os.path.join(os.path.dirname(__file__), '..', 'QADL_Help_Demo.qadl')
+
+NESTED = """@startqadl
+Circuit Nested {
+    module Pair {
+        qubit a
+        qubit b
+        gate H a
+        gate CNOT a b
+    }
+    qubit q0
+    qubit q1
+    hardware {
+        qubit_connectivity {
+            q0 - q1
+        }
+    }
+    call Pair q0 q1
+    gate RZ(2 * theta + 0.5) q1
+    measure q0 -> c0
+    while (c0 == 1) max 3 {
+        gate X q0
+        if (c0 == 1) {
+            gate Z q1
+        } else {
+            gate Y q1
+        }
+        measure q0 -> c0
+    }
+}
+@endqadl"""
+
+def test_demo_file_parses_every_circuit():
+    with open(DEMO) as handle:
+        circuits = parse_qadl_all(handle.read())
+    assert [circuit.name for circuit in circuits] == [
+        'BellState', 'QuantumTeleportation', 'DeutschJosza', 'QuantumFourierTransform',
+        'GroversAlgorithm', 'QuantumPhaseEstimation']
+
+def test_nested_blocks_fill_packed_arrays():
+    circuit_def = parse_qadl(NESTED)
+    assert circuit_def.qubit_names == ['q0', 'q1']
+    assert list(circuit_def.modules) == ['Pair']
+    assert circuit_def.hardware_config['qubit_connectivity'] == ['q0 - q1']
+    names = [circuit_def.opcode_names[op] for op in circuit_def.gate_ops]
+    assert names == ['Pair', 'RZ', 'X', 'Z', 'Y']
+    assert list(circuit_def.gate_qubits(1)) == [1]
+    parameter, = circuit_def.gate_parameters(1)
+    assert isinstance(parameter, GateParameter)
+    assert (parameter.name, parameter.scale, parameter.offset) == ('theta', 2.0, 0.5)
+    assert list(circuit_def.measure_positions) == [2, 5]
+    loop, branch = circuit_def.control_blocks
+    assert (loop.kind, loop.max_iterations, loop.parent) == ('while', 3, -1)
+    assert (branch.kind, branch.parent, branch.gate_start, branch.gate_else, branch.gate_end) == ('if', 0, 3, 4, 5)
+    assert list(circuit_def.gate_lines) == [16, 17, 20, 22, 24]
+
+@pytest.mark.parametrize('body, line, message', [
+    ("    qubit q0\n    gate H q0 q0 q0 {\n", 4, "Syntax error on line 4"),
+    ("    qubit q0\n    measure q0 c0\n", 4, "Syntax error on line 4"),
+    ("    qubit q0\n    if (c0 == 2) {\n    }\n", 4, "Syntax error on line 4"),
+])
+def test_syntax_errors_report_their_line(body, line, message):
+    with pytest.raises(SyntaxError, match=message):
+        parse_qadl(f"@startqadl\nCircuit Broken {{\n{body}}}\n@endqadl")
+
+def test_every_circuit_is_rendered_in_parallel(tmp_path):
+    circuits = parse_qadl_all("""@startqadl
+Circuit First {
+    qubit q0
+    gate H q0
+    measure q0 -> c0
+}
+Circuit Second {
+    qubit q0
+    qubit q1
+    gate H q0
+    gate CNOT q0 q1
+}
+@endqadl""")
+    results = execute_circuits(circuits, max_workers=2, output_dir=str(tmp_path), cache_dir=None)
+    assert [name for name, _ in results] == ['First', 'Second']
+    for _, path in results:
+        assert os.path.getsize(path) > 0
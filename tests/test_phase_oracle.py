@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+from qiskit.quantum_info import Statevector
+
+from phase_oracle import parse_oracle
+from qiskit_executor import build_circuit
+from qiskit_parser import parse_qadl, parse_qadl_all
+from statevector_simulator import run_statevector, simulate_circuit
+
+DEMO = os.path.join(os.path.dirname(__file__), '..', 'QADL_Help_Demo.qadl')
+
+@pytest.mark.parametrize('oracle', [
+    'oracle Mark marks 101 011',
+    'oracle Sat(a, b, c) = (a | b) & ~c',
+    'oracle Parity(a, b, c) = a ^ b ^ c',
+    'oracle Equal(a, b, c) = (a == b) and not c',
+])
+def test_oracle_and_diffuser_match_qiskit(oracle):
+    name = oracle.split()[1].split('(')[0]
+    circuit_def = parse_qadl(f"""@startqadl
+Circuit Search {{
+    qubit q0
+    qubit q1
+    qubit q2
+    gate H q0
+    gate H q1
+    gate H q2
+    {oracle}
+    gate {name} q2 q0 q1
+    gate Diffuser q0 q1 q2
+}}
+@endqadl""")
+    expected = Statevector(build_circuit(circuit_def)).data
+    assert np.allclose(run_statevector(circuit_def).data, expected)
+
+def test_truth_table_binds_qubits_most_significant_first():
+    assert parse_oracle('oracle Mark marks 110 001').truth_table() == (1 << 6) | (1 << 1)
+    assert parse_oracle('oracle Xor(a, b) = a ^ b').truth_table() == 0b0110
+    with pytest.raises(SyntaxError):
+        parse_oracle('oracle Bad(a, b) = a + b', 3)
+
+def test_grover_demo_finds_the_marked_state():
+    with open(DEMO) as handle:
+        grover = parse_qadl_all(handle.read())[4]
+    counts = simulate_circuit(grover, shots=400, seed=1).counts
+    assert max(counts, key=counts.get) == '1101'
+    assert counts['1101'] > 350
@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+import pytest
+
+from hardware_routing import CouplingGraph, route_circuit
+from qiskit_executor import build_circuit
+from qiskit_parser import QuantumCircuitDef, parse_qadl
+from statevector_simulator import run_statevector
+
+GRAPH = ['p0 - p1 - p2 - p3 - p4', 'p2 - p5']
+
+def _random_circuit(rng, num_qubits=6, num_gates=25):
+    circuit_def = QuantumCircuitDef('Random')
+    for q in range(num_qubits):
+        circuit_def.declare_qubit(f"q{q}")
+    for _ in range(num_gates):
+        if rng.random() < 0.4:
+            circuit_def.append_gate('RY', [f"q{rng.randrange(num_qubits)}"], [rng.random() * 3])
+        else:
+            a, b = rng.sample(range(num_qubits), 2)
+            circuit_def.append_gate('CNOT', [f"q{a}", f"q{b}"])
+    return circuit_def
+
+@pytest.mark.parametrize('seed', range(10))
+def test_routed_circuit_is_coupled_and_equivalent(seed):
+    rng = random.Random(seed)
+    graph = CouplingGraph.from_connectivity(GRAPH)
+    circuit_def = _random_circuit(rng)
+    result = route_circuit(circuit_def, graph, layout=rng.sample(range(6), 6))
+    routed = result.circuit
+    for i in range(routed.num_gates):
+        qubits = list(routed.gate_qubits(i))
+        if len(qubits) == 2:
+            assert graph.distance[qubits[0]][qubits[1]] == 1
+    # Axis k of the reshaped state is qubit 5 - k; logical q ends on physical final[q].
+    final = [graph.index[result.final_layout[f"q{q}"]] for q in range(6)]
+    logical = run_statevector(circuit_def).data.reshape([2] * 6)
+    physical = run_statevector(routed).data.reshape([2] * 6)
+    assert np.allclose(np.transpose(physical, [5 - final[5 - axis] for axis in range(6)]), logical)
+
+def test_disconnected_hardware_is_rejected():
+    circuit_def = parse_qadl("""@startqadl
+Circuit Split {
+    qubit a
+    qubit b
+    qubit c
+    qubit d
+    qubit e
+    gate CNOT a c
+    gate CNOT d e
+    gate CNOT a e
+}
+@endqadl""")
+    graph = CouplingGraph.from_connectivity(['p0 - p1 - p2', 'p3 - p4'])
+    with pytest.raises(ValueError, match="disconnected parts of the hardware"):
+        route_circuit(circuit_def, graph, layout=[0, 1, 2, 3, 4])
+
+def test_routing_keeps_module_parameters():
+    circuit_def = parse_qadl("""@startqadl
+Circuit Rotated {
+    module Rot {
+        qubit x
+        gate RZ(theta) x
+    }
+    qubit a
+    qubit b
+    qubit c
+    hardware {
+        qubit_connectivity {
+            a - b - c
+        }
+    }
+    call Rot a
+    gate CNOT a c
+}
+@endqadl""")
+    routed = route_circuit(circuit_def).circuit
+    assert routed.parameter_names == ['theta']
+    assert [parameter.name for parameter in build_circuit(routed).parameters] == ['theta']
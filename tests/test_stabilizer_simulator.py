@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from qiskit.quantum_info import Statevector
+
+from qiskit_executor import build_circuit
+from qiskit_parser import QuantumCircuitDef, parse_qadl
+from stabilizer_simulator import clifford_obstacle, simulate_stabilizer
+from statevector_simulator import simulate_circuit
+
+BELL = """@startqadl
+Circuit Bell {
+    qubit q0
+    qubit q1
+    gate H q0
+    gate CNOT q0 q1
+    measure q0 -> c0
+    measure q1 -> c1
+}
+@endqadl"""
+
+def _ghz(num_qubits):
+    circuit_def = QuantumCircuitDef('GHZ')
+    for q in range(num_qubits):
+        circuit_def.declare_qubit(f"q{q}")
+    circuit_def.append_gate('H', ['q0'])
+    for q in range(1, num_qubits):
+        circuit_def.append_gate('CNOT', [f"q{q - 1}", f"q{q}"])
+    for q in range(num_qubits):
+        circuit_def.append_measurement(f"q{q}", f"c{q}")
+    return circuit_def
+
+def test_small_clifford_circuit_keeps_its_state():
+    result = simulate_circuit(parse_qadl(BELL), shots=200, seed=1)
+    assert result.method == 'statevector'
+    assert np.allclose(result.statevector, [2 ** -0.5, 0, 0, 2 ** -0.5])
+
+def test_clifford_circuit_without_state_uses_tableau():
+    result = simulate_circuit(parse_qadl(BELL), shots=200, seed=1, keep_state=False)
+    assert result.method == 'stabilizer'
+    assert result.statevector is None
+    assert set(result.counts) == {'00', '11'} and sum(result.counts.values()) == 200
+
+def test_wide_clifford_circuit_uses_tableau():
+    result = simulate_circuit(_ghz(40), shots=500, seed=2)
+    assert result.method == 'stabilizer'
+    assert set(result.counts) == {'0' * 40, '1' * 40}
+
+@pytest.mark.parametrize('seed', range(5))
+def test_tableau_marginals_match_statevector(seed):
+    rng = np.random.default_rng(seed)
+    circuit_def = QuantumCircuitDef('Random')
+    for q in range(4):
+        circuit_def.declare_qubit(f"q{q}")
+    for _ in range(30):
+        gate = rng.choice(['H', 'S', 'X', 'Z', 'CNOT', 'CZ'])
+        if gate in ('CNOT', 'CZ'):
+            a, b = rng.choice(4, 2, replace=False)
+            circuit_def.append_gate(gate, [f"q{a}", f"q{b}"])
+        else:
+            circuit_def.append_gate(gate, [f"q{rng.integers(4)}"])
+    for q in range(4):
+        circuit_def.append_measurement(f"q{q}", f"c{q}")
+    assert clifford_obstacle(circuit_def) is None
+    counts = simulate_stabilizer(circuit_def, shots=4000, seed=seed).counts
+    qc = build_circuit(circuit_def).remove_final_measurements(inplace=False)
+    exact = Statevector(qc).probabilities_dict()
+    assert set(counts) == {key for key, p in exact.items() if p > 1e-9}
+    for key, hits in counts.items():
+        assert abs(hits / 4000 - exact[key]) < 0.05
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from qiskit.quantum_info import Statevector
+
+from gate_registry import lookup_gate, register_gate
+from qiskit_executor import build_circuit
+from qiskit_parser import QuantumCircuitDef, parse_qadl
+from statevector_simulator import run_statevector, simulate_circuit
+
+ONE_QUBIT = ['H', 'X', 'Y', 'Z', 'S', 'Sdg', 'T', 'Tdg']
+ROTATIONS = ['RX', 'RY', 'RZ', 'Phase']
+TWO_QUBIT = ['CNOT', 'CZ', 'Swap', 'CRZ', 'CP', 'RZZ']
+
+def _qiskit_state(circuit_def):
+    return Statevector(build_circuit(circuit_def).remove_final_measurements(inplace=False)).data
+
+def _random_circuit(rng, num_qubits, num_gates, extra=()):
+    circuit_def = QuantumCircuitDef('Random')
+    qubits = [f"q{q}" for q in range(num_qubits)]
+    for qubit in qubits:
+        circuit_def.declare_qubit(qubit)
+    choices = ONE_QUBIT + ROTATIONS + TWO_QUBIT + ['CCNOT'] + list(extra)
+    for _ in range(num_gates):
+        name = str(rng.choice(choices))
+        spec = lookup_gate(name)
+        width = spec.num_qubits or int(rng.integers(1, num_qubits + 1))
+        targets = [qubits[q] for q in rng.choice(num_qubits, width, replace=False)]
+        params = [float(rng.uniform(-np.pi, np.pi))] if spec.num_params == 1 and not spec.defaults else []
+        circuit_def.append_gate(name, targets, params)
+    return circuit_def
+
+@pytest.mark.parametrize('seed', range(8))
+def test_statevector_matches_qiskit(seed):
+    circuit_def = _random_circuit(np.random.default_rng(seed), 5, 60)
+    assert np.allclose(run_statevector(circuit_def).data, _qiskit_state(circuit_def))
+
+def test_counts_follow_the_measured_bits():
+    circuit_def = parse_qadl("""@startqadl
+Circuit Flip {
+    qubit q0
+    qubit q1
+    gate X q1
+    measure q1 -> c0
+    measure q0 -> c1
+}
+@endqadl""")
+    result = simulate_circuit(circuit_def, shots=50, seed=3)
+    assert result.counts == {'01': 50}
+    assert result.method == 'statevector'
+    assert np.allclose(result.statevector, [0, 0, 1, 0])
+
+@pytest.mark.parametrize('seed', range(4))
+def test_qft_kernels_match_their_decomposition(seed):
+    rng = np.random.default_rng(seed)
+    circuit_def = _random_circuit(rng, 6, 20)
+    circuit_def.append_gate('QFT', ['q0', 'q2', 'q3', 'q5'])
+    circuit_def.append_gate('QFT', ['q1', 'q4', 'q0', 'q2', 'q3'], [2])
+    circuit_def.append_gate('InverseQFT', ['q5', 'q4', 'q3'], [1])
+    assert np.allclose(run_statevector(circuit_def).data, _qiskit_state(circuit_def))
+
+def test_inverse_qft_undoes_qft():
+    circuit_def = _random_circuit(np.random.default_rng(11), 7, 30)
+    before = run_statevector(circuit_def).data
+    qubits = [f"q{q}" for q in range(7)]
+    circuit_def.append_gate('QFT', qubits)
+    circuit_def.append_gate('InverseQFT', qubits)
+    assert np.allclose(run_statevector(circuit_def).data, before)
+
+def test_registered_gate_is_translated_and_simulated():
+    from qiskit.circuit.library import SXGate
+    sqrt_x = ((0.5 + 0.5j, 0.5 - 0.5j), (0.5 - 0.5j, 0.5 + 0.5j))
+    register_gate('TestSqrtX', 1, SXGate, matrix=sqrt_x)
+    circuit_def = QuantumCircuitDef('Registered')
+    circuit_def.declare_qubit('q0')
+    circuit_def.append_gate('TestSqrtX', ['q0'])
+    circuit_def.append_gate('TestSqrtX', ['q0'])
+    assert build_circuit(circuit_def).count_ops() == {'sx': 2}
+    assert np.allclose(run_statevector(circuit_def).data, [0, 1])
+    with pytest.raises(ValueError, match="Unsupported gate: Missing"):
+        lookup_gate('Missing')